@@ -1,5 +1,13 @@
 """The nqrduck_broadband package provides classes for performing broadband NQR measurements within the NQRduck project."""
 
-from .broadband import Broadband as Module
-
 __all__ = ["Module"]
+
+
+def __getattr__(name: str):
+    # The module creates the widgets of its view, so it is only imported when it is requested.
+    # This way the measurement logic can be used without a QApplication.
+    if name == "Module":
+        from .broadband import Broadband
+
+        return Broadband
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
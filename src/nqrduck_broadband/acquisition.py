@@ -0,0 +1,387 @@
+"""This module contains the AcquisitionStateMachine class which runs the frequency steps of a broadband measurement."""
+
+import logging
+import time
+from collections import deque
+from PyQt6.QtCore import pyqtSignal, pyqtSlot, QObject, Qt
+from .matching import MatchingPolicy
+from .scheduler import StepScheduler
+from .timing import StepTimings
+
+logger = logging.getLogger(__name__)
+
+
+class AcquisitionStateMachine(QObject):
+    """State machine that runs the single frequency measurements of a broadband measurement.
+
+    Every step sets the frequency of the spectrometer, optionally waits for tune and match and then acquires and stitches a single measurement.
+    If a matching_policy is set, it decides what happens at frequencies where the reflection after tune and match is worse than the minimum matching.
+    If a LUT index is set, the tune and match requests carry the resolved LUT entry of the frequency, see LUTEntry.
+    If adaptive averaging is set, the number of averages of every step is chosen from the signal-to-noise ratio of the previous steps
+    and steps with a weak line are measured again with more averages.
+    If pipelined is set, tune and match of the next planned frequency is requested right after the acquisition of a step has been started,
+    so tune and match settles while the spectrometer is measuring. This requires tune and match hardware that is independent of the spectrometer.
+    The frequency of the spectrometer is only set after the measurement data has arrived. The early confirmation is kept until its step starts,
+    it is discarded if the plan has chosen a different frequency in the meantime. A step that is measured again is tuned and matched again first.
+    The latency of every stage of a step is recorded in latencies, the timestamps of every step in the timings of the broadband measurement.
+    The machine only depends on QtCore and communicates through signals, so it can run without a display.
+    Answers of the spectrometer are delivered through queued signals. They are handled once control returns to the event loop,
+    so a new answer can never arrive while the previous measurement is still being stitched.
+
+    Attributes:
+        IDLE (str): No broadband measurement is running.
+        SETTLING (str): The next step is scheduled and waits for its settle time.
+        SETTING_FREQUENCY (str): The frequency of the spectrometer is being set.
+        AWAITING_TUNE_AND_MATCH (str): Waiting for the confirmation of tune and match.
+        ACQUIRING (str): Waiting for the measurement data of the spectrometer.
+        STITCHING (str): The measurement data is added to the broadband measurement.
+        FINISHED (str): All frequencies have been measured.
+        TUNE_AND_MATCH_STAGE (str): The latency stage from the tune and match request to its confirmation.
+        TUNE_AND_MATCH_WAIT_STAGE (str): The latency stage from the start of a step with tune and match until its acquisition starts.
+        ACQUISITION_STAGE (str): The latency stage from the start of the measurement to the arrival of its data.
+        STITCHING_STAGE (str): The latency stage in which the measurement data is added to the broadband measurement.
+        latencies (dict): The latencies in seconds of every step by stage.
+
+    Signals:
+        state_changed: Signal that the state of the machine has changed.
+        command: Signal with a command for the spectrometer, the name and the value of the command.
+        step_started: Signal that the step at the given frequency has been started.
+        matching_decided: Signal with a MatchingDecision of the matching policy.
+        step_repeated: Signal that the step at the given frequency is measured again with the given number of averages.
+        finished: Signal that all frequencies have been measured.
+    """
+
+    IDLE = "idle"
+    SETTLING = "settling"
+    SETTING_FREQUENCY = "setting frequency"
+    AWAITING_TUNE_AND_MATCH = "awaiting tune and match"
+    ACQUIRING = "acquiring"
+    STITCHING = "stitching"
+    FINISHED = "finished"
+
+    TUNE_AND_MATCH_STAGE = "tune and match"
+    TUNE_AND_MATCH_WAIT_STAGE = "tune and match wait"
+    ACQUISITION_STAGE = "acquisition"
+    STITCHING_STAGE = "stitching"
+
+    state_changed = pyqtSignal(str)
+    command = pyqtSignal(str, object)
+    step_started = pyqtSignal(float)
+    matching_decided = pyqtSignal(object)
+    step_repeated = pyqtSignal(float, int)
+    finished = pyqtSignal()
+
+    _NO_REFLECTION = object()
+
+    _measurement_received = pyqtSignal(object)
+    _tune_and_match_received = pyqtSignal(object)
+
+    def __init__(self) -> None:
+        """Initializes the AcquisitionStateMachine."""
+        super().__init__()
+        self._state = self.IDLE
+        self.broadband_measurement = None
+        self.tune_and_match = False
+        self.matching_policy = None
+        self.averaging = None
+        self.lut_index = None
+        self.pipelined = False
+        self.frequency = None
+        self.latencies = {}
+        self._averages = None
+        self._reduced_averages = False
+        # Tune and match requests that have not been confirmed yet, in the order they have been sent
+        self._requests = deque()
+        self._request_id = 0
+        # Request, frequency and answer of a tune and match request sent before its step has started
+        self._prefetch_request = None
+        self._prefetched_frequency = None
+        self._prefetched_reflection = self._NO_REFLECTION
+        self._prefetch_requested = None
+        self._prefetch_confirmed = None
+        self._awaiting_prefetch = False
+        self._retuning = False
+        self._step_started = None
+        self._acquisition_started = None
+
+        self.scheduler = StepScheduler()
+        self.scheduler.step_due.connect(self._start_step)
+
+        self._measurement_received.connect(
+            self._on_measurement_received, Qt.ConnectionType.QueuedConnection
+        )
+        self._tune_and_match_received.connect(
+            self._on_tune_and_match_received, Qt.ConnectionType.QueuedConnection
+        )
+
+    @property
+    def state(self) -> str:
+        """The current state of the machine."""
+        return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            logger.debug(f"Acquisition state: {self._state} -> {state}")
+            self._state = state
+            self.state_changed.emit(state)
+
+    @property
+    def running(self) -> bool:
+        """True while a broadband measurement is running."""
+        return self._state not in (self.IDLE, self.FINISHED)
+
+    @property
+    def waiting_for_tune_and_match(self) -> bool:
+        """True while a confirmation of tune and match is expected, also for a request of the next step."""
+        return self._state == self.AWAITING_TUNE_AND_MATCH or bool(self._requests)
+
+    def _record_latency(self, stage: str, start: float) -> None:
+        if start is not None:
+            self.latencies.setdefault(stage, []).append(time.monotonic() - start)
+
+    def mean_latency(self, stage: str) -> float:
+        """Returns the mean latency of a stage in seconds, 0 if the stage has not been recorded."""
+        latencies = self.latencies.get(stage)
+        if not latencies:
+            return 0.0
+        return sum(latencies) / len(latencies)
+
+    def start(self, broadband_measurement, tune_and_match: bool) -> None:
+        """This method starts measuring the frequencies of a broadband measurement that have not been measured yet.
+
+        Args:
+            broadband_measurement (BroadbandMeasurement): The broadband measurement.
+            tune_and_match (bool): If True tune and match is set before every measurement.
+        """
+        self.stop()
+        # The averages may have been changed since the last measurement
+        self._averages = None
+        self.broadband_measurement = broadband_measurement
+        self.tune_and_match = tune_and_match
+        self.latencies = {}
+        broadband_measurement.timings.new_session()
+        self.scheduler.reset()
+        self._schedule_next_step()
+
+    def stop(self) -> None:
+        """This method stops the running broadband measurement, answers of the spectrometer are ignored afterwards."""
+        self.scheduler.cancel()
+        self.frequency = None
+        self._requests.clear()
+        self._clear_prefetch()
+        self._retuning = False
+        self._restore_averages()
+        self._set_state(self.IDLE)
+
+    @pyqtSlot(object)
+    def receive_measurement(self, measurement) -> None:
+        """This method passes the measurement data of the spectrometer to the machine.
+
+        Args:
+            measurement (Measurement): The single frequency measurement.
+        """
+        self._measurement_received.emit(measurement)
+
+    @pyqtSlot(object)
+    def receive_tune_and_match(self, reflection) -> None:
+        """This method passes the confirmation of tune and match to the machine.
+
+        Args:
+            reflection (float): The reflection at the frequency in dB or None if it is unknown.
+        """
+        self._tune_and_match_received.emit(reflection)
+
+    def _schedule_next_step(self) -> None:
+        if self.broadband_measurement.is_complete():
+            self._restore_averages()
+            self._set_state(self.FINISHED)
+            self.finished.emit()
+            return
+        self._set_state(self.SETTLING)
+        self.scheduler.schedule(
+            self.broadband_measurement.get_next_measurement_frequency()
+        )
+
+    def _prefetch(self) -> None:
+        """Requests tune and match of the frequency that is planned after the one that is being acquired."""
+        frequency = self.broadband_measurement.get_following_measurement_frequency(
+            self.frequency
+        )
+        if frequency is None or frequency == self._prefetched_frequency:
+            return
+        self._prefetched_frequency = frequency
+        self._prefetched_reflection = self._NO_REFLECTION
+        self._prefetch_requested = time.monotonic()
+        self._prefetch_confirmed = None
+        self._prefetch_request = self._send_tune_and_match(frequency)
+
+    def _clear_prefetch(self) -> None:
+        self._prefetch_request = None
+        self._prefetched_frequency = None
+        self._prefetched_reflection = self._NO_REFLECTION
+        self._awaiting_prefetch = False
+
+    def _set_frequency(self, frequency: float) -> None:
+        """Starts the timings of a step and sets its frequency, the spectrometer has accepted it once the command returns."""
+        timings = self.broadband_measurement.timings
+        timings.start_step(frequency)
+        self.command.emit("set_frequency", str(frequency))
+        timings.mark(StepTimings.FREQUENCY_SET)
+
+    @pyqtSlot(float)
+    def _start_step(self, frequency: float) -> None:
+        if self._state != self.SETTLING:
+            return
+        self.frequency = frequency
+        self._step_started = time.monotonic()
+        self.step_started.emit(frequency)
+
+        self._set_state(self.SETTING_FREQUENCY)
+        self._set_frequency(frequency)
+
+        if not self.tune_and_match:
+            self._acquire()
+            return
+
+        self._set_state(self.AWAITING_TUNE_AND_MATCH)
+        if self._prefetched_frequency != frequency:
+            # The plan has chosen another frequency, a late answer of the prefetch is ignored
+            self._clear_prefetch()
+            self._request_tune_and_match()
+            return
+
+        timings = self.broadband_measurement.timings
+        timings.mark(StepTimings.TUNE_AND_MATCH_REQUESTED, timestamp=self._prefetch_requested)
+        reflection = self._prefetched_reflection
+        if reflection is self._NO_REFLECTION:
+            self._awaiting_prefetch = True
+            return
+        timings.mark(StepTimings.TUNE_AND_MATCH_CONFIRMED, timestamp=self._prefetch_confirmed)
+        self._clear_prefetch()
+        self._handle_tune_and_match(reflection)
+
+    def _send_tune_and_match(self, frequency: float) -> int:
+        """Sends a tune and match request and returns its id, the confirmations arrive in the order of the requests."""
+        self._request_id += 1
+        self._requests.append((self._request_id, time.monotonic()))
+        entry = None
+        if self.lut_index is not None:
+            entry = self.lut_index.resolve(frequency)
+        self.command.emit(
+            "set_tune_and_match", entry if entry is not None else frequency * 1e-6
+        )
+        return self._request_id
+
+    def _request_tune_and_match(self) -> None:
+        self.broadband_measurement.timings.mark(StepTimings.TUNE_AND_MATCH_REQUESTED)
+        self._send_tune_and_match(self.frequency)
+
+    def _set_averages(self, averages: int) -> None:
+        if averages is not None and averages != self._averages:
+            self.command.emit("set_averages", str(averages))
+            self._averages = averages
+
+    def _restore_averages(self) -> None:
+        """Sets the averages the measurement has been started with after they have been changed for single steps."""
+        if self.averaging is not None:
+            self._set_averages(self.averaging.max_averages)
+        elif self._reduced_averages:
+            self._set_averages(self.matching_policy.averages)
+        self._reduced_averages = False
+
+    def _acquire(self) -> None:
+        if self.averaging is not None and not self._reduced_averages:
+            self._set_averages(self.averaging.averages)
+        if self.tune_and_match:
+            self._record_latency(self.TUNE_AND_MATCH_WAIT_STAGE, self._step_started)
+        self._step_started = None
+        self._set_state(self.ACQUIRING)
+        self._acquisition_started = time.monotonic()
+        self.broadband_measurement.timings.mark(StepTimings.ACQUISITION_STARTED)
+        self.command.emit("start_measurement", None)
+        if self.pipelined and self.tune_and_match:
+            self._prefetch()
+
+    @pyqtSlot(object)
+    def _on_tune_and_match_received(self, reflection) -> None:
+        if not self._requests:
+            logger.debug("Ignoring unrequested tune and match confirmation.")
+            return
+        request, requested = self._requests.popleft()
+        self._record_latency(self.TUNE_AND_MATCH_STAGE, requested)
+
+        if request == self._prefetch_request:
+            if not self._awaiting_prefetch:
+                # The step of the prefetched frequency has not been started yet
+                self._prefetched_reflection = reflection
+                self._prefetch_confirmed = time.monotonic()
+                return
+            self._clear_prefetch()
+        elif self._state != self.AWAITING_TUNE_AND_MATCH or self._requests:
+            # Answers of outdated requests are ignored, only the last request belongs to the current step
+            logger.debug("Ignoring tune and match confirmation in state: " + self._state)
+            return
+
+        self.broadband_measurement.timings.mark(StepTimings.TUNE_AND_MATCH_CONFIRMED)
+        if self._retuning:
+            self._retuning = False
+            self._acquire()
+            return
+        self._handle_tune_and_match(reflection)
+
+    def _handle_tune_and_match(self, reflection) -> None:
+        logger.debug("Reflection: " + str(reflection))
+        if reflection is not None:
+            self.broadband_measurement.add_tune_and_match(reflection, self.frequency)
+            if self.matching_policy is not None:
+                if self.averaging is not None:
+                    self.matching_policy.averages = self.averaging.averages
+                decision = self.matching_policy.decide(self.frequency, reflection)
+                if decision is not None:
+                    self.broadband_measurement.add_matching_decision(decision)
+                    self.matching_decided.emit(decision)
+                    if decision.action == MatchingPolicy.RETRY:
+                        self._request_tune_and_match()
+                        return
+                    if decision.action == MatchingPolicy.SKIP:
+                        self._schedule_next_step()
+                        return
+                    if decision.action == MatchingPolicy.REDUCE_AVERAGES:
+                        self._set_averages(decision.averages)
+                        self._reduced_averages = True
+        self._acquire()
+
+    @pyqtSlot(object)
+    def _on_measurement_received(self, measurement) -> None:
+        if self._state != self.ACQUIRING:
+            logger.debug("Ignoring measurement data in state: " + self._state)
+            return
+        self.broadband_measurement.timings.mark(StepTimings.MEASUREMENT_RECEIVED)
+        self._record_latency(self.ACQUISITION_STAGE, self._acquisition_started)
+        self._set_state(self.STITCHING)
+        stitching_started = time.monotonic()
+        reduced_averages = self._reduced_averages
+        if self.averaging is None:
+            self._restore_averages()
+        self._reduced_averages = False
+        self.broadband_measurement.add_measurement(measurement)
+        self._record_latency(self.STITCHING_STAGE, stitching_started)
+
+        # Steps measured with reduced averages because of poor matching are not repeated
+        if self.averaging is not None and not reduced_averages:
+            averages = self._averages
+            if self.averaging.add_measurement(
+                measurement, self.broadband_measurement.frequency_step, averages
+            ):
+                self.step_repeated.emit(self.frequency, self.averaging.averages)
+                self.broadband_measurement.timings.start_step(self.frequency)
+                if self._prefetch_request is not None:
+                    # The probe has already been tuned to the next frequency
+                    self._clear_prefetch()
+                    self._retuning = True
+                    self._set_state(self.AWAITING_TUNE_AND_MATCH)
+                    self._request_tune_and_match()
+                    return
+                self._acquire()
+                return
+        self._schedule_next_step()
@@ -0,0 +1,364 @@
+"""This module contains the AdaptivePlan class which decides the order and the frequencies of an adaptive broadband measurement and the AdaptiveStitcher class which stitches its spectrum."""
+
+import bisect
+import heapq
+import logging
+import numpy as np
+from . import stitching
+
+logger = logging.getLogger(__name__)
+
+
+def structure_score(measurement, half_width: float) -> float:
+    """Estimates how much structure a single frequency measurement shows around its IF.
+
+    The score is the ratio of the maximum to the median of the magnitude within half_width of the IF.
+    The magnitude of pure noise stays within a few times its median, a line exceeds it by far.
+
+    Args:
+        measurement (Measurement): The single frequency measurement.
+        half_width (float): The distance to the IF that is taken into account in Hz.
+
+    Returns:
+        float: The structure score of the measurement.
+    """
+    fdx = np.asarray(measurement.fdx)
+    offset = measurement.IF_frequency * 1e-6
+    lower, upper = np.searchsorted(
+        fdx, [offset - half_width * 1e-6, offset + half_width * 1e-6]
+    )
+    window = stitching.magnitude(measurement.fdy)[lower : max(upper, lower + 1)]
+    if len(window) == 0:
+        return 0.0
+    median = np.median(window)
+    if median <= 0:
+        return float("inf")
+    return float(np.max(window) / median)
+
+
+class AdaptivePlan:
+    """Plan of an adaptive broadband measurement.
+
+    The measurement starts with a coarse pass that only measures every coarse_factor-th frequency of the sweep.
+    Whenever both ends of a coarse interval have been measured, the interval is refined if one of its ends shows structure
+    or the reflection changes by more than s11_threshold between them. The frequencies in between are then queued.
+    The queue is a priority queue: the coarse pass comes first, followed by the refinements with the most structure,
+    so an interrupted measurement has already refined the most interesting parts of the spectrum.
+    Frequencies in intervals without structure are never measured, the measurements at the ends of such an interval
+    are cut with coarse_factor times the frequency step so they cover it, see slice_step and trim_slices.
+
+    Args:
+        frequencies (list): The frequencies of the sweep in Hz, sorted in ascending order.
+        frequency_step (float): The frequency step of the sweep in Hz.
+        coarse_factor (int): The number of frequency steps between two frequencies of the coarse pass.
+        threshold (float): The structure score above which an interval is refined, see structure_score.
+        s11_threshold (float): The change of the reflection in dB between two coarse frequencies above which the interval is refined.
+
+    Attributes:
+        DEFAULT_COARSE_FACTOR (int): The default number of frequency steps between two frequencies of the coarse pass.
+        DEFAULT_THRESHOLD (float): The default structure score above which an interval is refined.
+        DEFAULT_S11_THRESHOLD (float): The default change of the reflection in dB above which an interval is refined.
+        COARSE (int): The priority of the frequencies of the coarse pass.
+        REFINE (int): The priority of the frequencies of refined intervals.
+    """
+
+    DEFAULT_COARSE_FACTOR = 4
+    DEFAULT_THRESHOLD = 6.0
+    DEFAULT_S11_THRESHOLD = 3.0
+
+    COARSE = 0
+    REFINE = 1
+
+    def __init__(
+        self,
+        frequencies,
+        frequency_step: float,
+        coarse_factor: int = DEFAULT_COARSE_FACTOR,
+        threshold: float = DEFAULT_THRESHOLD,
+        s11_threshold: float = DEFAULT_S11_THRESHOLD,
+    ) -> None:
+        """Initializes the AdaptivePlan."""
+        if coarse_factor < 1:
+            raise ValueError("The coarse factor has to be at least 1.")
+        self.frequencies = list(frequencies)
+        self.frequency_step = frequency_step
+        self.coarse_factor = int(coarse_factor)
+        self.threshold = threshold
+        self.s11_threshold = s11_threshold
+
+        self._positions = {
+            frequency: position for position, frequency in enumerate(self.frequencies)
+        }
+        coarse_positions = list(range(0, len(self.frequencies), self.coarse_factor))
+        if coarse_positions and coarse_positions[-1] != len(self.frequencies) - 1:
+            coarse_positions.append(len(self.frequencies) - 1)
+        self._coarse_positions = coarse_positions
+        self._coarse_index = {
+            position: index for index, position in enumerate(coarse_positions)
+        }
+
+        self.scores = {}
+        self.refined = []
+        self._measured = set()
+        self._queue = []
+        self._queued = set()
+        for position in coarse_positions:
+            self._push((self.COARSE, 0.0, position))
+
+    def _push(self, entry: tuple) -> None:
+        position = entry[2]
+        if position not in self._queued and position not in self._measured:
+            heapq.heappush(self._queue, entry)
+            self._queued.add(position)
+
+    def _discard_measured(self) -> None:
+        while self._queue and self._queue[0][2] in self._measured:
+            self._queued.discard(heapq.heappop(self._queue)[2])
+
+    def next_frequency(self) -> float:
+        """Returns the frequency that should be measured next.
+
+        Returns:
+            float: The frequency in Hz or None if the plan is complete.
+        """
+        self._discard_measured()
+        if not self._queue:
+            return None
+        return self.frequencies[self._queue[0][2]]
+
+    def following_frequency(self, frequency: float) -> float:
+        """Returns the frequency that is measured after the given one with the current queue.
+
+        Refinements triggered by the measurement of frequency are not known yet, so the result can change once it has been measured.
+
+        Args:
+            frequency (float): The frequency in Hz that is measured now.
+
+        Returns:
+            float: The frequency in Hz or None if no other frequency is queued.
+        """
+        position = self._positions.get(frequency)
+        entry = min(
+            (
+                entry
+                for entry in self._queue
+                if entry[2] != position and entry[2] not in self._measured
+            ),
+            default=None,
+        )
+        return None if entry is None else self.frequencies[entry[2]]
+
+    def slice_step(self, frequency: float) -> float:
+        """Returns the frequency step the measurement at a frequency is cut with for stitching.
+
+        The measurements of the coarse pass are cut with the width of a coarse interval, trim_slices cuts them down
+        where the interval has been refined.
+
+        Args:
+            frequency (float): The target frequency of the measurement in Hz.
+
+        Returns:
+            float: The frequency step in Hz.
+        """
+        if self._positions.get(frequency) in self._coarse_index:
+            return self.coarse_factor * self.frequency_step
+        return self.frequency_step
+
+    def trim_slices(self, slices: list) -> list:
+        """Trims the slices of the coarse pass so every slice reaches halfway to the neighbouring measurements.
+
+        A coarse measurement next to an interval without refinement keeps half the interval, next to a refined interval
+        it is cut down to half a frequency step. At the ends of the sweep the slices end half a frequency step after the last frequency.
+
+        Args:
+            slices (list): The SpectrumSlice of every measured frequency ordered by frequency.
+
+        Returns:
+            list: The trimmed slices.
+        """
+        half_step = self.frequency_step / 2 * 1e-6
+        first = self.frequencies[0] * 1e-6 - half_step if self.frequencies else None
+        last = self.frequencies[-1] * 1e-6 + half_step if self.frequencies else None
+        targets = [spectrum_slice.target_frequency * 1e-6 for spectrum_slice in slices]
+
+        trimmed = []
+        for index, spectrum_slice in enumerate(slices):
+            if spectrum_slice.frequency_step <= self.frequency_step:
+                trimmed.append(spectrum_slice)
+                continue
+            x_lower = first
+            if index > 0:
+                x_lower = max(x_lower, (targets[index - 1] + targets[index]) / 2)
+            x_upper = last
+            if index < len(slices) - 1:
+                x_upper = min(x_upper, (targets[index] + targets[index + 1]) / 2)
+            trimmed.append(stitching.trim_slice(spectrum_slice, x_lower, x_upper))
+        return trimmed
+
+    def is_complete(self) -> bool:
+        """Returns True if no frequency is left in the queue."""
+        self._discard_measured()
+        return not self._queue
+
+    @property
+    def measured_count(self) -> int:
+        """The number of frequencies that have been measured or skipped."""
+        return len(self._measured)
+
+    def finished_percentage(self) -> float:
+        """Returns the percentage of the frequencies planned so far that have been measured."""
+        self._discard_measured()
+        planned = len(self._measured) + len(self._queue)
+        if planned == 0:
+            return 100.0
+        return len(self._measured) / planned * 100
+
+    def add_measurement(self, measurement, reflection: dict = None) -> None:
+        """This method records a measurement and refines the coarse intervals next to it if necessary.
+
+        Args:
+            measurement (Measurement): The single frequency measurement.
+            reflection (dict, optional): The reflection values in dB by frequency.
+        """
+        position = self._positions.get(measurement.target_frequency)
+        if position is None:
+            return
+        self._measured.add(position)
+
+        index = self._coarse_index.get(position)
+        if index is None:
+            return
+        self.scores[position] = structure_score(
+            measurement, self.coarse_factor * self.frequency_step / 2
+        )
+        for neighbour in (index - 1, index + 1):
+            if 0 <= neighbour < len(self._coarse_positions):
+                self._evaluate(
+                    self._coarse_positions[min(index, neighbour)],
+                    self._coarse_positions[max(index, neighbour)],
+                    reflection or {},
+                )
+
+    def skip(self, frequency: float) -> None:
+        """This method removes a frequency from the plan without measuring it.
+
+        A skipped coarse frequency has no structure score, the coarse intervals next to it are not refined.
+
+        Args:
+            frequency (float): The frequency in Hz.
+        """
+        position = self._positions.get(frequency)
+        if position is not None:
+            self._measured.add(position)
+
+    def _evaluate(self, left: int, right: int, reflection: dict) -> None:
+        if left not in self.scores or right not in self.scores or right - left < 2:
+            return
+        score = max(self.scores[left], self.scores[right])
+        left_s11 = reflection.get(self.frequencies[left])
+        right_s11 = reflection.get(self.frequencies[right])
+        s11_change = (
+            abs(left_s11 - right_s11)
+            if left_s11 is not None and right_s11 is not None
+            else 0.0
+        )
+        if score < self.threshold and s11_change < self.s11_threshold:
+            return
+
+        logger.debug(
+            f"Refining {self.frequencies[left]} - {self.frequencies[right]} Hz, "
+            f"structure score {score:.1f}, S11 change {s11_change:.1f} dB"
+        )
+        self.refined.append((self.frequencies[left], self.frequencies[right]))
+        # Intervals with more structure are refined first
+        priority = -max(score / self.threshold, s11_change / self.s11_threshold)
+        for position in range(left + 1, right):
+            self._push((self.REFINE, priority, position))
+
+
+class AdaptiveStitcher:
+    """Stitches the broadband spectrum of an adaptive measurement one measurement at a time.
+
+    The trimmed slice of a measurement depends on its measured neighbours, see AdaptivePlan.trim_slices.
+    A new measurement therefore changes its own slice and the slices of its two neighbours, only these are stitched again
+    and spliced into the spectrum. The rest of the spectrum is moved but not stitched again.
+
+    Args:
+        plan (AdaptivePlan): The plan of the adaptive measurement.
+        spectrum (SpectrumBuffer): The buffer the spectrum is stitched into.
+    """
+
+    def __init__(self, plan: AdaptivePlan, spectrum: stitching.SpectrumBuffer) -> None:
+        """Initializes the AdaptiveStitcher."""
+        self.plan = plan
+        self.spectrum = spectrum
+        self._positions = []
+        self._slices = []
+        self._block_lengths = []
+
+    def set_slices(self, positions: list, slices: list) -> None:
+        """This method replaces the spectrum with the given slices.
+
+        Args:
+            positions (list): The positions of the target frequencies of the slices in the sweep in ascending order.
+            slices (list): The untrimmed slices in the same order.
+        """
+        self._positions = list(positions)
+        self._slices = list(slices)
+        trimmed = self.plan.trim_slices(self._slices)
+        self._block_lengths = self._lengths(trimmed, 0)
+        self.spectrum.set_data(*stitching.assemble_slices(trimmed))
+
+    def add_slice(self, position: int, spectrum_slice: stitching.SpectrumSlice) -> int:
+        """This method stitches the slice of a new measurement into the spectrum, a slice at the same position is replaced.
+
+        Args:
+            position (int): The position of the target frequency of the slice in the sweep.
+            spectrum_slice (SpectrumSlice): The untrimmed slice.
+
+        Returns:
+            int: The first index of the spectrum that has changed.
+        """
+        index = bisect.bisect_left(self._positions, position)
+        if index < len(self._positions) and self._positions[index] == position:
+            self._slices[index] = spectrum_slice
+        else:
+            self._positions.insert(index, position)
+            self._slices.insert(index, spectrum_slice)
+            self._block_lengths.insert(index, 0)
+
+        # The slice and its neighbours are stitched again
+        lower = max(index - 1, 0)
+        upper = min(index + 2, len(self._slices))
+        start = sum(self._block_lengths[:lower])
+        stop = start + sum(self._block_lengths[lower:upper])
+
+        # The slices before and after them are needed for the shared edges and have to be trimmed with their own neighbours
+        first = max(lower - 1, 0)
+        last = min(upper + 1, len(self._slices))
+        context = max(first - 1, 0)
+        trimmed = self.plan.trim_slices(
+            self._slices[context : min(last + 1, len(self._slices))]
+        )[first - context : last - context]
+        fdx, fdy = stitching.assemble_slices(trimmed)
+
+        lengths = self._lengths(trimmed[lower - first : upper - first], lower)
+        self._block_lengths[lower:upper] = lengths
+        # As first slice of the assembled part the slice before keeps both of its edges
+        offset = len(trimmed[0]) + 2 if lower > 0 else 0
+        segment = slice(offset, offset + sum(lengths))
+        if lower > 0:
+            # The edge shared with the slice before is averaged with the new lower edge, its frequency stays
+            start -= 1
+            segment = slice(offset - 1, segment.stop)
+            fdx[offset - 1] = self.spectrum.fdx[start]
+        self.spectrum.splice(start, stop, fdx[segment], fdy[segment])
+        return start
+
+    @staticmethod
+    def _lengths(trimmed: list, index: int) -> list:
+        """Returns the number of points the trimmed slices take up in the spectrum, the first slice of the spectrum has both of its edges."""
+        lengths = [len(spectrum_slice) + 1 for spectrum_slice in trimmed]
+        if index == 0 and lengths:
+            lengths[0] += 1
+        return lengths
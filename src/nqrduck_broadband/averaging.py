@@ -0,0 +1,134 @@
+"""This module contains the AdaptiveAveraging class which chooses the number of averages of every frequency step from the signal-to-noise ratio."""
+
+import logging
+import math
+import numpy as np
+from . import stitching
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_snr(measurement, frequency_step: float) -> float:
+    """Estimates the signal-to-noise ratio of the part of a single frequency measurement that is stitched.
+
+    The signal is the maximum magnitude within frequency_step / 2 of the IF. The noise is the RMS of the complex noise,
+    estimated from the median magnitude of the whole spectrum, which is insensitive to the few points of a line:
+    the magnitude of complex gaussian noise is Rayleigh distributed with median = RMS * sqrt(ln 2).
+
+    Args:
+        measurement (Measurement): The single frequency measurement.
+        frequency_step (float): The frequency step of the broadband measurement in Hz.
+
+    Returns:
+        float: The signal-to-noise ratio.
+    """
+    fdx = np.asarray(measurement.fdx)
+    magnitude = stitching.magnitude(measurement.fdy)
+    offset = measurement.IF_frequency * 1e-6
+    half_step = frequency_step / 2 * 1e-6
+    lower, upper = np.searchsorted(fdx, [offset - half_step, offset + half_step])
+    window = magnitude[lower : max(upper, lower + 1)]
+    noise = np.median(magnitude) / math.sqrt(math.log(2))
+    if len(window) == 0 or noise <= 0:
+        return float("inf")
+    return float(np.max(window) / noise)
+
+
+class AdaptiveAveraging:
+    """Chooses the number of averages of every frequency step so its slice reaches a target signal-to-noise ratio.
+
+    The signal-to-noise ratio grows with the square root of the number of averages. After every measurement the number of averages
+    needed to reach target_snr is calculated from its estimated SNR and used for the next frequency step:
+
+    - A slice without a line, with an SNR below detection_snr, only contains noise that does not improve with averaging.
+      The following steps are measured with min_averages.
+    - A slice with a line above target_snr needs fewer averages, the following steps are measured with fewer.
+    - A slice with a weak line, between detection_snr and target_snr, is measured again with the number of averages it needs.
+
+    All numbers of averages are limited to min_averages and max_averages.
+
+    Args:
+        target_snr (float): The signal-to-noise ratio every slice with a line should reach.
+        min_averages (int, optional): The smallest number of averages, max_averages / DEFAULT_AVERAGES_RANGE by default.
+            A weak line in a step measured with too few averages is not detected.
+        max_averages (int): The largest number of averages, the first frequency step is measured with it.
+        detection_snr (float): Slices with a lower signal-to-noise ratio are considered to contain only noise.
+        max_repeats (int): How often a frequency step with a weak line is measured again.
+
+    Attributes:
+        DEFAULT_TARGET_SNR (float): The default target signal-to-noise ratio.
+        DEFAULT_DETECTION_SNR (float): The default signal-to-noise ratio below which a slice only contains noise.
+        DEFAULT_MAX_REPEATS (int): The default number of times a frequency step is measured again.
+        DEFAULT_AVERAGES_RANGE (int): The default ratio of max_averages to min_averages.
+        averages (int): The number of averages of the next measurement.
+        history (list): The frequency, number of averages and estimated SNR of every measurement.
+    """
+
+    DEFAULT_TARGET_SNR = 20.0
+    DEFAULT_DETECTION_SNR = 5.0
+    DEFAULT_MAX_REPEATS = 1
+    DEFAULT_AVERAGES_RANGE = 8
+
+    def __init__(
+        self,
+        target_snr: float = DEFAULT_TARGET_SNR,
+        min_averages: int = None,
+        max_averages: int = 1,
+        detection_snr: float = DEFAULT_DETECTION_SNR,
+        max_repeats: int = DEFAULT_MAX_REPEATS,
+    ) -> None:
+        """Initializes the AdaptiveAveraging."""
+        if min_averages is None:
+            min_averages = max(1, max_averages // self.DEFAULT_AVERAGES_RANGE)
+        if min_averages < 1 or max_averages < min_averages:
+            raise ValueError("The averages have to satisfy 1 <= min_averages <= max_averages.")
+        self.target_snr = target_snr
+        self.min_averages = int(min_averages)
+        self.max_averages = int(max_averages)
+        self.detection_snr = detection_snr
+        self.max_repeats = max_repeats
+        self.averages = self.max_averages
+        self.history = []
+        self._repeats = {}
+
+    def _limit(self, averages: float) -> int:
+        return int(min(max(math.ceil(averages), self.min_averages), self.max_averages))
+
+    def add_measurement(self, measurement, frequency_step: float, averages: int) -> bool:
+        """This method estimates the SNR of a measurement and chooses the number of averages of the next measurement.
+
+        Args:
+            measurement (Measurement): The single frequency measurement.
+            frequency_step (float): The frequency step of the broadband measurement in Hz.
+            averages (int): The number of averages the measurement has been measured with.
+
+        Returns:
+            bool: True if the frequency should be measured again with averages averages.
+        """
+        frequency = measurement.target_frequency
+        snr = estimate_snr(measurement, frequency_step)
+        self.history.append((frequency, averages, snr))
+
+        if snr < self.detection_snr:
+            needed = self.min_averages
+        else:
+            needed = self._limit(averages * (self.target_snr / snr) ** 2)
+
+        repeat = (
+            self.detection_snr <= snr < self.target_snr
+            and needed > averages
+            and self._repeats.get(frequency, 0) < self.max_repeats
+        )
+        if repeat:
+            self._repeats[frequency] = self._repeats.get(frequency, 0) + 1
+        logger.debug(
+            f"SNR {snr:.1f} at {frequency} Hz with {averages} averages, "
+            f"next measurement with {needed} averages{', repeating' if repeat else ''}."
+        )
+        self.averages = needed
+        return repeat
+
+    @property
+    def total_averages(self) -> int:
+        """The number of averages of all measurements so far."""
+        return sum(averages for _, averages, _ in self.history)
@@ -3,10 +3,15 @@
 import logging
 import numpy as np
 import json
-from PyQt6.QtCore import pyqtSlot, pyqtSignal, QTimer
-from PyQt6.QtWidgets import QApplication
+from datetime import datetime
+from pathlib import Path
+from PyQt6.QtCore import pyqtSlot, pyqtSignal
 from quackseq.measurement import Measurement
 from nqrduck.module.module_controller import ModuleController
+from . import storage
+from . import strategies
+from .acquisition import AcquisitionStateMachine
+from .matching import MatchingPolicy
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +32,13 @@ class BroadbandController(ModuleController):
     def __init__(self, module):
         """Initializes the BroadbandController."""
         super().__init__(module)
+        self.acquisition = AcquisitionStateMachine()
+        self.acquisition.command.connect(self.module.nqrduck_signal)
+        self.acquisition.step_started.connect(self.on_step_started)
+        self.acquisition.matching_decided.connect(self.on_matching_decided)
+        self.acquisition.step_repeated.connect(self.on_step_repeated)
+        self.acquisition.state_changed.connect(self.on_acquisition_state_changed)
+        self.acquisition.finished.connect(self.on_broadband_measurement_finished)
 
     @pyqtSlot(str, object)
     def process_signals(self, key: str, value: object) -> None:
@@ -36,14 +48,11 @@ class BroadbandController(ModuleController):
             key (str): Name of the signal.
             value (object): Value of the signal.
         """
-        logger.debug(self.module.model.waiting_for_tune_and_match)
+        logger.debug(self.acquisition.waiting_for_tune_and_match)
 
-        if (
-            key == "measurement_data"
-            and self.module.model.current_broadband_measurement is not None
-        ):
+        if key == "measurement_data" and self.acquisition.running:
             logger.debug("Received single measurement.")
-            self.module.model.current_broadband_measurement.add_measurement(value)
+            self.acquisition.receive_measurement(value)
 
         elif (
             key == "failure_set_averages"
@@ -57,18 +66,10 @@ class BroadbandController(ModuleController):
 
         elif (
             key == "confirm_tune_and_match"
-            and self.module.model.waiting_for_tune_and_match
+            and self.acquisition.waiting_for_tune_and_match
         ):
             logger.debug("Confirmed tune and match.")
-            reflection = value
-            logger.debug("Reflection: " + str(reflection))
-            if reflection is not None:
-                self.module.model.current_broadband_measurement.add_tune_and_match(
-                    reflection
-                )
-            self.module.nqrduck_signal.emit("start_measurement", None)
-            QApplication.processEvents()
-            self.module.model.waiting_for_tune_and_match = False
+            self.acquisition.receive_tune_and_match(value)
 
     def received_LUT(self, LUT: Measurement) -> None:
         """This slot is called when the LUT data is received from the nqrduck module.
@@ -104,6 +105,10 @@ class BroadbandController(ModuleController):
             value (str): Number of averages.
         """
         logger.debug("Setting averages to: " + value)
+        try:
+            self.module.model.averages = int(value)
+        except ValueError:
+            self.module.model.averages = None
         self.module.nqrduck_signal.emit("set_averages", value)
 
     @pyqtSlot(str)
@@ -134,6 +139,136 @@ class BroadbandController(ModuleController):
         except ValueError:
             logger.debug("Invalid frequency step value")
 
+    @pyqtSlot(bool)
+    def change_stream_raw_data(self, value: bool) -> None:
+        """Changes if the raw data of the single frequency measurements is spilled to disk."""
+        logger.debug("Stream raw data: " + str(value))
+        self.module.model.stream_raw_data = value
+
+    @pyqtSlot(bool)
+    def change_autosave(self, value: bool) -> None:
+        """Changes if new broadband measurements are streamed to a file in the autosave directory."""
+        logger.debug("Autosave: " + str(value))
+        self.module.model.autosave = value
+
+    @pyqtSlot(str)
+    def change_autosave_directory(self, value: str) -> None:
+        """Changes the directory new broadband measurements are streamed to.
+
+        Args:
+            value (str): The directory, a leading ~ is expanded to the home directory.
+        """
+        if not value.strip():
+            logger.debug("Invalid autosave directory")
+            # Show the current directory again
+            self.module.model.autosave_directory = self.module.model.autosave_directory
+            return
+        self.module.model.autosave_directory = Path(value.strip()).expanduser()
+
+    @pyqtSlot(bool)
+    def change_store_complex_spectrum(self, value: bool) -> None:
+        """Changes if the phase-corrected complex spectrum is stored when a broadband measurement is finished."""
+        logger.debug("Store complex spectrum: " + str(value))
+        self.module.model.store_complex_spectrum = value
+
+    @pyqtSlot(bool)
+    def change_adaptive_stepping(self, value: bool) -> None:
+        """Changes if new broadband measurements only refine the frequency ranges that show structure."""
+        logger.debug("Adaptive stepping: " + str(value))
+        self.module.model.adaptive_stepping = value
+
+    @pyqtSlot(bool)
+    def change_min_matching_active(self, value: bool) -> None:
+        """Changes if frequencies that are not matched well enough are handled by the minimum matching policy."""
+        logger.debug("Minimum matching active: " + str(value))
+        self.module.model.min_matching_active = value
+
+    @pyqtSlot(int)
+    def change_min_matching(self, value: int) -> None:
+        """Changes the minimum matching.
+
+        Args:
+            value (int): Minimum matching in dB.
+        """
+        logger.debug("Minimum matching: " + str(value))
+        self.module.model.min_matching = float(value)
+
+    @pyqtSlot(str)
+    def change_min_matching_action(self, value: str) -> None:
+        """Changes what happens at frequencies that are not matched well enough.
+
+        Args:
+            value (str): The action, see MatchingPolicy.
+        """
+        if value not in MatchingPolicy.ACTIONS:
+            logger.debug("Unknown minimum matching action: " + str(value))
+            return
+        self.module.model.min_matching_action = value
+
+    @pyqtSlot(bool)
+    def change_pipelined_tune_and_match(self, value: bool) -> None:
+        """Changes if tune and match of the next frequency is requested while the current one is acquired."""
+        logger.debug("Pipelined tune and match: " + str(value))
+        self.module.model.pipelined_tune_and_match = value
+
+    @pyqtSlot(bool)
+    def change_adaptive_averaging(self, value: bool) -> None:
+        """Changes if the number of averages of every frequency step is chosen from the signal-to-noise ratio."""
+        logger.debug("Adaptive averaging: " + str(value))
+        self.module.model.adaptive_averaging = value
+
+    @pyqtSlot(str)
+    def change_target_snr(self, value: str) -> None:
+        """Changes the signal-to-noise ratio adaptive averaging aims for.
+
+        Args:
+            value (str): Target signal-to-noise ratio.
+        """
+        try:
+            value = float(value)
+            if value > 0:
+                self.module.model.target_snr = value
+        except ValueError:
+            logger.debug("Invalid target SNR value")
+
+    @pyqtSlot(str)
+    def change_settle_time(self, value: str) -> None:
+        """Changes the time that is waited before a frequency step is started.
+
+        Args:
+            value (str): Settle time in ms.
+        """
+        try:
+            value = float(value) * 1e-3
+            if value >= 0:
+                self.module.model.settle_time = value
+        except ValueError:
+            logger.debug("Invalid settle time value")
+
+    @pyqtSlot(str)
+    def change_stitching_strategy(self, value: str) -> None:
+        """Changes the strategy the spectrum of a finished broadband measurement is stitched with.
+
+        The current broadband measurement is stitched again right away, unless it is still running.
+
+        Args:
+            value (str): Name of the stitching strategy.
+        """
+        if value not in strategies.STRATEGIES:
+            logger.debug("Unknown stitching strategy: " + str(value))
+            return
+        self.module.model.stitching_strategy = value
+
+        broadband_measurement = self.module.model.current_broadband_measurement
+        if (
+            broadband_measurement is None
+            or self.acquisition.running
+            or broadband_measurement.stitching_strategy == value
+        ):
+            return
+        broadband_measurement.restitch(value)
+        self.module.view.render_scheduler.request()
+
     @pyqtSlot()
     def start_broadband_measurement(self) -> None:
         """Starts a broadband measurement."""
@@ -149,72 +284,276 @@ class BroadbandController(ModuleController):
         logger.debug("Frequency list: " + str(frequency_list))
 
         # Create a new broadband measurement object
+        self.close_broadband_measurement()
         self.module.model.current_broadband_measurement = (
             self.module.model.BroadbandMeasurement(
                 frequency_list, self.module.model.frequency_step
             )
         )
-        self.module.model.current_broadband_measurement.received_measurement.connect(
-            self.module.view.on_broadband_measurement_added
-        )
-        self.module.model.current_broadband_measurement.received_measurement.connect(
-            self.on_broadband_measurement_added
-        )
+        self.open_autosave_stream()
+        self.connect_broadband_measurement()
 
         self.module.view.add_info_text("Starting broadband measurement.")
         # Start the first measurement
-        QTimer.singleShot(500, lambda: self.start_single_measurement(start_frequency))
-        QApplication.processEvents()
+        self.start_acquisition()
 
-    @pyqtSlot()
-    def on_broadband_measurement_added(self) -> None:
-        """This slot is called when a single measurement is added to the broadband measurement.
-
-        It then checks if there are more frequencies to measure and if so, starts the next measurement.
-        Furthermore it updates the plots.
-        """
-        logger.debug("Broadband measurement added.")
-        # Check if there are more frequencies to measure
-        if not self.module.model.current_broadband_measurement.is_complete():
-            # Get the next frequency to measure
-            next_frequency = self.module.model.current_broadband_measurement.get_next_measurement_frequency()
-            logger.debug("Next frequency: " + str(next_frequency))
-            QTimer.singleShot(
-                500, lambda: self.start_single_measurement(next_frequency)
+    def resume_broadband_measurement(self, file_name: str) -> None:
+        """Resumes an interrupted broadband measurement from its stream file.
+
+        The measurement is rebuilt from the file and continued at the first frequency that has not been measured yet.
+        New measurements are appended to the same file.
+
+        Args:
+            file_name (str): Name of the stream file.
+        """
+        logger.debug("Resuming measurement from file: " + file_name)
+        if not storage.is_broadband_file(file_name):
+            self.module.view.add_info_text(
+                "Only binary broadband files can be resumed."
             )
-            QApplication.processEvents()
-        else:
-            self.module.view.add_info_text("Broadband measurement finished.")
+            return
 
-    @pyqtSlot()
-    def delete_LUT(self) -> None:
-        """This slot is called when the LUT is deleted."""
-        self.module.model.LUT = None
+        self.close_broadband_measurement()
+        self.module.model.current_broadband_measurement = (
+            self.module.model.BroadbandMeasurement.resume(file_name)
+        )
+        broadband_measurement = self.module.model.current_broadband_measurement
+        if broadband_measurement.get_finished_percentage() > 0:
+            self.module.view.on_broadband_measurement_added()
+
+        if broadband_measurement.is_complete():
+            broadband_measurement.finish_stream()
+            self.module.view.add_info_text("Broadband measurement is already complete.")
+            return
+
+        self.connect_broadband_measurement()
+        next_frequency = broadband_measurement.get_next_measurement_frequency()
+        self.module.view.add_info_text(
+            "Resuming broadband measurement at frequency: " + str(next_frequency)
+        )
+        self.start_acquisition()
+
+    def start_acquisition(self) -> None:
+        """Starts measuring the missing frequencies of the current broadband measurement with the settings of the model."""
+        self.acquisition.scheduler.settle_time = self.module.model.settle_time
+        self.acquisition.scheduler.settle_times = self.module.model.settle_times
+        self.acquisition.matching_policy = self.module.model.create_matching_policy()
+        self.acquisition.averaging = self.module.model.create_adaptive_averaging()
+        self.acquisition.lut_index = self.module.model.LUT_index
+        self.acquisition.pipelined = self.module.model.pipelined_tune_and_match
+        self.check_LUT_coverage()
+        if self.module.model.adaptive_averaging and self.acquisition.averaging is None:
+            self.module.view.add_info_text(
+                "Adaptive averaging needs the number of averages, measuring with fixed averages."
+            )
+        self.acquisition.start(
+            self.module.model.current_broadband_measurement,
+            self.module.model.LUT is not None,
+        )
+
+    def check_LUT_coverage(self) -> None:
+        """Warns in the info box if frequencies of the current broadband measurement can not be resolved in the LUT."""
+        LUT_index = self.module.model.LUT_index
+        if self.module.model.LUT is None or LUT_index is None:
+            return
+        broadband_measurement = self.module.model.current_broadband_measurement
+        uncovered = LUT_index.uncovered(broadband_measurement.single_frequency_measurements)
+        if uncovered:
+            self.module.view.add_info_text(
+                f"Warning: {len(uncovered)} frequencies between {min(uncovered) * 1e-6:.4f} and {max(uncovered) * 1e-6:.4f} MHz "
+                f"are outside the LUT ({LUT_index.frequencies[0]:.4f} to {LUT_index.frequencies[-1]:.4f} MHz) or have no LUT entry."
+            )
+
+    def connect_broadband_measurement(self) -> None:
+        """Applies the settings of the model to the current broadband measurement and connects its signals.
+
+        The spectrum is stitched in a background thread, so neither the acquisition nor the user interface wait for it.
+        """
+        broadband_measurement = self.module.model.current_broadband_measurement
+        broadband_measurement.checkpoint_interval = (
+            self.module.model.checkpoint_interval
+        )
+        if self.module.model.stream_raw_data:
+            broadband_measurement.enable_streaming()
+        if self.module.model.adaptive_stepping:
+            broadband_measurement.enable_adaptive_stepping()
+        broadband_measurement.enable_background_stitching()
+        broadband_measurement.received_measurement.connect(
+            self.module.view.on_broadband_measurement_added
+        )
+        broadband_measurement.spectrum_changed.connect(
+            self.module.view.render_scheduler.request
+        )
 
-    def start_single_measurement(self, frequency: float) -> None:
-        """Starts a single measurement.
+    @pyqtSlot(float)
+    def on_step_started(self, frequency: float) -> None:
+        """This slot is called when the acquisition starts the measurement at a frequency.
 
         Args:
-            frequency (float): Frequency in MHz.
+            frequency (float): Frequency in Hz.
         """
-        logger.debug("Starting single measurement.")
+        idle_time = self.acquisition.scheduler.idle_times.get(frequency, 0.0)
+        logger.debug(f"Starting single measurement after {idle_time:.3f} s idle time.")
         self.module.view.add_info_text(
             "Starting measurement at frequency: " + str(frequency)
         )
-        # First set the frequency of the spectrometer
-        self.module.nqrduck_signal.emit("set_frequency", str(frequency))
-        QApplication.processEvents()
-        # If there is a LUT available, send the tune and match values as signal
-        if self.module.model.LUT is not None:
-            self.module.model.waiting_for_tune_and_match = True
-            # We need the entry number of the LUT for the current frequency
-
-            self.module.nqrduck_signal.emit("set_tune_and_match", frequency * 1e-6)
-            QApplication.processEvents()
+
+    @pyqtSlot(object)
+    def on_matching_decided(self, decision) -> None:
+        """This slot is called when the minimum matching policy has handled a frequency.
+
+        Args:
+            decision (MatchingDecision): The decision of the policy.
+        """
+        if decision.action == MatchingPolicy.MEASURE:
+            return
+        message = f"Reflection {decision.reflection:.1f} dB at frequency {decision.frequency}: "
+        if decision.action == MatchingPolicy.SKIP:
+            message += "skipped."
+        elif decision.action == MatchingPolicy.RETRY:
+            message += "retrying tune and match."
         else:
-            self.module.nqrduck_signal.emit("start_measurement", None)
-            self.module.model.waiting_for_tune_and_match = False
-            QApplication.processEvents()
+            message += f"measuring with {decision.averages} averages."
+        self.module.view.add_info_text(message)
+
+    @pyqtSlot(float, int)
+    def on_step_repeated(self, frequency: float, averages: int) -> None:
+        """This slot is called when adaptive averaging measures a frequency with a weak line again.
+
+        Args:
+            frequency (float): Frequency in Hz.
+            averages (int): Number of averages of the new measurement.
+        """
+        self.module.view.add_info_text(
+            f"Weak signal at frequency {frequency}, measuring again with {averages} averages."
+        )
+
+    @pyqtSlot(str)
+    def on_acquisition_state_changed(self, state: str) -> None:
+        """This slot is called when the state of the acquisition changes.
+
+        Args:
+            state (str): The new state of the acquisition.
+        """
+        self.module.model.waiting_for_tune_and_match = (
+            self.acquisition.waiting_for_tune_and_match
+        )
+
+    @pyqtSlot()
+    def on_broadband_measurement_finished(self) -> None:
+        """This slot is called when all frequencies of the broadband measurement have been measured."""
+        scheduler = self.acquisition.scheduler
+        broadband_measurement = self.module.model.current_broadband_measurement
+        if broadband_measurement.plan is not None:
+            plan = broadband_measurement.plan
+            self.module.view.add_info_text(
+                f"Adaptive stepping measured {plan.measured_count} of {len(plan.frequencies)} frequencies, "
+                f"{len(plan.refined)} ranges refined."
+            )
+        if broadband_measurement.stitching_strategy != self.module.model.stitching_strategy:
+            broadband_measurement.restitch(self.module.model.stitching_strategy)
+        if (
+            self.module.model.store_complex_spectrum
+            and broadband_measurement.broadband_data_complex_fdy is None
+        ):
+            broadband_measurement.compute_complex_spectrum()
+        broadband_measurement.finish_stream()
+        self.module.view.add_info_text("Broadband measurement finished.")
+        averaging = self.acquisition.averaging
+        if averaging is not None and averaging.history:
+            fixed_averages = averaging.max_averages * len(
+                {frequency for frequency, _, _ in averaging.history}
+            )
+            self.module.view.add_info_text(
+                f"Adaptive averaging: {averaging.total_averages} scans in total, {fixed_averages} with fixed averages."
+            )
+        policy = self.acquisition.matching_policy
+        if policy is not None and policy.decisions:
+            self.module.view.add_info_text(
+                f"Minimum matching: {policy.count(MatchingPolicy.SKIP)} frequencies skipped, "
+                f"{policy.count(MatchingPolicy.RETRY)} retries, "
+                f"{policy.count(MatchingPolicy.REDUCE_AVERAGES)} measured with reduced averages."
+            )
+        if self.acquisition.tune_and_match:
+            request_latency = self.acquisition.mean_latency(
+                AcquisitionStateMachine.TUNE_AND_MATCH_STAGE
+            )
+            wait_latency = self.acquisition.mean_latency(
+                AcquisitionStateMachine.TUNE_AND_MATCH_WAIT_STAGE
+            )
+            pipelined = " (pipelined)" if self.acquisition.pipelined else ""
+            self.module.view.add_info_text(
+                f"Tune and match: {request_latency:.3f} s per request, {wait_latency:.3f} s waited per step{pipelined}."
+            )
+        self.show_performance_report()
+        max_idle_time = max(scheduler.idle_times.values(), default=0.0)
+        self.module.view.add_info_text(
+            f"Idle time between steps: {scheduler.total_idle_time:.3f} s in total, {max_idle_time:.3f} s at most."
+        )
+
+    @pyqtSlot()
+    def show_performance_report(self) -> None:
+        """Writes the summary of the step timings of the current broadband measurement to the info box."""
+        broadband_measurement = self.module.model.current_broadband_measurement
+        if broadband_measurement is None or not len(broadband_measurement.timings):
+            self.module.view.add_info_text("No step timings have been recorded.")
+            return
+        for line in broadband_measurement.timings.report():
+            self.module.view.add_info_text(line)
+
+    @pyqtSlot(float)
+    def show_single_measurement(self, frequency: float) -> None:
+        """Shows the single frequency measurement at the given frequency in the time and frequency domain plots.
+
+        The measurement is loaded from disk if its raw data has been spilled.
+
+        Args:
+            frequency (float): The target frequency of the measurement in Hz.
+        """
+        broadband_measurement = self.module.model.current_broadband_measurement
+        if broadband_measurement is None:
+            return
+
+        measurement = broadband_measurement.get_measurement(frequency)
+        if measurement is None:
+            return
+
+        logger.debug("Showing single measurement at frequency: " + str(frequency))
+        self.module.view.show_single_measurement(measurement)
+
+    def open_autosave_stream(self) -> None:
+        """Streams the current broadband measurement to a file in the autosave directory.
+
+        Every single frequency measurement is appended to the file as it arrives, so a crash does not lose the measured data.
+        Nothing is written if autosave is not active.
+        """
+        if not self.module.model.autosave:
+            logger.debug("Autosave is not active.")
+            return
+        directory = self.module.model.autosave_directory
+        file_name = (
+            directory
+            / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.{self.module.model.FILE_EXTENSION}"
+        )
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            self.module.model.current_broadband_measurement.open_stream(file_name)
+        except OSError as e:
+            logger.error(f"Could not open autosave file: {e}")
+            self.module.view.add_info_text("Could not open autosave file.")
+            return
+        self.module.view.add_info_text(f"Streaming measurement to file: {file_name}")
+
+    def close_broadband_measurement(self) -> None:
+        """Stops the acquisition and releases the on-disk data of the current broadband measurement before it is replaced."""
+        self.acquisition.stop()
+        if self.module.model.current_broadband_measurement is not None:
+            self.module.model.current_broadband_measurement.close()
+
+    @pyqtSlot()
+    def delete_LUT(self) -> None:
+        """This slot is called when the LUT is deleted."""
+        self.module.model.LUT = None
 
     def save_measurement(self, file_name: str) -> None:
         """Saves the current broadband measurement to a file.
@@ -224,10 +563,11 @@ class BroadbandController(ModuleController):
         """
         logger.debug("Saving measurement to file: " + file_name)
         self.module.view.add_info_text("Saving measurement to file: " + file_name)
-        QApplication.processEvents()
 
-        with open(file_name, "w") as f:
-            json.dump(self.module.model.current_broadband_measurement.to_json(), f)
+        try:
+            self.module.model.current_broadband_measurement.save(file_name)
+        except ValueError as error:
+            self.module.view.add_info_text(str(error))
 
     def load_measurement(self, file_name: str) -> None:
         """Loads a broadband measurement from a file.
@@ -237,11 +577,21 @@ class BroadbandController(ModuleController):
         """
         logger.debug("Loading measurement from file: " + file_name)
 
-        with open(file_name) as f:
-            measurement = json.load(f)
+        self.close_broadband_measurement()
+        if storage.is_broadband_file(file_name):
+            self.module.model.current_broadband_measurement = (
+                self.module.model.BroadbandMeasurement.from_file(file_name)
+            )
+        else:
+            # Files written by older versions of the module are json
+            with open(file_name) as f:
+                measurement = json.load(f)
             self.module.model.current_broadband_measurement = (
                 self.module.model.BroadbandMeasurement.from_json(measurement)
             )
-            self.module.view.add_info_text("Measurement loaded.")
-            self.module.view.on_broadband_measurement_added()
-            QApplication.processEvents()
+        # The selected strategy follows the spectrum stored in the file
+        self.module.model.stitching_strategy = (
+            self.module.model.current_broadband_measurement.stitching_strategy
+        )
+        self.module.view.add_info_text("Measurement loaded.")
+        self.module.view.on_broadband_measurement_added()
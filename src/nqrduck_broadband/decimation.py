@@ -0,0 +1,197 @@
+"""This module contains the level-of-detail decimation of the broadband spectrum used for plotting."""
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _Level:
+    """A single level of the MinMaxPyramid.
+
+    Every bin of the level stores the index of the minimum and the index of the maximum of the spectrum points it covers.
+    The arrays are preallocated and grow by doubling, like the SpectrumBuffer.
+    """
+
+    def __init__(self) -> None:
+        """Initializes the _Level."""
+        self._minimum = np.empty(0, dtype=np.intp)
+        self._maximum = np.empty(0, dtype=np.intp)
+        self.length = 0
+
+    @property
+    def minimum(self) -> np.array:
+        """The indices of the minima of the bins."""
+        return self._minimum[: self.length]
+
+    @property
+    def maximum(self) -> np.array:
+        """The indices of the maxima of the bins."""
+        return self._maximum[: self.length]
+
+    def write(self, start: int, minimum: np.array, maximum: np.array) -> None:
+        """Replaces the bins from start on.
+
+        Args:
+            start (int): The first bin that is replaced.
+            minimum (np.array): The indices of the minima of the new bins.
+            maximum (np.array): The indices of the maxima of the new bins.
+        """
+        stop = start + len(minimum)
+        if stop > len(self._minimum):
+            capacity = max(stop, 2 * len(self._minimum))
+            self._minimum = np.resize(self._minimum, capacity)
+            self._maximum = np.resize(self._maximum, capacity)
+        self._minimum[start:stop] = minimum
+        self._maximum[start:stop] = maximum
+        self.length = stop
+
+
+def _reduce(minimum: np.array, maximum: np.array, fdy: np.array, factor: int) -> tuple:
+    """Combines groups of factor bins into one bin.
+
+    Args:
+        minimum (np.array): The indices of the minima of the bins.
+        maximum (np.array): The indices of the maxima of the bins.
+        fdy (np.array): The magnitude values of the spectrum.
+        factor (int): The number of bins that are combined.
+
+    Returns:
+        tuple: The indices of the minima and maxima of the combined bins.
+    """
+    full = len(minimum) // factor * factor
+    rows = np.arange(full // factor)
+
+    grouped_minimum = minimum[:full].reshape(-1, factor)
+    grouped_maximum = maximum[:full].reshape(-1, factor)
+    reduced_minimum = grouped_minimum[rows, fdy[grouped_minimum].argmin(axis=1)]
+    reduced_maximum = grouped_maximum[rows, fdy[grouped_maximum].argmax(axis=1)]
+
+    if full < len(minimum):
+        # The last bin is only partially filled
+        rest_minimum = minimum[full:]
+        rest_maximum = maximum[full:]
+        reduced_minimum = np.append(reduced_minimum, rest_minimum[fdy[rest_minimum].argmin()])
+        reduced_maximum = np.append(reduced_maximum, rest_maximum[fdy[rest_maximum].argmax()])
+
+    return reduced_minimum, reduced_maximum
+
+
+class MinMaxPyramid:
+    """Min/max decimation pyramid of the broadband spectrum.
+
+    Level n of the pyramid combines factor**(n + 1) points of the spectrum into one bin that keeps the minimum and the maximum of these points.
+    Plotting the minimum and maximum of every bin preserves all peaks of the spectrum while only drawing about two points per bin.
+    The pyramid only stores indices into the spectrum, so it stays valid when the spectrum buffer is reallocated.
+
+    Args:
+        factor (int): The number of bins of a level that are combined into one bin of the next level.
+    """
+
+    def __init__(self, factor: int = 4) -> None:
+        """Initializes the MinMaxPyramid."""
+        if factor < 2:
+            raise ValueError("The decimation factor has to be at least 2.")
+        self.factor = factor
+        self._levels = []
+        self._length = 0
+
+    def __len__(self) -> int:
+        """Number of spectrum points covered by the pyramid."""
+        return self._length
+
+    def clear(self) -> None:
+        """Discards all levels of the pyramid."""
+        self._levels = []
+        self._length = 0
+
+    def update(self, fdy: np.array, start: int) -> None:
+        """Updates the pyramid after the spectrum has changed from index start on.
+
+        Only the bins covering the changed points are recalculated,
+        so stitching a slice to the end of the spectrum only costs time proportional to the size of the slice.
+
+        Args:
+            fdy (np.array): The magnitude values of the whole spectrum.
+            start (int): The first index of the spectrum that has changed.
+        """
+        length = len(fdy)
+        start = min(max(start, 0), self._length, length)
+        self._length = length
+
+        # Bins of level 0 cover factor points of the spectrum
+        bin_start = start // self.factor
+        indices = np.arange(bin_start * self.factor, length)
+        minimum, maximum = _reduce(indices, indices, fdy, self.factor)
+
+        level_number = 0
+        while True:
+            if level_number == len(self._levels):
+                self._levels.append(_Level())
+            level = self._levels[level_number]
+            level.write(bin_start, minimum, maximum)
+            if level.length <= 1:
+                break
+
+            # Recalculate the bins of the next level that cover the changed bins
+            bin_start = bin_start // self.factor
+            minimum, maximum = _reduce(
+                level.minimum[bin_start * self.factor :],
+                level.maximum[bin_start * self.factor :],
+                fdy,
+                self.factor,
+            )
+            level_number += 1
+
+        del self._levels[level_number + 1 :]
+
+    def rebuild(self, fdy: np.array) -> None:
+        """Builds the pyramid for a whole spectrum.
+
+        Args:
+            fdy (np.array): The magnitude values of the spectrum.
+        """
+        self.clear()
+        self.update(fdy, 0)
+
+    def query(
+        self, fdx: np.array, fdy: np.array, x_lower: float, x_upper: float, max_points: int
+    ) -> tuple:
+        """Returns the spectrum between two frequencies with at most about max_points points.
+
+        If the range contains more points, the coarsest level whose bins are still narrower than two points per bin is used
+        and the minimum and maximum of every bin are returned in the order they appear in the spectrum.
+
+        Args:
+            fdx (np.array): The frequency values of the spectrum, sorted in ascending order.
+            fdy (np.array): The magnitude values of the spectrum.
+            x_lower (float): The lower frequency of the range.
+            x_upper (float): The upper frequency of the range.
+            max_points (int): The maximum number of points, usually twice the width of the plot in pixels.
+
+        Returns:
+            tuple: The frequency and magnitude values of the decimated spectrum.
+        """
+        if self._length != len(fdy):
+            self.rebuild(fdy)
+
+        # One point outside of the range on each side, so the line reaches the edges of the plot
+        lower = max(int(np.searchsorted(fdx, x_lower, side="left")) - 1, 0)
+        upper = min(int(np.searchsorted(fdx, x_upper, side="right")) + 1, len(fdx))
+        if upper - lower <= max_points:
+            return fdx[lower:upper], fdy[lower:upper]
+
+        bin_size = self.factor
+        for level in self._levels:
+            bin_start = lower // bin_size
+            bin_stop = -(-upper // bin_size)
+            if 2 * (bin_stop - bin_start) <= max_points or level is self._levels[-1]:
+                break
+            bin_size *= self.factor
+
+        minimum = level.minimum[bin_start:bin_stop]
+        maximum = level.maximum[bin_start:bin_stop]
+        indices = np.stack(
+            [np.minimum(minimum, maximum), np.maximum(minimum, maximum)], axis=1
+        ).ravel()
+        return fdx[indices], fdy[indices]
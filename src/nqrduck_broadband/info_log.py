@@ -0,0 +1,101 @@
+"""This module contains the InfoLogModel class which holds the messages shown in the info box of the broadband module."""
+
+import logging
+from collections import deque
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt
+
+logger = logging.getLogger(__name__)
+
+
+class InfoLogModel(QAbstractListModel):
+    """Ring buffer of the messages shown in the info box.
+
+    Only the last max_lines messages are kept, older messages are dropped.
+    The model is shown in a QListView, which only creates the rows that are visible,
+    so the cost of the info box stays the same no matter how many messages have been added.
+    Every message can additionally be appended to a log file.
+
+    Args:
+        max_lines (int): The maximum number of messages that are kept.
+        file_name (str, optional): The file every message is appended to.
+    """
+
+    def __init__(self, max_lines: int, file_name: str = None) -> None:
+        """Initializes the InfoLogModel."""
+        super().__init__()
+        self._lines = deque(maxlen=max_lines)
+        self._file = None
+        self.file_name = file_name
+
+    @property
+    def max_lines(self) -> int:
+        """The maximum number of messages that are kept."""
+        return self._lines.maxlen
+
+    @max_lines.setter
+    def max_lines(self, value: int):
+        self.beginResetModel()
+        self._lines = deque(self._lines, maxlen=max(1, int(value)))
+        self.endResetModel()
+
+    @property
+    def file_name(self) -> str:
+        """The file every message is appended to, None if the messages are only shown."""
+        return self._file_name
+
+    @file_name.setter
+    def file_name(self, value: str):
+        self.close()
+        self._file_name = value
+        if value is not None:
+            try:
+                self._file = open(value, "a", encoding="utf-8")
+            except OSError as e:
+                logger.error(f"Could not open info log file: {e}")
+                self._file_name = None
+
+    def append(self, text: str) -> None:
+        """This method adds a message to the end of the log.
+
+        If the log is full the oldest message is dropped.
+
+        Args:
+            text (str): The message.
+        """
+        if len(self._lines) == self._lines.maxlen:
+            self.beginRemoveRows(QModelIndex(), 0, 0)
+            self._lines.popleft()
+            self.endRemoveRows()
+
+        row = len(self._lines)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._lines.append(text)
+        self.endInsertRows()
+
+        if self._file is not None:
+            self._file.write(text + "\n")
+            self._file.flush()
+
+    def clear(self) -> None:
+        """This method removes all messages from the log, the log file is kept."""
+        self.beginResetModel()
+        self._lines.clear()
+        self.endResetModel()
+
+    def close(self) -> None:
+        """This method closes the log file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        """Number of messages in the log."""
+        if parent.isValid():
+            return 0
+        return len(self._lines)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        """The message of a row of the log."""
+        if role == Qt.ItemDataRole.DisplayRole and 0 <= index.row() < len(self._lines):
+            return self._lines[index.row()]
+        return None
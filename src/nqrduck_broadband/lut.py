@@ -0,0 +1,157 @@
+"""This module contains the LUTIndex class which resolves the tune and match settings of the sweep frequencies in a lookup table (LUT)."""
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LUTEntry(float):
+    """The frequency of a tune and match request in MHz together with the resolved LUT entry.
+
+    The entry is a float with the value of the frequency, so a receiver that looks up the frequency in its LUT itself keeps working.
+    Receivers that know the entry can use the tuning and matching values directly and skip the lookup.
+
+    Attributes:
+        tuning (float): The tuning voltage or position.
+        matching (float): The matching voltage or position.
+        interpolated (bool): True if the values have been interpolated between two entries of the LUT.
+        lut_type (str): The type of the LUT, e.g. "Electrical" or "Mechanical".
+    """
+
+    def __new__(
+        cls,
+        frequency: float,
+        tuning: float,
+        matching: float,
+        interpolated: bool = False,
+        lut_type: str = None,
+    ) -> "LUTEntry":
+        """Creates the LUTEntry."""
+        entry = super().__new__(cls, frequency)
+        entry.tuning = tuning
+        entry.matching = matching
+        entry.interpolated = interpolated
+        entry.lut_type = lut_type
+        return entry
+
+    def __repr__(self) -> str:
+        """Returns the frequency and the values of the entry."""
+        interpolated = ", interpolated" if self.interpolated else ""
+        return f"LUTEntry({float(self)!r} MHz, tuning={self.tuning!r}, matching={self.matching!r}{interpolated})"
+
+
+class LUTIndex:
+    """Sorted index of the entries of a LUT.
+
+    The index is built once when the LUT changes. Resolving a frequency is a binary search instead of a lookup in the LUT at every step.
+    Frequencies between two entries are linearly interpolated, the positions of a mechanical LUT are rounded to whole steps.
+
+    Args:
+        frequencies (np.array): The frequencies of the entries in MHz.
+        values (np.array): The tuning and matching values of the entries, one row per entry. Missing values are nan.
+        lut_type (str, optional): The type of the LUT.
+
+    Attributes:
+        MECHANICAL (str): The type of LUTs with stepper positions.
+    """
+
+    MECHANICAL = "Mechanical"
+
+    def __init__(self, frequencies, values, lut_type: str = None) -> None:
+        """Initializes the LUTIndex."""
+        frequencies = np.asarray(frequencies, dtype=float)
+        values = np.asarray(values, dtype=float).reshape(len(frequencies), 2)
+        order = np.argsort(frequencies)
+        self.frequencies = frequencies[order]
+        self.values = values[order]
+        self.lut_type = lut_type
+        self._complete = np.all(np.isfinite(self.values), axis=1)
+        # Frequencies closer than this to an entry use the entry itself
+        spacing = np.diff(self.frequencies)
+        self._tolerance = (spacing.min() if len(spacing) else 1.0) * 1e-6
+
+    @classmethod
+    def from_LUT(cls, LUT) -> "LUTIndex":
+        """Builds the index of a LUT of the AutoTM module.
+
+        Args:
+            LUT (LookupTable): The LUT, its data maps the frequencies in MHz to the tuning and matching values.
+
+        Returns:
+            LUTIndex: The index or None if the LUT has no entries.
+        """
+        data = getattr(LUT, "data", None)
+        if not data:
+            return None
+        frequencies = list(data.keys())
+        values = [
+            [np.nan if value is None else value for value in entry]
+            for entry in data.values()
+        ]
+        index = cls(frequencies, values, getattr(LUT, "TYPE", None))
+        logger.debug(
+            f"Built LUT index with {len(index)} entries "
+            f"from {index.frequencies[0]} to {index.frequencies[-1]} MHz."
+        )
+        return index
+
+    def __len__(self) -> int:
+        """Returns the number of entries."""
+        return len(self.frequencies)
+
+    def resolve(self, frequency: float) -> LUTEntry:
+        """This method resolves the entry of a frequency.
+
+        Args:
+            frequency (float): The frequency in Hz.
+
+        Returns:
+            LUTEntry: The entry or None if the frequency is outside the LUT or the entries around it are incomplete.
+        """
+        value = frequency * 1e-6
+        position = int(np.searchsorted(self.frequencies, value))
+
+        # The nearest entry is used if the frequency is one of the LUT frequencies
+        for candidate in (position - 1, position):
+            if (
+                0 <= candidate < len(self)
+                and abs(self.frequencies[candidate] - value) <= self._tolerance
+            ):
+                if not self._complete[candidate]:
+                    return None
+                tuning, matching = self.values[candidate]
+                return self._entry(value, tuning, matching, False)
+
+        if position == 0 or position == len(self):
+            return None
+        lower, upper = position - 1, position
+        if not (self._complete[lower] and self._complete[upper]):
+            return None
+        weight = (value - self.frequencies[lower]) / (
+            self.frequencies[upper] - self.frequencies[lower]
+        )
+        tuning, matching = (
+            self.values[lower] + (self.values[upper] - self.values[lower]) * weight
+        )
+        return self._entry(value, tuning, matching, True)
+
+    def _entry(
+        self, value: float, tuning: float, matching: float, interpolated: bool
+    ) -> LUTEntry:
+        if self.lut_type == self.MECHANICAL:
+            tuning, matching = int(round(tuning)), int(round(matching))
+        else:
+            tuning, matching = float(tuning), float(matching)
+        return LUTEntry(value, tuning, matching, interpolated, self.lut_type)
+
+    def uncovered(self, frequencies) -> list:
+        """This method returns the frequencies that can not be resolved, because they are outside the LUT or its entries are incomplete.
+
+        Args:
+            frequencies (list): The frequencies in Hz.
+
+        Returns:
+            list: The frequencies that can not be resolved in Hz.
+        """
+        return [frequency for frequency in frequencies if self.resolve(frequency) is None]
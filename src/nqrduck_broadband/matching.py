@@ -0,0 +1,174 @@
+"""This module contains the MatchingPolicy class which decides what happens at frequencies where tune and match fails."""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MatchingDecision:
+    """A decision of the MatchingPolicy at a single frequency.
+
+    Attributes:
+        frequency (float): The frequency in Hz.
+        reflection (float): The reflection reported by tune and match in dB.
+        action (str): The action that has been taken, one of the actions of MatchingPolicy.
+        attempt (int): The number of times tune and match has been retried at the frequency before.
+        averages (int): The number of averages the frequency is measured with, None if they have not been changed.
+    """
+
+    __slots__ = ("frequency", "reflection", "action", "attempt", "averages")
+
+    def __init__(
+        self,
+        frequency: float,
+        reflection: float,
+        action: str,
+        attempt: int = 0,
+        averages: int = None,
+    ) -> None:
+        """Initializes the MatchingDecision."""
+        self.frequency = frequency
+        self.reflection = reflection
+        self.action = action
+        self.attempt = attempt
+        self.averages = averages
+
+    def to_json(self) -> dict:
+        """Converts the decision to a json-compatible format.
+
+        Returns:
+            dict: The json-compatible format of the decision.
+        """
+        return {
+            "frequency": float(self.frequency),
+            "reflection": float(self.reflection),
+            "action": self.action,
+            "attempt": int(self.attempt),
+            "averages": self.averages,
+        }
+
+    @classmethod
+    def from_json(cls, json: dict) -> "MatchingDecision":
+        """Converts the json format to a decision.
+
+        Args:
+            json (dict): The json format of the decision.
+
+        Returns:
+            MatchingDecision: The decision.
+        """
+        return cls(
+            json["frequency"],
+            json["reflection"],
+            json["action"],
+            json.get("attempt", 0),
+            json.get("averages"),
+        )
+
+
+class MatchingPolicy:
+    """Policy for frequencies where the reflection after tune and match is worse than a minimum matching.
+
+    A full acquisition at a frequency the probe is not matched to mostly measures reflected power, so the policy decides instead:
+
+    - SKIP: The frequency is not measured.
+    - RETRY: Tune and match is repeated up to max_retries times, the frequency is skipped if it still fails.
+    - REDUCE_AVERAGES: The frequency is measured with averages / averages_divisor averages.
+      If the number of averages is unknown the frequency is skipped.
+
+    Every decision is kept in the decisions list.
+
+    Args:
+        threshold (float): The minimum matching, reflections above it in dB are worse.
+        action (str): The action for frequencies that are not matched well enough.
+        max_retries (int): The number of times tune and match is retried with the RETRY action.
+        averages (int, optional): The number of averages of the measurement.
+        averages_divisor (int): The factor the averages are reduced by with the REDUCE_AVERAGES action.
+
+    Attributes:
+        MEASURE (str): The frequency is measured, used after a successful retry.
+        SKIP (str): The frequency is skipped.
+        RETRY (str): Tune and match is repeated.
+        REDUCE_AVERAGES (str): The frequency is measured with fewer averages.
+        ACTIONS (dict): The labels of the actions that can be selected by action.
+        DEFAULT_THRESHOLD (float): The default minimum matching in dB.
+        DEFAULT_ACTION (str): The default action.
+        DEFAULT_MAX_RETRIES (int): The default number of times tune and match is retried.
+        DEFAULT_AVERAGES_DIVISOR (int): The default factor the averages are reduced by.
+    """
+
+    MEASURE = "measure"
+    SKIP = "skip"
+    RETRY = "retry"
+    REDUCE_AVERAGES = "reduce_averages"
+
+    ACTIONS = {
+        SKIP: "Skip frequency",
+        RETRY: "Retry tune and match",
+        REDUCE_AVERAGES: "Reduce averages",
+    }
+
+    DEFAULT_THRESHOLD = -12.0
+    DEFAULT_ACTION = SKIP
+    DEFAULT_MAX_RETRIES = 2
+    DEFAULT_AVERAGES_DIVISOR = 4
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        action: str = DEFAULT_ACTION,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        averages: int = None,
+        averages_divisor: int = DEFAULT_AVERAGES_DIVISOR,
+    ) -> None:
+        """Initializes the MatchingPolicy."""
+        if action not in self.ACTIONS:
+            raise ValueError(f"Unknown minimum matching action: {action}")
+        self.threshold = threshold
+        self.action = action
+        self.max_retries = max_retries
+        self.averages = averages
+        self.averages_divisor = averages_divisor
+        self.decisions = []
+        self._attempts = {}
+
+    def is_matched(self, reflection: float) -> bool:
+        """Returns True if the reflection in dB reaches the minimum matching."""
+        return reflection <= self.threshold
+
+    def decide(self, frequency: float, reflection: float) -> MatchingDecision:
+        """This method decides what happens at a frequency after tune and match has reported its reflection.
+
+        Args:
+            frequency (float): The frequency in Hz.
+            reflection (float): The reflection in dB.
+
+        Returns:
+            MatchingDecision: The decision or None if the frequency is matched at the first attempt and measured as usual.
+        """
+        attempt = self._attempts.pop(frequency, 0)
+        averages = None
+        if self.is_matched(reflection):
+            if attempt == 0:
+                return None
+            action = self.MEASURE
+        elif self.action == self.RETRY and attempt < self.max_retries:
+            action = self.RETRY
+            self._attempts[frequency] = attempt + 1
+        elif self.action == self.REDUCE_AVERAGES and self.averages is not None:
+            action = self.REDUCE_AVERAGES
+            averages = max(1, self.averages // self.averages_divisor)
+        else:
+            action = self.SKIP
+
+        decision = MatchingDecision(frequency, reflection, action, attempt, averages)
+        logger.debug(
+            f"Reflection {reflection:.1f} dB at {frequency} Hz, "
+            f"minimum matching {self.threshold:.1f} dB: {action}"
+        )
+        self.decisions.append(decision)
+        return decision
+
+    def count(self, action: str) -> int:
+        """Returns the number of decisions with the given action."""
+        return sum(1 for decision in self.decisions if decision.action == action)
@@ -1,12 +1,26 @@
 """This module contains the BroadbandModel class which is the model for the Broadband module."""
 
 import logging
+import os
+import shutil
+import tempfile
 import numpy as np
+from pathlib import Path
 from collections import OrderedDict
-from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore import pyqtSignal, QObject
 from nqrduck.module.module_model import ModuleModel
 from quackseq.measurement import Measurement
+from . import reprocessing
+from .adaptive import AdaptivePlan, AdaptiveStitcher
+from .averaging import AdaptiveAveraging
+from .lut import LUTIndex
+from .matching import MatchingDecision, MatchingPolicy
+from . import stitching
+from . import storage
+from . import strategies
+from .storage import SpilledMeasurement
+from .stitching_worker import StitchingWorker
+from .timing import StepTimings
 
 logger = logging.getLogger(__name__)
 
@@ -19,11 +33,22 @@ class BroadbandModel(ModuleModel):
         MIN_FREQUENCY (float): The minimum frequency for the broadband module.
         MAX_FREQUENCY (float): The maximum frequency for the broadband module.
         DEFAULT_FREQUENCY_STEP (float): The default frequency step for the broadband module.
+        DEFAULT_AUTOSAVE_DIRECTORY (Path): The default directory running broadband measurements are streamed to.
+        DEFAULT_CHECKPOINT_INTERVAL (int): The default number of single frequency measurements between two checkpoints.
+        DEFAULT_SETTLE_TIME (float): The default time in seconds that is waited before a frequency step is started.
+        DEFAULT_MAX_FRAME_RATE (float): The default maximum number of times per second the plots are redrawn.
+        DEFAULT_INFO_LOG_MAX_LINES (int): The default number of messages kept in the info box.
+        DEFAULT_STITCHING_STRATEGY (str): The default strategy the spectrum of a finished broadband measurement is stitched with.
 
     Signals:
         start_frequency_changed: Signal that the start frequency has changed.
         stop_frequency_changed: Signal that the stop frequency has changed.
         frequency_step_changed: Signal that the frequency step has changed.
+        max_frame_rate_changed: Signal that the maximum frame rate of the plots has changed.
+        info_log_max_lines_changed: Signal that the number of messages kept in the info box has changed.
+        info_log_file_changed: Signal that the file the info box messages are written to has changed.
+        stitching_strategy_changed: Signal that the stitching strategy has changed.
+        autosave_directory_changed: Signal that the autosave directory has changed.
         LUT_changed: Signal that the LUT has changed.
     """
 
@@ -32,10 +57,21 @@ class BroadbandModel(ModuleModel):
     MIN_FREQUENCY = 30.0
     MAX_FREQUENCY = 200.0
     DEFAULT_FREQUENCY_STEP = 0.1
+    DEFAULT_AUTOSAVE_DIRECTORY = Path.home() / ".nqrduck" / "broadband"
+    DEFAULT_CHECKPOINT_INTERVAL = 10
+    DEFAULT_SETTLE_TIME = 0.0
+    DEFAULT_MAX_FRAME_RATE = 10.0
+    DEFAULT_INFO_LOG_MAX_LINES = 1000
+    DEFAULT_STITCHING_STRATEGY = strategies.DEFAULT_STRATEGY
 
     start_frequency_changed = pyqtSignal(float)
     stop_frequency_changed = pyqtSignal(float)
     frequency_step_changed = pyqtSignal(float)
+    max_frame_rate_changed = pyqtSignal(float)
+    info_log_max_lines_changed = pyqtSignal(int)
+    info_log_file_changed = pyqtSignal(object)
+    stitching_strategy_changed = pyqtSignal(str)
+    autosave_directory_changed = pyqtSignal(str)
     LUT_changed = pyqtSignal()
 
     def __init__(self, module) -> None:
@@ -46,6 +82,25 @@ class BroadbandModel(ModuleModel):
         self.DEFAULT_FREQUENCY_STEP = self.DEFAULT_FREQUENCY_STEP
         self.current_broadband_measurement = None
         self.waiting_for_tune_and_match = False
+        self.stream_raw_data = False
+        self.store_complex_spectrum = False
+        self.adaptive_stepping = False
+        self.averages = None
+        self.min_matching_active = False
+        self.min_matching = MatchingPolicy.DEFAULT_THRESHOLD
+        self.min_matching_action = MatchingPolicy.DEFAULT_ACTION
+        self.pipelined_tune_and_match = False
+        self.adaptive_averaging = False
+        self.target_snr = AdaptiveAveraging.DEFAULT_TARGET_SNR
+        self.autosave = False
+        self.autosave_directory = self.DEFAULT_AUTOSAVE_DIRECTORY
+        self.checkpoint_interval = self.DEFAULT_CHECKPOINT_INTERVAL
+        self.settle_time = self.DEFAULT_SETTLE_TIME
+        self.settle_times = {}
+        self.max_frame_rate = self.DEFAULT_MAX_FRAME_RATE
+        self.info_log_max_lines = self.DEFAULT_INFO_LOG_MAX_LINES
+        self.info_log_file = None
+        self.stitching_strategy = self.DEFAULT_STITCHING_STRATEGY
         self.LUT = None
 
     @property
@@ -87,6 +142,206 @@ class BroadbandModel(ModuleModel):
     def current_broadband_measurement(self, value):
         self._current_broadband_measurement = value
 
+    @property
+    def stream_raw_data(self):
+        """If True the raw data of the single frequency measurements is spilled to disk during the broadband measurement."""
+        return self._stream_raw_data
+
+    @stream_raw_data.setter
+    def stream_raw_data(self, value):
+        self._stream_raw_data = value
+
+    @property
+    def store_complex_spectrum(self):
+        """If True the phase-corrected complex spectrum is calculated and stored when a broadband measurement is finished."""
+        return self._store_complex_spectrum
+
+    @store_complex_spectrum.setter
+    def store_complex_spectrum(self, value):
+        self._store_complex_spectrum = value
+
+    @property
+    def adaptive_stepping(self):
+        """If True new broadband measurements start with a coarse pass and only refine the frequency ranges that show structure, see AdaptivePlan."""
+        return self._adaptive_stepping
+
+    @adaptive_stepping.setter
+    def adaptive_stepping(self, value):
+        self._adaptive_stepping = value
+
+    @property
+    def averages(self):
+        """The number of averages that has been sent to the spectrometer, None if it has not been set by the module."""
+        return self._averages
+
+    @averages.setter
+    def averages(self, value):
+        self._averages = value
+
+    @property
+    def min_matching_active(self):
+        """If True frequencies with a reflection worse than min_matching are handled by the minimum matching policy."""
+        return self._min_matching_active
+
+    @min_matching_active.setter
+    def min_matching_active(self, value):
+        self._min_matching_active = value
+
+    @property
+    def min_matching(self):
+        """The minimum matching in dB, reflections above it are considered unmatched."""
+        return self._min_matching
+
+    @min_matching.setter
+    def min_matching(self, value):
+        self._min_matching = value
+
+    @property
+    def min_matching_action(self):
+        """The action of the minimum matching policy for unmatched frequencies, see MatchingPolicy."""
+        return self._min_matching_action
+
+    @min_matching_action.setter
+    def min_matching_action(self, value):
+        self._min_matching_action = value
+
+    @property
+    def pipelined_tune_and_match(self):
+        """If True tune and match of the next frequency is requested while the current one is acquired, see AcquisitionStateMachine."""
+        return self._pipelined_tune_and_match
+
+    @pipelined_tune_and_match.setter
+    def pipelined_tune_and_match(self, value):
+        self._pipelined_tune_and_match = value
+
+    @property
+    def adaptive_averaging(self):
+        """If True the number of averages of every frequency step is chosen so its slice reaches target_snr, see AdaptiveAveraging."""
+        return self._adaptive_averaging
+
+    @adaptive_averaging.setter
+    def adaptive_averaging(self, value):
+        self._adaptive_averaging = value
+
+    @property
+    def target_snr(self):
+        """The signal-to-noise ratio every slice with a line should reach with adaptive averaging."""
+        return self._target_snr
+
+    @target_snr.setter
+    def target_snr(self, value):
+        self._target_snr = value
+
+    def create_adaptive_averaging(self) -> AdaptiveAveraging:
+        """Creates the adaptive averaging for a broadband measurement with the settings of the model.
+
+        The averages set in the module are the largest number of averages a frequency step is measured with.
+
+        Returns:
+            AdaptiveAveraging: The adaptive averaging or None if it is not active or the averages have not been set.
+        """
+        if not self.adaptive_averaging or self.averages is None:
+            return None
+        return AdaptiveAveraging(self.target_snr, max_averages=self.averages)
+
+    def create_matching_policy(self) -> MatchingPolicy:
+        """Creates the minimum matching policy for a broadband measurement with the settings of the model.
+
+        Returns:
+            MatchingPolicy: The policy or None if minimum matching is not active.
+        """
+        if not self.min_matching_active:
+            return None
+        return MatchingPolicy(
+            self.min_matching, self.min_matching_action, averages=self.averages
+        )
+
+    @property
+    def autosave(self):
+        """If True new broadband measurements are streamed to a file in autosave_directory, so a crash does not lose the measured data."""
+        return self._autosave
+
+    @autosave.setter
+    def autosave(self, value):
+        self._autosave = value
+
+    @property
+    def autosave_directory(self):
+        """The directory running broadband measurements are streamed to if autosave is active."""
+        return self._autosave_directory
+
+    @autosave_directory.setter
+    def autosave_directory(self, value):
+        self._autosave_directory = Path(value)
+        self.autosave_directory_changed.emit(str(self._autosave_directory))
+
+    @property
+    def checkpoint_interval(self):
+        """The number of single frequency measurements after which a checkpoint is written to the stream file."""
+        return self._checkpoint_interval
+
+    @checkpoint_interval.setter
+    def checkpoint_interval(self, value):
+        self._checkpoint_interval = max(1, int(value))
+
+    @property
+    def settle_time(self):
+        """The time in seconds that is waited before a frequency step is started, zero starts the step right away."""
+        return self._settle_time
+
+    @settle_time.setter
+    def settle_time(self, value):
+        self._settle_time = value
+
+    @property
+    def settle_times(self):
+        """Settle times in seconds for single frequencies in Hz, overriding the default settle time."""
+        return self._settle_times
+
+    @settle_times.setter
+    def settle_times(self, value):
+        self._settle_times = value
+
+    @property
+    def max_frame_rate(self):
+        """The maximum number of times per second the plots are redrawn during a broadband measurement."""
+        return self._max_frame_rate
+
+    @max_frame_rate.setter
+    def max_frame_rate(self, value):
+        self._max_frame_rate = value
+        self.max_frame_rate_changed.emit(value)
+
+    @property
+    def info_log_max_lines(self):
+        """The number of messages kept in the info box, older messages are dropped."""
+        return self._info_log_max_lines
+
+    @info_log_max_lines.setter
+    def info_log_max_lines(self, value):
+        self._info_log_max_lines = value
+        self.info_log_max_lines_changed.emit(value)
+
+    @property
+    def info_log_file(self):
+        """The file every message of the info box is appended to, None if the messages are not written to a file."""
+        return self._info_log_file
+
+    @info_log_file.setter
+    def info_log_file(self, value):
+        self._info_log_file = value
+        self.info_log_file_changed.emit(value)
+
+    @property
+    def stitching_strategy(self):
+        """The name of the strategy the spectrum of a finished broadband measurement is stitched with, see strategies.STRATEGIES."""
+        return self._stitching_strategy
+
+    @stitching_strategy.setter
+    def stitching_strategy(self, value):
+        self._stitching_strategy = value
+        self.stitching_strategy_changed.emit(value)
+
     @property
     def LUT(self):
         """The LUT for the broadband measurement."""
@@ -95,16 +350,34 @@ class BroadbandModel(ModuleModel):
     @LUT.setter
     def LUT(self, value):
         self._LUT = value
+        self._LUT_index = LUTIndex.from_LUT(value) if value is not None else None
         self.LUT_changed.emit()
 
+    @property
+    def LUT_index(self):
+        """The sorted index of the LUT entries, built when the LUT changes. None if there is no LUT or it has no entries."""
+        return self._LUT_index
+
     class BroadbandMeasurement(QObject):
         """This class represents a single broadband measurement.
 
+        Attributes:
+            RETENTION_FULL (str): All single frequency measurements are kept in memory.
+            RETENTION_STREAMING (str): Only the stitched slices are kept in memory, the raw data is spilled to disk.
+            plan (AdaptivePlan): Decides which frequency is measured next, the frequencies are measured in ascending order if None.
+            matching_decisions (list): The decisions of the minimum matching policy, see MatchingPolicy.
+            timings (StepTimings): The timestamps of the frequency steps, saved with the measurement.
+
         Signals:
             received_measurement: Signal that a measurement has been received.
+            spectrum_changed: Signal that the stitched broadband spectrum has changed.
         """
 
+        RETENTION_FULL = "full"
+        RETENTION_STREAMING = "streaming"
+
         received_measurement = pyqtSignal()
+        spectrum_changed = pyqtSignal()
 
         def __init__(self, frequencies, frequency_step) -> None:
             """Initializes the BroadbandMeasurement."""
@@ -113,8 +386,37 @@ class BroadbandModel(ModuleModel):
             for frequency in frequencies:
                 self._single_frequency_measurements[frequency] = None
 
+            self._frequency_positions = {
+                frequency: position
+                for position, frequency in enumerate(
+                    self._single_frequency_measurements
+                )
+            }
+            self._spectrum = stitching.SpectrumBuffer()
+            self._last_stitched_position = -1
+            self._slices = {}
+            self._worker = None
+            self.stitching_strategy = strategies.DEFAULT_STRATEGY
+            self._complex_spectrum = None
+            self.phase_corrections = {}
+            self.plan = None
+            self._stitcher = None
+
             self.frequency_step = frequency_step
             self.reflection = {}
+            self.matching_decisions = []
+            self._skipped = set()
+            self.timings = StepTimings()
+
+            self.retention = self.RETENTION_FULL
+            self._writer = None
+            self._stream_file_name = None
+            self._owns_stream_file = False
+            self._stream_spectrum_current = False
+            self._source = None
+            self._last_measurement = None
+            self.checkpoint_interval = BroadbandModel.DEFAULT_CHECKPOINT_INTERVAL
+            self._measurements_since_checkpoint = 0
 
         def add_measurement(self, measurement: "Measurement") -> None:
             """This method adds a single measurement to the broadband measurement.
@@ -125,12 +427,146 @@ class BroadbandModel(ModuleModel):
             logger.debug(
                 f"Adding measurement to broadband measurement at frequency: {str(measurement.target_frequency)}"
             )
-            self._single_frequency_measurements[measurement.target_frequency] = (
-                measurement
-            )
-            self.assemble_broadband_spectrum()
+            frequency = measurement.target_frequency
+            replaced = self._single_frequency_measurements.get(frequency) is not None
+            self._skipped.discard(frequency)
+            if replaced:
+                self._slices.pop(frequency, None)
+            if frequency not in self._frequency_positions:
+                self._frequency_positions[frequency] = len(self._frequency_positions)
+            self._single_frequency_measurements[frequency] = measurement
+            # The complex spectrum is only calculated on request
+            self._complex_spectrum = None
+            if self.plan is not None:
+                self.plan.add_measurement(measurement, self.reflection)
+
+            if self._worker is not None:
+                self._worker.submit(measurement, self._frequency_positions[frequency])
+            # With adaptive stepping a new measurement changes the slices of its neighbours, they are stitched again
+            elif self.plan is not None and self._stitcher is not None:
+                self._stitcher.add_slice(
+                    self._frequency_positions[frequency], self.get_slice(measurement)
+                )
+                self._last_stitched_position = max(
+                    self._last_stitched_position, self._frequency_positions[frequency]
+                )
+            # Only a measurement that continues the spectrum can be stitched incrementally
+            elif (
+                not replaced
+                and self.plan is None
+                and self._frequency_positions[frequency] > self._last_stitched_position
+            ):
+                self.stitch_measurement(measurement)
+            else:
+                logger.debug("Measurement arrived out of order, reassembling spectrum.")
+                self.assemble_broadband_spectrum()
+            if self._worker is None:
+                self.timings.mark(StepTimings.ASSEMBLED, frequency)
+
+            if self._writer is not None:
+                offset = self._writer.append_measurement(measurement)
+                if self.retention == self.RETENTION_STREAMING:
+                    spilled_measurement = SpilledMeasurement(
+                        self._writer.file_name, offset, frequency
+                    )
+                    # With background stitching the summary is set once the slice arrives
+                    if frequency in self._slices:
+                        spilled_measurement.set_summary(self._slices[frequency])
+                    self._single_frequency_measurements[frequency] = spilled_measurement
+                self._measurements_since_checkpoint += 1
+                if self._measurements_since_checkpoint >= self.checkpoint_interval:
+                    self.checkpoint()
+
+            # The last measurement is always kept in memory so it can be displayed
+            self._last_measurement = measurement
             self.received_measurement.emit()
-            QApplication.processEvents()
+            if self._worker is None:
+                self.spectrum_changed.emit()
+
+        def enable_background_stitching(self) -> None:
+            """This method moves the stitching of the following measurements to a StitchingWorker thread.
+
+            add_measurement then only queues the measurement and returns, the broadband spectrum is updated
+            when the worker publishes the stitched slices and spectrum_changed is emitted.
+            The updates are delivered through the Qt event loop of the thread the broadband measurement belongs to.
+            """
+            if self._worker is not None:
+                return
+
+            # The worker needs the slices of all measurements that are already part of the spectrum
+            if any(
+                measurement is not None and not self._has_valid_slice(frequency)
+                for frequency, measurement in self._single_frequency_measurements.items()
+            ):
+                self.assemble_broadband_spectrum()
+
+            self._worker = StitchingWorker(
+                self.frequency_step,
+                len(self._single_frequency_measurements),
+                slices=self._slices,
+                positions=self._frequency_positions,
+                spectrum=(self._spectrum.fdx.copy(), self._spectrum.fdy.copy()),
+                last_stitched_position=self._last_stitched_position,
+                plan=self.plan,
+            )
+            self._worker.updated.connect(self.apply_stitching_updates)
+            self._worker.start()
+
+        def apply_stitching_updates(self) -> None:
+            """This method applies the spectrum updates the stitching worker has published so far, it never waits for the worker."""
+            if self._worker is None:
+                return
+            updates = self._worker.take_updates()
+            if updates:
+                self._stitcher = None
+            for update in updates:
+                self._spectrum.write(update.start, update.fdx, update.fdy)
+                self._last_stitched_position = update.last_stitched_position
+                for spectrum_slice in update.slices:
+                    frequency = spectrum_slice.target_frequency
+                    self._slices[frequency] = spectrum_slice
+                    self.timings.mark(StepTimings.ASSEMBLED, frequency)
+                    measurement = self._single_frequency_measurements.get(frequency)
+                    if isinstance(measurement, SpilledMeasurement):
+                        measurement.set_summary(spectrum_slice)
+            if updates:
+                self.spectrum_changed.emit()
+
+        def _stop_background_stitching(self) -> None:
+            if self._worker is not None:
+                self._worker.stop()
+                self._worker.updated.disconnect(self.apply_stitching_updates)
+                self._worker = None
+
+        def wait_for_stitching(self) -> None:
+            """This method blocks until the stitching worker has stitched all measurements and applies the result.
+
+            Only used when the complete spectrum is needed, e.g. when it is saved.
+            """
+            if self._worker is not None:
+                self._worker.wait_until_idle()
+                self.apply_stitching_updates()
+
+        def enable_adaptive_stepping(self, **kwargs) -> None:
+            """This method lets an AdaptivePlan decide which frequencies are measured and in which order.
+
+            Frequencies the plan skips are never measured, they stay None. The frequencies that have already been measured are passed to the plan.
+            The measurements of the coarse pass are cut wide enough to cover the skipped ranges, see AdaptivePlan.slice_step.
+
+            Args:
+                **kwargs: The parameters of the AdaptivePlan.
+            """
+            self.plan = AdaptivePlan(
+                list(self._single_frequency_measurements), self.frequency_step, **kwargs
+            )
+            self._stitcher = None
+            for frequency, measurement in self._single_frequency_measurements.items():
+                if measurement is not None:
+                    self.plan.add_measurement(
+                        self.get_measurement(frequency), self.reflection
+                    )
+                elif frequency in self._skipped:
+                    self.plan.skip(frequency)
 
         def is_complete(self) -> bool:
             """This method checks if all frequencies have been measured.
@@ -138,8 +574,10 @@ class BroadbandModel(ModuleModel):
             Returns:
                 bool: True if all frequencies have been measured, False otherwise.
             """
-            for measurement in self._single_frequency_measurements.values():
-                if measurement is None:
+            if self.plan is not None:
+                return self.plan.is_complete()
+            for frequency, measurement in self._single_frequency_measurements.items():
+                if measurement is None and frequency not in self._skipped:
                     return False
             return True
 
@@ -149,21 +587,290 @@ class BroadbandModel(ModuleModel):
             Returns:
                 float: The next frequency that has to be measured.
             """
+            if self.plan is not None:
+                return self.plan.next_frequency()
             for frequency, measurement in self._single_frequency_measurements.items():
-                if measurement is None:
+                if measurement is None and frequency not in self._skipped:
                     return frequency
 
+        def get_following_measurement_frequency(self, frequency: float) -> float:
+            """This method returns the frequency that is planned to be measured after the given one.
+
+            Args:
+                frequency (float): The frequency in Hz that is being measured.
+
+            Returns:
+                float: The following frequency or None if the given frequency is the last one.
+            """
+            if self.plan is not None:
+                return self.plan.following_frequency(frequency)
+            for following, measurement in self._single_frequency_measurements.items():
+                if (
+                    measurement is None
+                    and following != frequency
+                    and following not in self._skipped
+                ):
+                    return following
+
         def get_last_completed_measurement(self) -> "Measurement":
             """This method returns the last completed measurement.
 
             Returns:
                 Measurement: The last completed measurement.
             """
+            # With adaptive stepping the last measurement is not the one with the highest frequency
+            if self._last_measurement is not None:
+                return self._last_measurement
             for frequency, measurement in reversed(
                 self._single_frequency_measurements.items()
             ):
                 if measurement is not None:
-                    return measurement
+                    return self.get_measurement(frequency)
+
+        def get_measurement(self, frequency: float) -> "Measurement":
+            """This method returns the single frequency measurement at the given frequency.
+
+            If the raw data of the measurement has been spilled to disk it is loaded again.
+
+            Args:
+                frequency (float): The target frequency of the measurement.
+
+            Returns:
+                Measurement: The measurement or None if the frequency has not been measured yet.
+            """
+            measurement = self._single_frequency_measurements.get(frequency)
+            if isinstance(measurement, SpilledMeasurement):
+                if (
+                    self._last_measurement is not None
+                    and self._last_measurement.target_frequency == frequency
+                ):
+                    return self._last_measurement
+                return measurement.load()
+            return measurement
+
+        def open_stream(self, file_name: str) -> None:
+            """This method starts streaming the broadband measurement to a binary broadband file.
+
+            Every single frequency measurement and reflection value is appended to the file as it arrives,
+            so the file always contains everything that has been measured so far.
+
+            Args:
+                file_name (str): The name of the file.
+            """
+            self._writer = storage.BroadbandFileWriter(
+                file_name, self._single_frequency_measurements, self.frequency_step
+            )
+            self._stream_file_name = self._writer.file_name
+            self._owns_stream_file = False
+            self._stream_spectrum_current = False
+
+            # Measurements that have been added before are written first
+            for frequency, measurement in self._single_frequency_measurements.items():
+                if measurement is not None:
+                    self._writer.append_measurement(self.get_measurement(frequency))
+            for frequency, value in self.reflection.items():
+                self._writer.append_reflection(frequency, value)
+            for decision in self.matching_decisions:
+                self._writer.append_matching_decision(decision.to_json())
+
+        def resume_stream(self, file_name: str) -> None:
+            """This method continues streaming the broadband measurement to an existing binary broadband file.
+
+            Used when an interrupted measurement is resumed from its stream file, new measurements are appended to that file.
+
+            Args:
+                file_name (str): The name of the file.
+            """
+            self._writer = storage.BroadbandFileWriter.resume(file_name)
+            self._stream_file_name = self._writer.file_name
+            self._owns_stream_file = False
+            self._stream_spectrum_current = False
+            self._measurements_since_checkpoint = 0
+
+        def checkpoint(self) -> None:
+            """This method writes a checkpoint of the completed frequencies and reflection values to the stream file.
+
+            The checkpoint is synced to disk, so the measurement can be resumed from the stream file after a crash.
+            """
+            if self._writer is None:
+                return
+            completed = [
+                frequency
+                for frequency, measurement in self._single_frequency_measurements.items()
+                if measurement is not None
+            ]
+            logger.debug(f"Writing checkpoint with {len(completed)} completed frequencies.")
+            self._writer.append_checkpoint(completed, self.reflection)
+            self._measurements_since_checkpoint = 0
+
+        def enable_streaming(self) -> None:
+            """This method switches the broadband measurement to the streaming retention mode.
+
+            The raw data of every following single frequency measurement is only kept in the stream file,
+            in memory only the stitched slices and a summary of every measurement remain.
+            If no stream file has been opened a temporary one is used.
+            """
+            if self._writer is None:
+                file_descriptor, file_name = tempfile.mkstemp(
+                    prefix="nqrduck_broadband_", suffix=".broad"
+                )
+                os.close(file_descriptor)
+                self.open_stream(file_name)
+                self._owns_stream_file = True
+            logger.debug("Spilling raw data to file: " + self._stream_file_name)
+            self.retention = self.RETENTION_STREAMING
+
+        def finish_stream(self) -> None:
+            """This method appends the stitched spectrum to the stream file and closes it."""
+            if self._writer is not None:
+                self.wait_for_stitching()
+                self.checkpoint()
+                self._writer.append_spectrum(
+                    self.broadband_data_fdx,
+                    self.broadband_data_fdy,
+                    self.stitching_strategy,
+                )
+                if self._complex_spectrum is not None:
+                    self._writer.append_complex_spectrum(
+                        *self._complex_spectrum, self.phase_corrections
+                    )
+                if len(self.timings):
+                    self._writer.append_timings(
+                        *self._timings_arrays(), self.timings.summary()
+                    )
+                self._writer.close()
+                self._writer = None
+                self._stream_spectrum_current = True
+
+        def close(self) -> None:
+            """This method stops the stitching worker, closes the stream and source files and removes the stream file if it was only a temporary file."""
+            self._stop_background_stitching()
+            if self._source is not None:
+                self._source.close()
+                self._source = None
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            if self._stream_file_name is not None and self._owns_stream_file:
+                logger.debug("Removing stream file: " + self._stream_file_name)
+                Path(self._stream_file_name).unlink(missing_ok=True)
+                self._stream_file_name = None
+
+        def save(self, file_name: str) -> None:
+            """This method saves the broadband measurement to a binary broadband file.
+
+            If the measurement has been streamed to a file, that file already contains all measurements and is copied.
+            The file is written to a temporary file next to it first, which then replaces it. A measurement can therefore be saved
+            to the file it has been opened from, its raw data is read from the new file afterwards.
+
+            Args:
+                file_name (str): The name of the file.
+
+            Raises:
+                ValueError: If the file is the stream file the running measurement is written to.
+            """
+            target = Path(file_name).resolve()
+            if self._writer is not None and target == Path(self._stream_file_name).resolve():
+                raise ValueError(
+                    f"The measurement is still being streamed to {file_name}, it can not be saved to it."
+                )
+            self.wait_for_stitching()
+            file_descriptor, temporary_file_name = tempfile.mkstemp(
+                prefix=".nqrduck_broadband_", suffix=".broad", dir=target.parent
+            )
+            os.close(file_descriptor)
+            # The temporary file is only readable by its owner, the saved file gets the usual permissions
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temporary_file_name, 0o666 & ~umask)
+            try:
+                self._write_file(temporary_file_name)
+                os.replace(temporary_file_name, target)
+            except BaseException:
+                Path(temporary_file_name).unlink(missing_ok=True)
+                raise
+
+            sources = [
+                Path(name).resolve()
+                for name in (
+                    self._stream_file_name,
+                    self._source.file_name if self._source is not None else None,
+                )
+                if name is not None
+            ]
+            if target in sources:
+                self._remap_spilled_measurements(str(target))
+            if self._stream_file_name is not None and target == sources[0]:
+                # A temporary stream file has been replaced by the saved file, it is not removed anymore
+                self._owns_stream_file = False
+
+        def _write_file(self, file_name: str) -> None:
+            if self._stream_file_name is not None:
+                shutil.copyfile(self._stream_file_name, file_name)
+                if not self._stream_spectrum_current:
+                    storage.append_spectrum(
+                        file_name,
+                        self.broadband_data_fdx,
+                        self.broadband_data_fdy,
+                        self.stitching_strategy,
+                    )
+                    if self._complex_spectrum is not None:
+                        storage.append_complex_spectrum(
+                            file_name, *self._complex_spectrum, self.phase_corrections
+                        )
+                    if len(self.timings):
+                        storage.append_timings(
+                            file_name, *self._timings_arrays(), self.timings.summary()
+                        )
+                return
+
+            writer = storage.BroadbandFileWriter(
+                file_name, self._single_frequency_measurements, self.frequency_step
+            )
+            try:
+                for frequency, measurement in self._single_frequency_measurements.items():
+                    if measurement is not None:
+                        writer.append_measurement(self.get_measurement(frequency))
+                for frequency, value in self.reflection.items():
+                    writer.append_reflection(frequency, value)
+                for decision in self.matching_decisions:
+                    writer.append_matching_decision(decision.to_json())
+                writer.append_spectrum(
+                    self.broadband_data_fdx,
+                    self.broadband_data_fdy,
+                    self.stitching_strategy,
+                )
+                if self._complex_spectrum is not None:
+                    writer.append_complex_spectrum(
+                        *self._complex_spectrum, self.phase_corrections
+                    )
+                if len(self.timings):
+                    writer.append_timings(
+                        *self._timings_arrays(), self.timings.summary()
+                    )
+            finally:
+                writer.close()
+
+        def _remap_spilled_measurements(self, file_name: str) -> None:
+            """This method reads the spilled measurements from a file that has replaced the file they have been read from so far.
+
+            Args:
+                file_name (str): The name of the new file.
+            """
+            logger.debug("Remapping spilled measurements to file: " + file_name)
+            broadband_file = storage.BroadbandFile(file_name)
+            for frequency, spilled_measurement in broadband_file.measurements.items():
+                current = self._single_frequency_measurements.get(frequency)
+                if isinstance(current, SpilledMeasurement):
+                    spilled_measurement.max_magnitude = current.max_magnitude
+                    spilled_measurement.mean_magnitude = current.mean_magnitude
+                    self._single_frequency_measurements[frequency] = spilled_measurement
+            if self._source is not None:
+                self._source.close()
+            self._source = broadband_file
+
+        def _timings_arrays(self) -> tuple:
+            return self.timings.frequencies, self.timings.sessions, self.timings.times
 
         def get_finished_percentage(self) -> float:
             """Get the percentage of measurements that have been finished.
@@ -171,7 +878,10 @@ class BroadbandModel(ModuleModel):
             Returns:
                 float: The percentage of measurements that have been finished.
             """
-            finished_measurements = 0
+            if self.plan is not None:
+                return self.plan.finished_percentage()
+            # Skipped frequencies are finished as well
+            finished_measurements = len(self.skipped_frequencies)
             for measurement in self._single_frequency_measurements.values():
                 if measurement is not None:
                     finished_measurements += 1
@@ -180,115 +890,327 @@ class BroadbandModel(ModuleModel):
             )
 
         def assemble_broadband_spectrum(self) -> None:
-            """This method assembles the broadband spectrum from the single frequency measurement data in frequency domain."""
-            # First we get all of the single frequency measurements that have already been measured
-            single_frequency_measurements = []
-            for measurement in self._single_frequency_measurements.values():
-                if measurement is not None:
-                    single_frequency_measurements.append(measurement)
+            """This method assembles the broadband spectrum from the single frequency measurement data in frequency domain.
+
+            The whole spectrum is rebuilt from scratch. This is only needed when a broadband measurement is loaded or when measurements arrive out of order,
+            otherwise add_measurement only stitches the newly arrived slice to the end of the spectrum.
+            """
+            # First we get all of the frequencies that have already been measured
+            frequencies = [
+                frequency
+                for frequency, measurement in self._single_frequency_measurements.items()
+                if measurement is not None
+            ]
 
             logger.debug(
-                "Assembling broadband spectrum from %d single frequency measurements."
-                % len(single_frequency_measurements)
+                f"Assembling broadband spectrum from {len(frequencies)} single frequency measurements."
             )
-            fdy_assembled = np.array([])
-            fdx_assembled = np.array([])
             # We cut out step_size / 2 around the IF of the spectrum and assemble the broadband spectrum
-            for measurement in single_frequency_measurements:
-                # This finds the center of the spectrum if the IF is not 0 it will cut out step_size / 2 around the IF
-                logger.debug(f"IF frequency: {measurement.IF_frequency:f}")
-                logger.debug(measurement.fdx)
-                offset = measurement.IF_frequency * 1e-6
-                logger.debug(f"Offset: {offset:f}")
-
-                # center = np.where(measurement.fdx == offset)[0][0]
-                # Find closest to offset
-                center = self.find_nearest(measurement.fdx, offset)
-
-                logger.debug("Center: %d" % center)
-                # This finds the nearest index of the lower and upper frequency step
-                logger.debug(f"Frequency step: {self.frequency_step:f}")
-                logger.debug(measurement.fdx)
-                idx_xf_lower = self.find_nearest(
-                    measurement.fdx, offset - ((self.frequency_step / 2) * 1e-6)
+            missing = [
+                frequency
+                for frequency in frequencies
+                if not self._has_valid_slice(frequency)
+            ]
+            for slice_step, group in self._group_by_slice_step(missing).items():
+                # The spectra of spilled measurements have to be recalculated, this is done by the reprocessing pipeline
+                spilled = {
+                    frequency: self._single_frequency_measurements[frequency]
+                    for frequency in group
+                    if isinstance(
+                        self._single_frequency_measurements[frequency],
+                        SpilledMeasurement,
+                    )
+                }
+                if spilled:
+                    self._slices.update(reprocessing.reprocess(spilled, slice_step))
+                for spectrum_slice in stitching.compute_slices(
+                    [
+                        self.get_measurement(frequency)
+                        for frequency in group
+                        if frequency not in spilled
+                    ],
+                    slice_step,
+                ):
+                    self._slices[spectrum_slice.target_frequency] = spectrum_slice
+
+            self._set_slices(frequencies)
+            self._last_stitched_position = max(
+                (self._frequency_positions[frequency] for frequency in frequencies),
+                default=-1,
+            )
+
+        def reprocess(
+            self,
+            window=None,
+            zero_padding: int = reprocessing.DEFAULT_ZERO_PADDING,
+            max_workers: int = None,
+            strategy: str = None,
+        ) -> None:
+            """This method recalculates the broadband spectrum from the time domain data of the single frequency measurements.
+
+            The FFTs and slices of all measurements are calculated in parallel by the reprocessing pipeline.
+            The new slices replace the cached ones, so the spectrum keeps the new processing when it is reassembled.
+            The spectrum is stitched with the current stitching strategy, other strategies than cut stitch the reprocessed spectra again.
+
+            Args:
+                window (np.array | callable, optional): The apodization window, either the weights of the samples
+                    or a function that returns the weights for the time values of a measurement in µs.
+                zero_padding (int, optional): The zero padding of the FFT.
+                max_workers (int, optional): The number of worker processes, the number of CPUs by default.
+                strategy (str, optional): The name of the stitching strategy, the current stitching strategy by default.
+            """
+            if strategy is None:
+                strategy = self.stitching_strategy
+            stitching_strategy = strategies.get_strategy(strategy)
+            background_stitching = self._worker is not None
+            if background_stitching:
+                self.wait_for_stitching()
+                self._stop_background_stitching()
+
+            slices = {}
+            for slice_step, group in self._group_by_slice_step(
+                self._single_frequency_measurements
+            ).items():
+                slices.update(
+                    reprocessing.reprocess(
+                        {
+                            frequency: self._single_frequency_measurements[frequency]
+                            for frequency in group
+                        },
+                        slice_step,
+                        window,
+                        zero_padding,
+                        max_workers,
+                    )
                 )
-                idx_xf_upper = self.find_nearest(
-                    measurement.fdx, offset + ((self.frequency_step / 2) * 1e-6)
+            self._slices = {
+                frequency: slices[frequency]
+                for frequency in self._single_frequency_measurements
+                if frequency in slices
+            }
+            self._last_stitched_position = max(
+                (self._frequency_positions[frequency] for frequency in self._slices),
+                default=-1,
+            )
+            if strategy == strategies.CutStrategy.name:
+                self._set_slices(list(self._slices))
+            else:
+                self._stitch(
+                    stitching_strategy,
+                    reprocessing.spectra(
+                        self._single_frequency_measurements, window, zero_padding
+                    ),
                 )
+            self.stitching_strategy = strategy
+            self._stream_spectrum_current = False
+
+            if background_stitching:
+                self.enable_background_stitching()
+            self.spectrum_changed.emit()
+
+        def restitch(self, strategy: str) -> None:
+            """This method stitches the broadband spectrum again with another stitching strategy.
+
+            While a measurement is running new measurements are always stitched with the cut strategy,
+            so other strategies are applied once the measurement is finished.
 
-                # This interpolates the y values of the lower and upper frequency step
-                yf_interp_lower = np.interp(
-                    offset - self.frequency_step / 2 * 1e-6,
-                    [measurement.fdx[idx_xf_lower], measurement.fdx[center]],
-                    [abs(measurement.fdy)[idx_xf_lower], abs(measurement.fdy)[center]],
+            Args:
+                strategy (str): The name of the stitching strategy, see strategies.STRATEGIES.
+            """
+            stitching_strategy = strategies.get_strategy(strategy)
+            logger.debug("Stitching broadband spectrum with strategy: " + strategy)
+            background_stitching = self._worker is not None
+            if background_stitching:
+                self.wait_for_stitching()
+                self._stop_background_stitching()
+
+            self.stitching_strategy = strategy
+            self._stream_spectrum_current = False
+            if strategy == strategies.CutStrategy.name:
+                self.assemble_broadband_spectrum()
+            else:
+                self._stitch(
+                    stitching_strategy,
+                    sorted(
+                        (
+                            self.get_measurement(frequency)
+                            for frequency, measurement in self._single_frequency_measurements.items()
+                            if measurement is not None
+                        ),
+                        key=lambda measurement: measurement.target_frequency,
+                    ),
                 )
 
-                yf_interp_upper = np.interp(
-                    offset + self.frequency_step / 2 * 1e-6,
-                    [measurement.fdx[center], measurement.fdx[idx_xf_upper]],
-                    [abs(measurement.fdy)[center], abs(measurement.fdy)[idx_xf_lower]],
+            if background_stitching:
+                self.enable_background_stitching()
+            self.spectrum_changed.emit()
+
+        def _stitch(
+            self, stitching_strategy: strategies.StitchingStrategy, measurements: list
+        ) -> None:
+            """This method sets the broadband spectrum to the measurements stitched with a strategy other than cut.
+
+            Args:
+                stitching_strategy (strategies.StitchingStrategy): The stitching strategy.
+                measurements (list): The single frequency measurements or their spectra ordered by frequency.
+            """
+            self._stitcher = None
+            if isinstance(stitching_strategy, strategies.ComplexStrategy):
+                # The magnitude of the complex spectrum, which is kept as well
+                self._combine_complex(stitching_strategy, measurements)
+                self._spectrum.set_data(
+                    self.broadband_data_complex_fdx,
+                    np.abs(self.broadband_data_complex_fdy),
+                )
+            else:
+                self._spectrum.set_data(
+                    *stitching_strategy.stitch(measurements, self.frequency_step)
                 )
 
-                try:
-                    # We take the last point of the previous spectrum and the first point of the current spectrum and average them
-                    fdy_assembled[-1] = (fdy_assembled[-1] + yf_interp_lower) / 2
-                    # Then we append the data from idx_xf_lower + 1 (because of the averaged datapoint) to idx_xf_upper
-                    fdy_assembled = np.append(
-                        fdy_assembled,
-                        abs(measurement.fdy)[idx_xf_lower + 1 : idx_xf_upper - 1],
-                    )
-                    fdy_assembled = np.append(fdy_assembled, yf_interp_upper)
+        def compute_complex_spectrum(self, overlap: float = 0.5) -> None:
+            """This method stitches the complex broadband spectrum with the phase-corrected complex strategy.
 
-                    # We append the frequency values of the current spectrum and shift them by the target frequency
-                    fdx_assembled = np.append(
-                        fdx_assembled,
-                        -self.frequency_step / 2 * 1e-6
-                        + measurement.target_frequency * 1e-6,
-                    )
-                    fdx_assembled = np.append(
-                        fdx_assembled,
-                        measurement.fdx[idx_xf_lower + 1 : idx_xf_upper - 1]
-                        + measurement.target_frequency * 1e-6
-                        - offset,
-                    )
+            The phase of every single frequency measurement is rotated to match its neighbour, the rotation is kept in phase_corrections.
+            Phasing or averaging can then be done on the stitched complex spectrum without touching the single frequency measurements again.
 
-                # On the first run we will get an Index Error
-                except IndexError:
-                    fdy_assembled = np.array([yf_interp_lower])
-                    fdy_assembled = np.append(
-                        fdy_assembled,
-                        abs(measurement.fdy)[idx_xf_lower + 1 : idx_xf_upper - 1],
-                    )
-                    fdy_assembled = np.append(fdy_assembled, yf_interp_upper)
+            Args:
+                overlap (float, optional): The width of the crossfade between neighbouring measurements as a fraction of the frequency step.
+            """
+            self.wait_for_stitching()
+            measurements = sorted(
+                (
+                    self.get_measurement(frequency)
+                    for frequency, measurement in self._single_frequency_measurements.items()
+                    if measurement is not None
+                ),
+                key=lambda measurement: measurement.target_frequency,
+            )
+            self._combine_complex(strategies.ComplexStrategy(overlap), measurements)
+
+        def _combine_complex(
+            self, complex_strategy: strategies.ComplexStrategy, measurements: list
+        ) -> None:
+            """This method stitches the complex broadband spectrum and keeps the phase corrections, see compute_complex_spectrum."""
+            fdx, fdy, phases = complex_strategy.combine(measurements, self.frequency_step)
+            self._complex_spectrum = (fdx, fdy)
+            self.phase_corrections = {
+                measurement.target_frequency: float(phase)
+                for measurement, phase in zip(measurements, phases)
+            }
+            self._stream_spectrum_current = False
 
-                    first_time_values = (
-                        measurement.fdx[idx_xf_lower:idx_xf_upper]
-                        + measurement.target_frequency * 1e-6
-                        - offset
-                    )
-                    first_time_values[0] = (
-                        -self.frequency_step / 2 * 1e-6
-                        + measurement.target_frequency * 1e-6
-                    )
-                    first_time_values[-1] = (
-                        +self.frequency_step / 2 * 1e-6
-                        + measurement.target_frequency * 1e-6
-                    )
+        def stitch_measurement(self, measurement: "Measurement") -> None:
+            """This method stitches the slice of a single measurement to the end of the broadband spectrum.
+
+            Args:
+                measurement (Measurement): The measurement object.
+            """
+            logger.debug(f"IF frequency: {measurement.IF_frequency:f}")
+            spectrum_slice = self.get_slice(measurement)
+
+            if len(self._spectrum) == 0:
+                # Preallocate the spectrum for the whole sweep with the size of the first slice
+                self._spectrum.reserve(
+                    (len(spectrum_slice) + 1) * len(self._single_frequency_measurements)
+                    + 1
+                )
+
+            self._spectrum.append_slice(spectrum_slice)
+            self._last_stitched_position = self._frequency_positions[
+                measurement.target_frequency
+            ]
+
+        def _set_measurement(self, frequency: float, measurement) -> None:
+            """Stores a measurement without stitching it, used when a broadband measurement is loaded."""
+            if frequency not in self._frequency_positions:
+                self._frequency_positions[frequency] = len(self._frequency_positions)
+            self._single_frequency_measurements[frequency] = measurement
+
+        def get_slice(self, measurement: "Measurement") -> stitching.SpectrumSlice:
+            """This method returns the slice of a single measurement that is stitched into the broadband spectrum.
+
+            The slice is computed once when the measurement is added and cached, so reassembling the spectrum only touches the small slice arrays.
+
+            Args:
+                measurement (Measurement): The measurement object.
+
+            Returns:
+                SpectrumSlice: The slice of the measurement.
+            """
+            key = measurement.target_frequency
+            if not self._has_valid_slice(key):
+                self._slices[key] = stitching.compute_slice(
+                    measurement, self._slice_step(key)
+                )
+            return self._slices[key]
+
+        def _has_valid_slice(self, frequency: float) -> bool:
+            spectrum_slice = self._slices.get(frequency)
+            return (
+                spectrum_slice is not None
+                and spectrum_slice.frequency_step == self._slice_step(frequency)
+            )
+
+        def _slice_step(self, frequency: float) -> float:
+            """Returns the frequency step the measurement at a frequency is cut with, see AdaptivePlan.slice_step."""
+            if self.plan is not None:
+                return self.plan.slice_step(frequency)
+            return self.frequency_step
+
+        def _group_by_slice_step(self, frequencies) -> dict:
+            """Groups frequencies by the frequency step their measurements are cut with, so every group is cut in one go."""
+            groups = {}
+            for frequency in frequencies:
+                groups.setdefault(self._slice_step(frequency), []).append(frequency)
+            return groups
 
-                    fdx_assembled = np.array(first_time_values)
+        def _set_slices(self, frequencies: list) -> None:
+            """Sets the spectrum to the cached slices of the frequencies in the order of the sweep.
 
-            self.broadband_data_fdx = fdx_assembled.flatten()
-            self.broadband_data_fdy = fdy_assembled.flatten()
+            With adaptive stepping the spectrum is assembled by an AdaptiveStitcher, which then stitches the following measurements.
+            """
+            slices = [self._slices[frequency] for frequency in frequencies]
+            if self.plan is None:
+                self._stitcher = None
+                self._spectrum.set_data(*stitching.assemble_slices(slices))
+            else:
+                self._stitcher = AdaptiveStitcher(self.plan, self._spectrum)
+                self._stitcher.set_slices(
+                    [self._frequency_positions[frequency] for frequency in frequencies],
+                    slices,
+                )
 
-        def add_tune_and_match(self, magnitude) -> None:
-            """This method adds the tune and match values to the last completed measurement.
+        def add_tune_and_match(self, magnitude, frequency: float = None) -> None:
+            """This method adds the tune and match values of a frequency.
+
+            With pipelined tune and match the frequency that has been tuned is not the next measurement frequency, so it should always be passed.
 
             Args:
             magnitude (float): The magnitude of the tune and match values.
+            frequency (float, optional): The frequency in Hz that has been tuned and matched, the next measurement frequency if None.
+            """
+            if frequency is None:
+                frequency = self.get_next_measurement_frequency()
+            logger.debug(f"Adding tune and match values at frequency: {frequency}")
+            self.reflection[frequency] = magnitude
+            if self._writer is not None:
+                self._writer.append_reflection(frequency, magnitude)
+
+        def add_matching_decision(self, decision: MatchingDecision) -> None:
+            """This method records a decision of the minimum matching policy.
+
+            Skipped frequencies are not measured, unless a measurement at the frequency is added later.
+
+            Args:
+                decision (MatchingDecision): The decision.
             """
-            logger.debug("Adding tune and match values toat next measurement frequency")
-            next_measurement_frequency = self.get_next_measurement_frequency()
-            self.reflection[next_measurement_frequency] = magnitude
+            self.matching_decisions.append(decision)
+            if decision.action == MatchingPolicy.SKIP:
+                self._skipped.add(decision.frequency)
+                if self.plan is not None:
+                    self.plan.skip(decision.frequency)
+            if self._writer is not None:
+                self._writer.append_matching_decision(decision.to_json())
 
         def find_nearest(self, array: np.array, value: float) -> int:
             """This method finds the nearest value in an array to a given value.
@@ -300,9 +1222,7 @@ class BroadbandModel(ModuleModel):
             Returns:
                 int: The index of the nearest value in the array.
             """
-            array = np.asarray(array)
-            idx = (np.abs(array - value)).argmin()
-            return idx
+            return stitching.find_nearest(array, value)
 
         def to_json(self):
             """Converts the broadband measurement to a json-compatible format.
@@ -312,8 +1232,8 @@ class BroadbandModel(ModuleModel):
             """
             return {
                 "single_frequency_measurements": [
-                    measurement.to_json()
-                    for measurement in self.single_frequency_measurements.values()
+                    self.get_measurement(frequency).to_json()
+                    for frequency in self.single_frequency_measurements
                 ],
                 "reflection": self.reflection,
             }
@@ -341,15 +1261,108 @@ class BroadbandModel(ModuleModel):
 
             # We add all of the single frequency measurements to the broadband measurement
             for measurement in json["single_frequency_measurements"]:
-                broadband_measurement.add_measurement(
-                    Measurement.from_json(measurement)
+                measurement = Measurement.from_json(measurement)
+                broadband_measurement._set_measurement(
+                    measurement.target_frequency, measurement
                 )
 
-            # We assemble the broadband spectrum
+            # We assemble the broadband spectrum in one go instead of stitching every measurement on its own
             broadband_measurement.assemble_broadband_spectrum()
 
             return broadband_measurement
 
+        @classmethod
+        def from_file(cls, file_name: str):
+            """Opens a broadband measurement from a binary broadband file.
+
+            The file is memory-mapped and only the stitched spectrum is read up front,
+            the single frequency measurements are read from the file when they are needed.
+
+            Args:
+                file_name (str): The name of the file.
+
+            Returns:
+                BroadbandMeasurement: The broadband measurement object.
+            """
+            broadband_file = storage.BroadbandFile(file_name)
+            broadband_measurement = cls(
+                broadband_file.frequencies, broadband_file.frequency_step
+            )
+            broadband_measurement._source = broadband_file
+
+            for frequency, measurement in broadband_file.measurements.items():
+                broadband_measurement._set_measurement(frequency, measurement)
+            broadband_measurement.reflection = dict(broadband_file.reflection)
+            for decision in broadband_file.matching_decisions:
+                decision = MatchingDecision.from_json(decision)
+                broadband_measurement.matching_decisions.append(decision)
+                if decision.action == MatchingPolicy.SKIP:
+                    broadband_measurement._skipped.add(decision.frequency)
+
+            spectrum = broadband_file.spectrum
+            if spectrum is not None:
+                broadband_measurement._spectrum.set_data(*spectrum)
+                broadband_measurement.stitching_strategy = (
+                    broadband_file.spectrum_strategy
+                )
+                broadband_measurement._last_stitched_position = max(
+                    (
+                        broadband_measurement._frequency_positions[frequency]
+                        for frequency in broadband_file.measurements
+                    ),
+                    default=-1,
+                )
+            else:
+                # Files of interrupted measurements have no spectrum yet
+                broadband_measurement.assemble_broadband_spectrum()
+
+            complex_spectrum = broadband_file.complex_spectrum
+            if complex_spectrum is not None:
+                fdx, fdy, phase_corrections = complex_spectrum
+                broadband_measurement._complex_spectrum = (fdx, fdy)
+                broadband_measurement.phase_corrections = phase_corrections
+
+            timings = broadband_file.timings
+            if timings is not None:
+                broadband_measurement.timings = StepTimings(
+                    timings["frequencies"], timings["sessions"], timings["times"]
+                )
+
+            return broadband_measurement
+
+        @classmethod
+        def resume(cls, file_name: str):
+            """Rebuilds an interrupted broadband measurement from its stream file so it can be continued.
+
+            Everything measured up to the last complete record of the file is restored and new measurements are appended to the same file.
+
+            Args:
+                file_name (str): The name of the stream file.
+
+            Returns:
+                BroadbandMeasurement: The broadband measurement object.
+            """
+            # An incomplete record has to be removed before the file is memory-mapped
+            storage.truncate_incomplete(file_name)
+            broadband_measurement = cls.from_file(file_name)
+            broadband_measurement.resume_stream(file_name)
+            return broadband_measurement
+
+        def get_decimated_spectrum(
+            self, x_lower: float, x_upper: float, max_points: int
+        ) -> tuple:
+            """This method returns the broadband spectrum between two frequencies with a bounded number of points for plotting.
+
+            Args:
+                x_lower (float): The lower frequency of the range in MHz.
+                x_upper (float): The upper frequency of the range in MHz.
+                max_points (int): The maximum number of points, usually twice the width of the plot in pixels.
+
+            Returns:
+                tuple: The frequency and magnitude values of the decimated spectrum.
+            """
+            return self._spectrum.decimate(x_lower, x_upper, max_points)
+
         @property
         def single_frequency_measurements(self) -> dict:
             """This property contains the dict of all frequencies that have to be measured."""
@@ -362,17 +1375,42 @@ class BroadbandModel(ModuleModel):
         @property
         def broadband_data_fdx(self):
             """This property contains the broadband data and is assembled by the different single_frequency measurements in frequency domain."""
-            return self._broadband_data_fdx
+            return self._spectrum.fdx
 
         @broadband_data_fdx.setter
         def broadband_data_fdx(self, value):
-            self._broadband_data_fdx = value
+            self._stitcher = None
+            self._spectrum.set_data(value, self._spectrum.fdy[: len(value)])
 
         @property
         def broadband_data_fdy(self):
             """This property contains the broadband data and is assembled by the different single_frequency measurements in frequency domain."""
-            return self._broadband_data_fdy
+            return self._spectrum.fdy
 
         @broadband_data_fdy.setter
         def broadband_data_fdy(self, value):
-            self._broadband_data_fdy = value
+            self._stitcher = None
+            self._spectrum.set_data(self._spectrum.fdx[: len(value)], value)
+
+        @property
+        def broadband_data_complex_fdx(self):
+            """The frequency values of the complex spectrum in MHz, None if it has not been calculated."""
+            if self._complex_spectrum is None:
+                return None
+            return self._complex_spectrum[0]
+
+        @property
+        def broadband_data_complex_fdy(self):
+            """The phase-corrected complex values of the broadband spectrum, None if it has not been calculated, see compute_complex_spectrum."""
+            if self._complex_spectrum is None:
+                return None
+            return self._complex_spectrum[1]
+
+        @property
+        def skipped_frequencies(self) -> set:
+            """The frequencies the minimum matching policy has skipped and that have not been measured."""
+            return {
+                frequency
+                for frequency in self._skipped
+                if self._single_frequency_measurements.get(frequency) is None
+            }
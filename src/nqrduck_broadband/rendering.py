@@ -0,0 +1,110 @@
+"""This module contains the classes used to redraw the plots of the broadband module without holding up the measurement."""
+
+import logging
+import time
+from PyQt6.QtCore import pyqtSignal, QObject, QTimer
+
+logger = logging.getLogger(__name__)
+
+
+class RenderScheduler(QObject):
+    """Coalesces render requests to a maximum frame rate.
+
+    Any number of requests that arrive before the next frame is due result in a single render signal.
+    The plots are therefore redrawn at most max_frame_rate times per second, no matter how fast measurements arrive.
+
+    Args:
+        max_frame_rate (float): The maximum number of frames per second.
+
+    Signals:
+        render: Signal that the plots should be redrawn now.
+    """
+
+    render = pyqtSignal()
+
+    def __init__(self, max_frame_rate: float) -> None:
+        """Initializes the RenderScheduler."""
+        super().__init__()
+        self.max_frame_rate = max_frame_rate
+        self._last_render = float("-inf")
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._on_timeout)
+
+    @property
+    def max_frame_rate(self) -> float:
+        """The maximum number of frames per second."""
+        return self._max_frame_rate
+
+    @max_frame_rate.setter
+    def max_frame_rate(self, value: float):
+        if value <= 0:
+            raise ValueError("The maximum frame rate has to be positive.")
+        self._max_frame_rate = float(value)
+
+    def request(self) -> None:
+        """This method requests a new frame.
+
+        If a frame is already scheduled the request is merged into it.
+        """
+        if self._timer.isActive():
+            return
+        delay = max(0.0, self._last_render + 1 / self._max_frame_rate - time.monotonic())
+        self._timer.start(int(delay * 1e3))
+
+    def _on_timeout(self) -> None:
+        self._last_render = time.monotonic()
+        self.render.emit()
+
+
+class BlitManager:
+    """Redraws the data lines of a matplotlib canvas with blitting.
+
+    The lines are animated artists, so they are not part of the cached background of the canvas.
+    Updating them only restores the background and draws the lines on top instead of redrawing the whole figure.
+
+    Args:
+        canvas (FigureCanvas): The canvas the lines are drawn on.
+    """
+
+    def __init__(self, canvas) -> None:
+        """Initializes the BlitManager."""
+        self.canvas = canvas
+        self._artists = []
+        self._background = None
+        canvas.mpl_connect("draw_event", self._on_draw)
+
+    def add_artist(self, artist) -> None:
+        """This method adds an artist that is redrawn with blitting.
+
+        Args:
+            artist (Artist): The artist, it has to belong to the figure of the canvas.
+        """
+        artist.set_animated(True)
+        self._artists.append(artist)
+
+    def clear(self) -> None:
+        """This method removes all artists, used when the axes of the canvas are cleared."""
+        self._artists = []
+
+    def update(self) -> None:
+        """This method redraws the artists on top of the cached background."""
+        if self._background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_artists(self.canvas.get_renderer())
+        self.canvas.blit(self.canvas.figure.bbox)
+        self.canvas.flush_events()
+
+    def _on_draw(self, event) -> None:
+        # The background is only cached for draws on screen, not when the figure is saved
+        if event.renderer is getattr(self.canvas, "renderer", None):
+            self._background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._draw_artists(event.renderer)
+
+    def _draw_artists(self, renderer) -> None:
+        for artist in self._artists:
+            if artist.axes is not None:
+                artist.draw(renderer)
@@ -0,0 +1,349 @@
+"""This module contains the pipeline that recalculates the spectra of a broadband measurement from the raw time domain data.
+
+Reprocessing a sweep, e.g. with a different apodization window, needs an FFT of every single frequency measurement.
+The pipeline copies the windowed time domain data into shared memory once and fans the FFTs and the extraction of the
+stitching slices out over a process pool, so reprocessing a large sweep scales with the number of cores.
+Only the small slices are sent back from the worker processes.
+The worker processes are spawned instead of forked, forking the threads of a running Qt application can deadlock the children.
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from quackseq.signalprocessing import SignalProcessing
+from . import stitching
+from .storage import SpilledMeasurement, record_shape
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ZERO_PADDING = 1000
+"""The zero padding of the FFT, the same as used by quackseq measurements."""
+
+CHUNKS_PER_WORKER = 4
+"""Number of chunks the measurements are split into per worker process, so fast workers pick up the remaining work."""
+
+START_METHOD = "spawn"
+"""The start method of the worker processes, the workers only import this module."""
+
+IN_PROCESS_CHUNK_SIZE = 64
+"""Number of measurements whose time domain data is held at once when the sweep is reprocessed in this process."""
+
+
+class _Spectrum:
+    """The frequency domain data of a single frequency measurement, with the attributes used by stitching.compute_slices."""
+
+    __slots__ = ("fdx", "fdy", "target_frequency", "IF_frequency")
+
+    def __init__(
+        self, fdx: np.array, fdy: np.array, target_frequency: float, IF_frequency: float
+    ) -> None:
+        """Initializes the _Spectrum."""
+        self.fdx = fdx
+        self.fdy = fdy
+        self.target_frequency = target_frequency
+        self.IF_frequency = IF_frequency
+
+
+def _time_domain(measurement) -> tuple:
+    """Returns the time domain data of the first data set of a single frequency measurement.
+
+    Spilled measurements are read from disk without calculating their frequency domain data.
+
+    Args:
+        measurement (Measurement | SpilledMeasurement): The single frequency measurement.
+
+    Returns:
+        tuple: The time values, the complex values of the first data set, the target frequency, the IF frequency and the frequency shift.
+    """
+    if isinstance(measurement, SpilledMeasurement):
+        header, arrays = measurement.load_record()
+        return (
+            arrays["tdx"],
+            stitching.first_dataset(arrays["tdy"]),
+            header["target_frequency"],
+            header["IF_frequency"],
+            header.get("frequency_shift", 0.0),
+        )
+    return (
+        np.asarray(measurement.tdx),
+        stitching.first_dataset(measurement.tdy),
+        measurement.target_frequency,
+        measurement.IF_frequency,
+        getattr(measurement, "frequency_shift", 0.0),
+    )
+
+
+def _describe(measurement) -> tuple:
+    """Returns the number of samples and the metadata of a single frequency measurement.
+
+    Only the header of a spilled measurement is read, its raw data stays on disk.
+
+    Args:
+        measurement (Measurement | SpilledMeasurement): The single frequency measurement.
+
+    Returns:
+        tuple: The number of samples and a tuple of the target frequency, the IF frequency and the frequency shift.
+    """
+    if isinstance(measurement, SpilledMeasurement):
+        header = measurement.load_header()
+        return record_shape(header, "tdx")[0], (
+            header["target_frequency"],
+            header["IF_frequency"],
+            header.get("frequency_shift", 0.0),
+        )
+    return len(measurement.tdx), (
+        measurement.target_frequency,
+        measurement.IF_frequency,
+        getattr(measurement, "frequency_shift", 0.0),
+    )
+
+
+def _fill_rows(tdx: np.array, tdy: np.array, measurements: list, window) -> None:
+    """Copies the time domain data of single frequency measurements into the rows of preallocated arrays.
+
+    The measurements are read one at a time, so only the raw data of a single measurement is held besides the arrays.
+    The apodization window is applied on the way. Its weights are calculated again whenever the time values of a row differ from the previous row.
+
+    Args:
+        tdx (np.array): The time values, one row per measurement.
+        tdy (np.array): The complex time domain values, one row per measurement.
+        measurements (list): The single frequency measurements, all with as many samples as the rows.
+        window (np.array | callable): The apodization window, see reprocess.
+    """
+    weights = None
+    for row, measurement in enumerate(measurements):
+        row_x, row_y = _time_domain(measurement)[:2]
+        if window is not None and (row == 0 or not np.array_equal(row_x, tdx[row - 1])):
+            weights = _window_weights(window, row_x)
+        tdx[row] = row_x
+        tdy[row] = row_y if weights is None else row_y * weights
+
+
+def process_rows(
+    tdx: np.array,
+    tdy: np.array,
+    metadata: list,
+    frequency_step: float,
+    window: np.array = None,
+    zero_padding: int = DEFAULT_ZERO_PADDING,
+) -> list:
+    """Calculates the spectra of several single frequency measurements and cuts out their stitching slices.
+
+    Args:
+        tdx (np.array): The time values of the measurements, one row per measurement.
+        tdy (np.array): The complex time domain values of the measurements, one row per measurement.
+        metadata (list): The target frequency, the IF frequency and the frequency shift of every measurement.
+        frequency_step (float): The frequency step of the broadband measurement in Hz.
+        window (np.array, optional): The apodization window the time domain values are multiplied with.
+        zero_padding (int, optional): The zero padding of the FFT.
+
+    Returns:
+        list: The SpectrumSlice of every measurement.
+    """
+    spectra = []
+    for row_x, row_y, (target_frequency, IF_frequency, frequency_shift) in zip(
+        tdx, tdy, metadata
+    ):
+        if window is not None:
+            row_y = row_y * window
+        fdx, fdy = SignalProcessing.fft(
+            row_x, row_y[:, np.newaxis], frequency_shift, zero_padding
+        )
+        spectra.append(_Spectrum(fdx, fdy[:, 0], target_frequency, IF_frequency))
+    return stitching.compute_slices(spectra, frequency_step)
+
+
+def spectra(
+    measurements: dict, window=None, zero_padding: int = DEFAULT_ZERO_PADDING
+) -> list:
+    """Recalculates the complete spectra of single frequency measurements from their time domain data.
+
+    Used by the stitching strategies that need more than the slices, the FFTs are calculated in this process.
+
+    Args:
+        measurements (dict): The single frequency measurements by target frequency. Missing measurements are None.
+        window (np.array | callable, optional): The apodization window, see reprocess.
+        zero_padding (int, optional): The zero padding of the FFT.
+
+    Returns:
+        list: The spectra of the measurements ordered by target frequency, with the attributes used by the stitching strategies.
+    """
+    results = []
+    for measurement in measurements.values():
+        if measurement is None:
+            continue
+        tdx, tdy, target_frequency, IF_frequency, frequency_shift = _time_domain(
+            measurement
+        )
+        weights = _window_weights(window, tdx)
+        if weights is not None:
+            tdy = tdy * weights
+        fdx, fdy = SignalProcessing.fft(
+            tdx, tdy[:, np.newaxis], frequency_shift, zero_padding
+        )
+        results.append(_Spectrum(fdx, fdy[:, 0], target_frequency, IF_frequency))
+    return sorted(results, key=lambda spectrum: spectrum.target_frequency)
+
+
+def _process_shared_rows(
+    names: tuple,
+    shape: tuple,
+    start: int,
+    stop: int,
+    metadata: list,
+    frequency_step: float,
+    window: np.array,
+    zero_padding: int,
+) -> list:
+    """Runs process_rows in a worker process on rows of the time domain data in shared memory."""
+    x_memory = shared_memory.SharedMemory(name=names[0])
+    y_memory = shared_memory.SharedMemory(name=names[1])
+    try:
+        tdx = np.ndarray(shape, dtype=float, buffer=x_memory.buf)
+        tdy = np.ndarray(shape, dtype=complex, buffer=y_memory.buf)
+        spectrum_slices = process_rows(
+            tdx[start:stop],
+            tdy[start:stop],
+            metadata,
+            frequency_step,
+            window,
+            zero_padding,
+        )
+        # The views have to be released before the shared memory can be closed
+        del tdx, tdy
+        return spectrum_slices
+    finally:
+        x_memory.close()
+        y_memory.close()
+
+
+def _window_weights(window, tdx: np.array) -> np.array:
+    """Returns the weights of an apodization window for the given time values."""
+    if window is None:
+        return None
+    if callable(window):
+        window = window(np.asarray(tdx))
+    return np.asarray(window, dtype=float)
+
+
+def reprocess(
+    measurements: dict,
+    frequency_step: float,
+    window=None,
+    zero_padding: int = DEFAULT_ZERO_PADDING,
+    max_workers: int = None,
+) -> dict:
+    """Recalculates the stitching slices of single frequency measurements from their time domain data.
+
+    Measurements with the same number of samples are copied into one shared memory block and processed in chunks by a process pool.
+    The blocks are sized from the record headers first, then the raw data of every measurement is copied straight into its row,
+    so spilled measurements are read from disk one at a time and no second copy of the sweep is held.
+    Small sweeps, or a single worker, are processed in this process because starting the pool would take longer,
+    a few measurements at a time.
+
+    Args:
+        measurements (dict): The single frequency measurements by target frequency, as stored by the broadband measurement. Missing measurements are None.
+        frequency_step (float): The frequency step of the broadband measurement in Hz.
+        window (np.array | callable, optional): The apodization window, either the weights of the samples
+            or a function that returns the weights for the time values of a measurement in µs.
+        zero_padding (int, optional): The zero padding of the FFT.
+        max_workers (int, optional): The number of worker processes, the number of CPUs by default.
+
+    Returns:
+        dict: The SpectrumSlice of every measurement by target frequency, in the order of the measurements.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    # Group the measurements by their number of samples, every group is stored in one block of shared memory.
+    # Only the headers are read here, the raw data is copied straight into the blocks later.
+    groups = {}
+    for frequency, measurement in measurements.items():
+        if measurement is None:
+            continue
+        n_samples, metadata = _describe(measurement)
+        groups.setdefault(n_samples, []).append((frequency, measurement, metadata))
+
+    n_measurements = sum(len(group) for group in groups.values())
+    logger.debug(
+        f"Reprocessing {n_measurements} single frequency measurements with {max_workers} workers."
+    )
+
+    results = {}
+    if max_workers <= 1 or n_measurements < 2 * max_workers:
+        for n_samples, group in groups.items():
+            # The rows are reused for every chunk, so only the raw data of one chunk is in memory
+            chunk_size = min(len(group), IN_PROCESS_CHUNK_SIZE)
+            tdx = np.empty((chunk_size, n_samples), dtype=float)
+            tdy = np.empty((chunk_size, n_samples), dtype=complex)
+            for start in range(0, len(group), chunk_size):
+                chunk = group[start : start + chunk_size]
+                _fill_rows(tdx, tdy, [item[1] for item in chunk], window)
+                spectrum_slices = process_rows(
+                    tdx[: len(chunk)],
+                    tdy[: len(chunk)],
+                    [item[2] for item in chunk],
+                    frequency_step,
+                    zero_padding=zero_padding,
+                )
+                for (frequency, _, _), spectrum_slice in zip(chunk, spectrum_slices):
+                    results[frequency] = spectrum_slice
+    else:
+        chunk_size = max(1, math.ceil(n_measurements / (max_workers * CHUNKS_PER_WORKER)))
+        blocks = []
+        try:
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context(START_METHOD),
+            ) as executor:
+                futures = []
+                for n_samples, group in groups.items():
+                    shape = (len(group), n_samples)
+                    x_memory = shared_memory.SharedMemory(
+                        create=True, size=max(1, int(np.prod(shape)) * np.dtype(float).itemsize)
+                    )
+                    blocks.append(x_memory)
+                    y_memory = shared_memory.SharedMemory(
+                        create=True, size=max(1, int(np.prod(shape)) * np.dtype(complex).itemsize)
+                    )
+                    blocks.append(y_memory)
+
+                    tdx = np.ndarray(shape, dtype=float, buffer=x_memory.buf)
+                    tdy = np.ndarray(shape, dtype=complex, buffer=y_memory.buf)
+                    _fill_rows(tdx, tdy, [item[1] for item in group], window)
+                    del tdx, tdy
+
+                    for start in range(0, len(group), chunk_size):
+                        stop = min(start + chunk_size, len(group))
+                        future = executor.submit(
+                            _process_shared_rows,
+                            (x_memory.name, y_memory.name),
+                            shape,
+                            start,
+                            stop,
+                            [item[2] for item in group[start:stop]],
+                            frequency_step,
+                            None,
+                            zero_padding,
+                        )
+                        futures.append(([item[0] for item in group[start:stop]], future))
+
+                for frequencies, future in futures:
+                    for frequency, spectrum_slice in zip(frequencies, future.result()):
+                        results[frequency] = spectrum_slice
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    # Keep the order of the measurements, it is the order the slices are stitched in
+    return {
+        frequency: results[frequency]
+        for frequency in measurements
+        if frequency in results
+    }
+
@@ -0,0 +1,104 @@
+"""This module contains the StepScheduler class which schedules the frequency steps of a broadband measurement."""
+
+import logging
+import time
+from PyQt6.QtCore import pyqtSignal, QObject, QTimer
+
+logger = logging.getLogger(__name__)
+
+
+class StepScheduler(QObject):
+    """Schedules the single frequency measurements of a broadband measurement.
+
+    A step is scheduled as soon as the previous step has finished. It is started after the settle time of its frequency,
+    with a settle time of zero it is started as soon as control returns to the event loop.
+    The time between the end of the previous step and the start of the next step is recorded as idle time.
+
+    Signals:
+        step_due: Signal that the step at the given frequency should be started now.
+    """
+
+    step_due = pyqtSignal(float)
+
+    def __init__(self, settle_time: float = 0.0) -> None:
+        """Initializes the StepScheduler."""
+        super().__init__()
+        self.settle_time = settle_time
+        self.settle_times = {}
+        self.idle_times = {}
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._on_timeout)
+        self._frequency = None
+        self._ready_time = None
+
+    @property
+    def settle_time(self) -> float:
+        """The default time in seconds that is waited before a step is started."""
+        return self._settle_time
+
+    @settle_time.setter
+    def settle_time(self, value: float):
+        self._settle_time = max(0.0, float(value))
+
+    @property
+    def settle_times(self) -> dict:
+        """Settle times in seconds for single frequencies, overriding the default settle time."""
+        return self._settle_times
+
+    @settle_times.setter
+    def settle_times(self, value: dict):
+        self._settle_times = dict(value)
+
+    @property
+    def total_idle_time(self) -> float:
+        """The sum of the idle times of all steps in seconds."""
+        return sum(self.idle_times.values())
+
+    def get_settle_time(self, frequency: float) -> float:
+        """This method returns the settle time of the step at a frequency.
+
+        Args:
+            frequency (float): The frequency of the step in Hz.
+
+        Returns:
+            float: The settle time in seconds.
+        """
+        return self._settle_times.get(frequency, self._settle_time)
+
+    def schedule(self, frequency: float) -> None:
+        """This method schedules the step at a frequency.
+
+        It should be called as soon as the previous step has finished, which marks the start of the idle time of the step.
+
+        Args:
+            frequency (float): The frequency of the step in Hz.
+        """
+        settle_time = self.get_settle_time(frequency)
+        logger.debug(
+            f"Scheduling step at frequency {frequency} with settle time {settle_time} s"
+        )
+        self._frequency = frequency
+        self._ready_time = time.monotonic()
+        self._timer.start(int(round(settle_time * 1e3)))
+
+    def cancel(self) -> None:
+        """This method cancels the scheduled step."""
+        self._timer.stop()
+        self._frequency = None
+        self._ready_time = None
+
+    def reset(self) -> None:
+        """This method cancels the scheduled step and forgets the recorded idle times."""
+        self.cancel()
+        self.idle_times = {}
+
+    def _on_timeout(self) -> None:
+        frequency = self._frequency
+        if frequency is None:
+            return
+        self.idle_times[frequency] = time.monotonic() - self._ready_time
+        self._frequency = None
+        self._ready_time = None
+        self.step_due.emit(frequency)
@@ -0,0 +1,642 @@
+"""This module contains the helpers used to stitch single frequency measurements into a broadband spectrum."""
+
+import logging
+import numpy as np
+from .decimation import MinMaxPyramid
+
+logger = logging.getLogger(__name__)
+
+
+def find_nearest(array: np.array, value: float) -> int:
+    """This function finds the nearest value in an array to a given value.
+
+    Args:
+        array (np.array): The array to search in.
+        value (float): The value to search for.
+
+    Returns:
+        int: The index of the nearest value in the array.
+    """
+    array = np.asarray(array)
+    idx = (np.abs(array - value)).argmin()
+    return idx
+
+
+def first_dataset(data: np.array) -> np.array:
+    """Returns the first data set of the time or frequency domain data of a single frequency measurement.
+
+    quackseq stores the different data sets along axis 1.
+
+    Args:
+        data (np.array): The time or frequency domain data.
+
+    Returns:
+        np.array: The one dimensional data of the first data set.
+    """
+    data = np.asarray(data)
+    if data.ndim > 1:
+        data = data[:, 0]
+    return data
+
+
+def magnitude(fdy: np.array) -> np.array:
+    """Returns the magnitude of the frequency domain data of a single frequency measurement.
+
+    quackseq stores the frequency domain data with the different data sets along axis 1, only the first data set is used for stitching.
+
+    Args:
+        fdy (np.array): The frequency domain data.
+
+    Returns:
+        np.array: The one dimensional magnitude of the frequency domain data.
+    """
+    return np.abs(first_dataset(fdy))
+
+
+class SpectrumSlice:
+    """Compact record of the part of a single frequency measurement that ends up in the broadband spectrum.
+
+    The record is computed once when the measurement is added, reassembling the spectrum then only touches these small arrays instead of the whole spectra.
+
+    Args:
+        target_frequency (float): The target frequency of the measurement in Hz.
+        frequency_step (float): The frequency step the slice was cut with in Hz.
+        window (tuple): The lower, center and upper index of the stitching window.
+        x_lower (float): The lower edge frequency of the slice in MHz.
+        x_upper (float): The upper edge frequency of the slice in MHz.
+        fdx (np.array): The inner frequency values of the slice shifted by the target frequency in MHz.
+        y_lower (float): The interpolated magnitude at the lower edge of the slice.
+        fdy (np.array): The inner magnitude values of the slice.
+        y_upper (float): The interpolated magnitude at the upper edge of the slice.
+    """
+
+    __slots__ = (
+        "target_frequency",
+        "frequency_step",
+        "window",
+        "x_lower",
+        "x_upper",
+        "fdx",
+        "y_lower",
+        "fdy",
+        "y_upper",
+    )
+
+    def __init__(
+        self,
+        target_frequency: float,
+        frequency_step: float,
+        window: tuple,
+        x_lower: float,
+        x_upper: float,
+        fdx: np.array,
+        y_lower: float,
+        fdy: np.array,
+        y_upper: float,
+    ) -> None:
+        """Initializes the SpectrumSlice."""
+        self.target_frequency = target_frequency
+        self.frequency_step = frequency_step
+        self.window = window
+        self.x_lower = x_lower
+        self.x_upper = x_upper
+        self.fdx = fdx
+        self.y_lower = y_lower
+        self.fdy = fdy
+        self.y_upper = y_upper
+
+    def __len__(self) -> int:
+        """Number of inner points of the slice."""
+        return len(self.fdx)
+
+
+def nearest_index(array: np.array, values) -> np.array:
+    """Finds the indices of the values nearest to the given values in a sorted array.
+
+    This uses a binary search, so it only needs O(log n) per value instead of scanning the whole array like find_nearest.
+    Ties are resolved to the lower index like np.argmin does.
+
+    Args:
+        array (np.array): The monotonic array to search in.
+        values (float | np.array): The value or values to search for.
+
+    Returns:
+        np.array: The index or indices of the nearest values in the array.
+    """
+    array = np.asarray(array)
+    values = np.asarray(values)
+    descending = len(array) > 1 and array[0] > array[-1]
+    if descending:
+        array = array[::-1]
+
+    idx = np.searchsorted(array, values, side="left")
+    idx = np.clip(idx, 1, len(array) - 1)
+    left = array[idx - 1]
+    right = array[idx]
+    distance_left = np.abs(values - left)
+    distance_right = np.abs(right - values)
+    if descending:
+        # On a tie np.argmin returns the first index, which is the right one of the reversed array
+        idx = np.where(distance_left < distance_right, idx - 1, idx)
+    else:
+        idx = np.where(distance_left <= distance_right, idx - 1, idx)
+    # Arrays with a single element can only return the first index
+    idx = np.minimum(idx, len(array) - 1)
+
+    # Among repeated values np.argmin returns the first occurrence
+    if descending:
+        idx = np.searchsorted(array, array[idx], side="right") - 1
+        idx = len(array) - 1 - idx
+    else:
+        idx = np.searchsorted(array, array[idx], side="left")
+    return idx
+
+
+def slice_window(measurement, frequency_step: float) -> tuple:
+    """Finds the indices of the stitching window of a single frequency measurement.
+
+    Args:
+        measurement (Measurement): The single frequency measurement.
+        frequency_step (float): The frequency step of the broadband measurement in Hz.
+
+    Returns:
+        tuple: The lower, center and upper index of the stitching window.
+    """
+    offset = measurement.IF_frequency * 1e-6
+    half_step = frequency_step / 2 * 1e-6
+    lower, center, upper = nearest_index(
+        measurement.fdx, [offset - half_step, offset, offset + half_step]
+    )
+    return int(lower), int(center), int(upper)
+
+
+def compute_slice(
+    measurement, frequency_step: float, window: tuple = None
+) -> SpectrumSlice:
+    """Cuts out frequency_step / 2 around the IF of a single frequency measurement.
+
+    Args:
+        measurement (Measurement): The single frequency measurement.
+        frequency_step (float): The frequency step of the broadband measurement in Hz.
+        window (tuple, optional): The cached indices of the stitching window as returned by slice_window.
+
+    Returns:
+        SpectrumSlice: The slice of the measurement.
+    """
+    fdx = measurement.fdx
+    fdy = magnitude(measurement.fdy)
+
+    # This finds the center of the spectrum if the IF is not 0 it will cut out step_size / 2 around the IF
+    offset = measurement.IF_frequency * 1e-6
+    half_step = frequency_step / 2 * 1e-6
+    if window is None:
+        window = slice_window(measurement, frequency_step)
+    # The lower and upper index are the nearest indices of the lower and upper frequency step
+    idx_xf_lower, center, idx_xf_upper = window
+
+    # This interpolates the y values of the lower and upper frequency step
+    yf_interp_lower = np.interp(
+        offset - half_step,
+        [fdx[idx_xf_lower], fdx[center]],
+        [fdy[idx_xf_lower], fdy[center]],
+    )
+    yf_interp_upper = np.interp(
+        offset + half_step,
+        [fdx[center], fdx[idx_xf_upper]],
+        [fdy[center], fdy[idx_xf_lower]],
+    )
+
+    # The frequency values are shifted by the target frequency
+    target = measurement.target_frequency * 1e-6
+    x_inner = fdx[idx_xf_lower + 1 : idx_xf_upper - 1] + target - offset
+    # Copy the window so the record does not keep the whole magnitude array alive
+    y_inner = fdy[idx_xf_lower + 1 : idx_xf_upper - 1].copy()
+
+    return SpectrumSlice(
+        measurement.target_frequency,
+        frequency_step,
+        (int(idx_xf_lower), int(center), int(idx_xf_upper)),
+        target - half_step,
+        target + half_step,
+        x_inner,
+        float(yf_interp_lower),
+        y_inner,
+        float(yf_interp_upper),
+    )
+
+
+def window_indices(measurements: list, frequency_step: float) -> tuple:
+    """Finds the indices of the stitching windows of several single frequency measurements at once.
+
+    Measurements that share the same frequency axis object are searched together with a single binary search.
+
+    Args:
+        measurements (list): The single frequency measurements.
+        frequency_step (float): The frequency step of the broadband measurement in Hz.
+
+    Returns:
+        tuple: The lower, center and upper indices of the stitching windows as integer arrays.
+    """
+    n_measurements = len(measurements)
+    offsets = np.array([measurement.IF_frequency for measurement in measurements]) * 1e-6
+    half_step = frequency_step / 2 * 1e-6
+
+    lower = np.empty(n_measurements, dtype=int)
+    center = np.empty(n_measurements, dtype=int)
+    upper = np.empty(n_measurements, dtype=int)
+
+    # Group the measurements by their frequency axis
+    groups = {}
+    axes = {}
+    for position, measurement in enumerate(measurements):
+        groups.setdefault(id(measurement.fdx), []).append(position)
+        axes[id(measurement.fdx)] = measurement.fdx
+
+    for key, group in groups.items():
+        group = np.array(group)
+        values = np.stack(
+            (offsets[group] - half_step, offsets[group], offsets[group] + half_step)
+        )
+        lower[group], center[group], upper[group] = nearest_index(axes[key], values)
+
+    return lower, center, upper
+
+
+def _interp_edges(
+    x: np.array, x0: np.array, x1: np.array, y0: np.array, y1: np.array
+) -> np.array:
+    """Element wise two point interpolation with the same edge behaviour as np.interp."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        y = y0 + (x - x0) * (y1 - y0) / (x1 - x0)
+    y = np.where(x < x0, y0, y)
+    return np.where(x >= x1, y1, y)
+
+
+def compute_slices(
+    measurements: list, frequency_step: float, windows: tuple = None
+) -> list:
+    """Computes the slices of several single frequency measurements in one go.
+
+    All window indices and edge interpolations are computed for every measurement at once.
+
+    Args:
+        measurements (list): The single frequency measurements.
+        frequency_step (float): The frequency step of the broadband measurement in Hz.
+        windows (tuple, optional): The cached lower, center and upper indices of the stitching windows.
+
+    Returns:
+        list: The SpectrumSlice of every measurement.
+    """
+    if not measurements:
+        return []
+
+    if windows is None:
+        windows = window_indices(measurements, frequency_step)
+    lower, center, upper = (np.asarray(indices, dtype=int) for indices in windows)
+
+    if np.any(upper - lower < 2) or np.any(center < lower) or np.any(center > upper):
+        # Degenerate windows can not be gathered with a fixed layout
+        logger.debug("Degenerate stitching window, computing slices one by one.")
+        return [
+            compute_slice(measurement, frequency_step, window)
+            for measurement, window in zip(measurements, zip(lower, center, upper))
+        ]
+
+    # Gather the windows of all measurements into flat arrays
+    window_x = np.concatenate(
+        [
+            np.asarray(measurement.fdx)[lo : up + 1]
+            for measurement, lo, up in zip(measurements, lower, upper)
+        ]
+    )
+    window_y = np.concatenate(
+        [
+            magnitude(np.asarray(measurement.fdy)[lo : up + 1])
+            for measurement, lo, up in zip(measurements, lower, upper)
+        ]
+    )
+    window_lengths = upper - lower + 1
+    window_starts = np.concatenate(([0], np.cumsum(window_lengths)[:-1]))
+
+    offsets = np.array([measurement.IF_frequency for measurement in measurements]) * 1e-6
+    targets = (
+        np.array([measurement.target_frequency for measurement in measurements]) * 1e-6
+    )
+    half_step = frequency_step / 2 * 1e-6
+
+    x_lower = window_x[window_starts]
+    x_center = window_x[window_starts + center - lower]
+    x_upper = window_x[window_starts + upper - lower]
+    y_lower = window_y[window_starts]
+    y_center = window_y[window_starts + center - lower]
+
+    yf_interp_lower = _interp_edges(offsets - half_step, x_lower, x_center, y_lower, y_center)
+    yf_interp_upper = _interp_edges(offsets + half_step, x_center, x_upper, y_center, y_lower)
+
+    # Inner values of all slices, shifted by the target frequency
+    n_inner = upper - lower - 2
+    slice_index = np.repeat(np.arange(len(measurements)), n_inner)
+    within = np.arange(int(n_inner.sum())) - np.repeat(
+        np.cumsum(n_inner) - n_inner, n_inner
+    )
+    source = np.repeat(window_starts + 1, n_inner) + within
+    inner_x = window_x[source] + targets[slice_index] - offsets[slice_index]
+    inner_y = window_y[source]
+    splits = np.cumsum(n_inner)[:-1]
+
+    return [
+        SpectrumSlice(
+            measurement.target_frequency,
+            frequency_step,
+            (int(lo), int(c), int(up)),
+            target - half_step,
+            target + half_step,
+            x,
+            float(y_low),
+            y,
+            float(y_up),
+        )
+        for measurement, lo, c, up, target, x, y_low, y, y_up in zip(
+            measurements,
+            lower,
+            center,
+            upper,
+            targets,
+            np.split(inner_x, splits),
+            yf_interp_lower,
+            np.split(inner_y, splits),
+            yf_interp_upper,
+        )
+    ]
+
+
+def trim_slice(
+    spectrum_slice: SpectrumSlice, x_lower: float, x_upper: float
+) -> SpectrumSlice:
+    """Cuts a slice down to the frequencies between x_lower and x_upper.
+
+    The magnitude at the new edges is interpolated between the neighbouring points of the slice.
+
+    Args:
+        spectrum_slice (SpectrumSlice): The slice to trim.
+        x_lower (float): The new lower edge frequency in MHz, the lower edge is kept if it is higher.
+        x_upper (float): The new upper edge frequency in MHz, the upper edge is kept if it is lower.
+
+    Returns:
+        SpectrumSlice: The trimmed slice, the slice itself if it lies within the edges.
+    """
+    if x_lower <= spectrum_slice.x_lower and x_upper >= spectrum_slice.x_upper:
+        return spectrum_slice
+
+    x_lower = max(x_lower, spectrum_slice.x_lower)
+    x_upper = min(x_upper, spectrum_slice.x_upper)
+    x = np.concatenate(
+        ([spectrum_slice.x_lower], spectrum_slice.fdx, [spectrum_slice.x_upper])
+    )
+    y = np.concatenate(
+        ([spectrum_slice.y_lower], spectrum_slice.fdy, [spectrum_slice.y_upper])
+    )
+    inner = (spectrum_slice.fdx > x_lower) & (spectrum_slice.fdx < x_upper)
+    return SpectrumSlice(
+        spectrum_slice.target_frequency,
+        spectrum_slice.frequency_step,
+        spectrum_slice.window,
+        x_lower,
+        x_upper,
+        spectrum_slice.fdx[inner],
+        float(np.interp(x_lower, x, y)),
+        spectrum_slice.fdy[inner],
+        float(np.interp(x_upper, x, y)),
+    )
+
+
+def assemble_slices(slices: list) -> tuple:
+    """Assembles the broadband spectrum from slices ordered by frequency.
+
+    The spectrum is written with a single allocation, the result is identical to appending the slices one after another to a SpectrumBuffer.
+
+    Args:
+        slices (list): The SpectrumSlice records ordered by frequency.
+
+    Returns:
+        tuple: The frequency and magnitude values of the broadband spectrum.
+    """
+    if not slices:
+        return np.array([]), np.array([])
+
+    n_inner = np.array([len(spectrum_slice) for spectrum_slice in slices], dtype=int)
+    x_lower = np.array([spectrum_slice.x_lower for spectrum_slice in slices])
+    y_lower = np.array([spectrum_slice.y_lower for spectrum_slice in slices])
+    y_upper = np.array([spectrum_slice.y_upper for spectrum_slice in slices])
+
+    # The first slice keeps both of its edges, every following slice shares its lower edge with the previous slice
+    block_lengths = n_inner + 1
+    block_lengths[0] += 1
+    block_starts = np.concatenate(([0], np.cumsum(block_lengths)[:-1]))
+    total = int(block_lengths.sum())
+
+    fdx = np.empty(total)
+    fdy = np.empty(total)
+
+    # Inner values of all slices
+    within = np.arange(int(n_inner.sum())) - np.repeat(
+        np.cumsum(n_inner) - n_inner, n_inner
+    )
+    fdx[np.repeat(block_starts + 1, n_inner) + within] = np.concatenate(
+        [spectrum_slice.fdx for spectrum_slice in slices]
+    )
+    fdy_starts = block_starts.copy()
+    fdy_starts[0] += 1
+    fdy[np.repeat(fdy_starts, n_inner) + within] = np.concatenate(
+        [spectrum_slice.fdy for spectrum_slice in slices]
+    )
+
+    # Edges of the slices, neighbouring edges are averaged
+    fdx[block_starts] = x_lower
+    fdx[block_lengths[0] - 1] = slices[0].x_upper
+    fdy[0] = y_lower[0]
+    edges = y_upper.copy()
+    edges[:-1] = (edges[:-1] + y_lower[1:]) / 2
+    fdy[block_starts + block_lengths - 1] = edges
+
+    return fdx, fdy
+
+
+def stitch_batch(
+    measurements: list, frequency_step: float, windows: tuple = None
+) -> tuple:
+    """Stitches several single frequency measurements into a broadband spectrum in one go.
+
+    Args:
+        measurements (list): The single frequency measurements ordered by frequency.
+        frequency_step (float): The frequency step of the broadband measurement in Hz.
+        windows (tuple, optional): The cached lower, center and upper indices of the stitching windows.
+
+    Returns:
+        tuple: The frequency and magnitude values of the broadband spectrum.
+    """
+    return assemble_slices(compute_slices(measurements, frequency_step, windows))
+
+
+class SpectrumBuffer:
+    """Preallocated output buffer the broadband spectrum is stitched into.
+
+    Slices are written into the free space at the end of the buffer, the buffer only grows (by doubling) when it is full.
+    This makes appending a slice proportional to the size of the slice instead of the size of the whole spectrum.
+    A min/max decimation pyramid of the spectrum is updated along with it, it is used to plot the spectrum.
+
+    Args:
+        capacity (int): The number of points the buffer can hold initially.
+        decimate (bool): If False no decimation pyramid is kept, used for buffers that are never plotted.
+    """
+
+    def __init__(self, capacity: int = 0, decimate: bool = True) -> None:
+        """Initializes the SpectrumBuffer."""
+        self._fdx = np.empty(capacity)
+        self._fdy = np.empty(capacity)
+        self._length = 0
+        self.pyramid = MinMaxPyramid() if decimate else None
+
+    def __len__(self) -> int:
+        """Number of points in the assembled spectrum."""
+        return self._length
+
+    def clear(self) -> None:
+        """Discards the assembled spectrum but keeps the allocated memory."""
+        self._length = 0
+        if self.pyramid is not None:
+            self.pyramid.clear()
+
+    def reserve(self, capacity: int) -> None:
+        """Makes sure the buffer can hold at least capacity points without reallocating.
+
+        Args:
+            capacity (int): The number of points the buffer should be able to hold.
+        """
+        if capacity <= len(self._fdx):
+            return
+
+        logger.debug(f"Growing spectrum buffer to {capacity} points.")
+        fdx = np.empty(capacity)
+        fdy = np.empty(capacity)
+        fdx[: self._length] = self._fdx[: self._length]
+        fdy[: self._length] = self._fdy[: self._length]
+        self._fdx = fdx
+        self._fdy = fdy
+
+    def append_slice(self, spectrum_slice: SpectrumSlice) -> None:
+        """Stitches a single slice to the end of the assembled spectrum.
+
+        Args:
+            spectrum_slice (SpectrumSlice): The slice to append.
+        """
+        n_inner = len(spectrum_slice)
+        start = self._length
+
+        if start == 0:
+            # On the first slice both edges are part of the spectrum
+            stop = n_inner + 2
+            self._ensure_capacity(stop)
+            self._fdx[0] = spectrum_slice.x_lower
+            self._fdx[1 : n_inner + 1] = spectrum_slice.fdx
+            self._fdx[n_inner + 1] = spectrum_slice.x_upper
+            self._fdy[0] = spectrum_slice.y_lower
+            self._fdy[1 : n_inner + 1] = spectrum_slice.fdy
+            self._fdy[n_inner + 1] = spectrum_slice.y_upper
+        else:
+            stop = start + n_inner + 1
+            self._ensure_capacity(stop)
+            # We take the last point of the previous spectrum and the first point of the current spectrum and average them
+            self._fdy[start - 1] = (self._fdy[start - 1] + spectrum_slice.y_lower) / 2
+            self._fdx[start] = spectrum_slice.x_lower
+            self._fdx[start + 1 : stop] = spectrum_slice.fdx
+            self._fdy[start : stop - 1] = spectrum_slice.fdy
+            self._fdy[stop - 1] = spectrum_slice.y_upper
+
+        self._length = stop
+        if self.pyramid is not None:
+            # The last point of the previous slice has changed as well
+            self.pyramid.update(self.fdy, start - 1)
+
+    def set_data(self, fdx: np.array, fdy: np.array) -> None:
+        """Replaces the assembled spectrum with the given data.
+
+        Args:
+            fdx (np.array): The frequency values of the spectrum.
+            fdy (np.array): The magnitude values of the spectrum.
+        """
+        self._fdx = np.asarray(fdx, dtype=float).ravel()
+        self._fdy = np.asarray(fdy, dtype=float).ravel()
+        self._length = len(self._fdx)
+        if self.pyramid is not None:
+            self.pyramid.rebuild(self.fdy)
+
+    def write(self, start: int, fdx: np.array, fdy: np.array) -> None:
+        """Replaces the assembled spectrum from index start on with the given data.
+
+        Used to apply the changes of a spectrum that has been stitched somewhere else, only the changed part has to be copied.
+
+        Args:
+            start (int): The first index that is replaced.
+            fdx (np.array): The new frequency values from index start on.
+            fdy (np.array): The new magnitude values from index start on.
+        """
+        stop = start + len(fdx)
+        self._ensure_capacity(stop)
+        self._fdx[start:stop] = fdx
+        self._fdy[start:stop] = fdy
+        self._length = stop
+        if self.pyramid is not None:
+            self.pyramid.update(self.fdy, start)
+
+    def splice(self, start: int, stop: int, fdx: np.array, fdy: np.array) -> None:
+        """Replaces the points from index start to stop with the given data, which can have another length.
+
+        The points after stop are moved behind the new data, the spectrum before start is not touched.
+
+        Args:
+            start (int): The first index that is replaced.
+            stop (int): The index after the last point that is replaced.
+            fdx (np.array): The new frequency values.
+            fdy (np.array): The new magnitude values.
+        """
+        length = self._length + len(fdx) - (stop - start)
+        new_stop = start + len(fdx)
+        self._ensure_capacity(length)
+        # numpy copies overlapping ranges correctly
+        self._fdx[new_stop:length] = self._fdx[stop : self._length]
+        self._fdy[new_stop:length] = self._fdy[stop : self._length]
+        self._fdx[start:new_stop] = fdx
+        self._fdy[start:new_stop] = fdy
+        self._length = length
+        if self.pyramid is not None:
+            self.pyramid.update(self.fdy, start)
+
+    def decimate(self, x_lower: float, x_upper: float, max_points: int) -> tuple:
+        """Returns the assembled spectrum between two frequencies, decimated to about max_points points.
+
+        The minimum and maximum of every decimated bin are kept, so no peaks are lost.
+
+        Args:
+            x_lower (float): The lower frequency of the range in MHz.
+            x_upper (float): The upper frequency of the range in MHz.
+            max_points (int): The maximum number of points.
+
+        Returns:
+            tuple: The frequency and magnitude values of the decimated spectrum.
+        """
+        return self.pyramid.query(self.fdx, self.fdy, x_lower, x_upper, max_points)
+
+    def _ensure_capacity(self, capacity: int) -> None:
+        if capacity > len(self._fdx):
+            self.reserve(max(capacity, 2 * len(self._fdx)))
+
+    @property
+    def fdx(self) -> np.array:
+        """The frequency values of the assembled spectrum."""
+        return self._fdx[: self._length]
+
+    @property
+    def fdy(self) -> np.array:
+        """The magnitude values of the assembled spectrum."""
+        return self._fdy[: self._length]
@@ -0,0 +1,208 @@
+"""This module contains the StitchingWorker class which stitches the broadband spectrum in a background thread."""
+
+import logging
+import queue
+import numpy as np
+from PyQt6.QtCore import pyqtSignal, QThread
+from . import stitching
+from .adaptive import AdaptiveStitcher
+
+logger = logging.getLogger(__name__)
+
+
+class SpectrumUpdate:
+    """A change of the stitched spectrum published by the StitchingWorker.
+
+    Only the part of the spectrum that has changed is copied, so applying an update costs time proportional to the new slices.
+
+    Attributes:
+        start (int): The first index of the spectrum that has changed.
+        fdx (np.array): The frequency values of the spectrum from index start on.
+        fdy (np.array): The magnitude values of the spectrum from index start on.
+        slices (list): The slices of the measurements that have been stitched.
+        last_stitched_position (int): The position of the last stitched frequency of the sweep.
+    """
+
+    __slots__ = ("start", "fdx", "fdy", "slices", "last_stitched_position")
+
+    def __init__(
+        self,
+        start: int,
+        fdx: np.array,
+        fdy: np.array,
+        slices: list,
+        last_stitched_position: int,
+    ) -> None:
+        """Initializes the SpectrumUpdate."""
+        self.start = start
+        self.fdx = fdx
+        self.fdy = fdy
+        self.slices = slices
+        self.last_stitched_position = last_stitched_position
+
+
+class StitchingWorker(QThread):
+    """Thread that stitches single frequency measurements into the broadband spectrum.
+
+    Measurements are passed to the thread through a queue. The thread computes their slices and stitches them to its own copy of the spectrum.
+    All measurements that are waiting in the queue are stitched at once and published as a single SpectrumUpdate,
+    so a thread that falls behind catches up instead of publishing every intermediate spectrum.
+    The updates are collected with take_updates, the updated signal is emitted whenever a new one is available.
+
+    Args:
+        frequency_step (float): The frequency step of the broadband measurement in Hz.
+        size (int): The number of frequencies of the broadband measurement, used to preallocate the spectrum.
+        slices (dict, optional): The slices that have already been stitched by target frequency.
+        positions (dict, optional): The positions of the frequencies in the sweep.
+        spectrum (tuple, optional): The frequency and magnitude values of the spectrum that has already been stitched.
+        last_stitched_position (int, optional): The position of the last frequency that has already been stitched.
+        plan (AdaptivePlan, optional): The plan of an adaptive measurement, its coarse measurements are cut wider, see AdaptivePlan.slice_step.
+
+    Signals:
+        updated: Signal that a new SpectrumUpdate is available.
+    """
+
+    updated = pyqtSignal()
+
+    def __init__(
+        self,
+        frequency_step: float,
+        size: int,
+        slices: dict = None,
+        positions: dict = None,
+        spectrum: tuple = None,
+        last_stitched_position: int = -1,
+        plan=None,
+    ) -> None:
+        """Initializes the StitchingWorker."""
+        super().__init__()
+        self.frequency_step = frequency_step
+        self._size = size
+        self._slices = dict(slices or {})
+        self._positions = dict(positions or {})
+        self._last_stitched_position = last_stitched_position
+        self._plan = plan
+        self._stitcher = None
+
+        self._spectrum = stitching.SpectrumBuffer(decimate=False)
+        if spectrum is not None:
+            self._spectrum.set_data(*spectrum)
+
+        self._input = queue.Queue()
+        self._output = queue.Queue()
+
+    def submit(self, measurement, position: int) -> None:
+        """This method queues a measurement for stitching, it returns immediately.
+
+        Args:
+            measurement (Measurement): The single frequency measurement.
+            position (int): The position of the target frequency of the measurement in the sweep.
+        """
+        self._input.put((measurement, position))
+
+    def take_updates(self) -> list:
+        """This method returns the updates that have been published since the last call.
+
+        Returns:
+            list: The SpectrumUpdate objects in the order they have been published.
+        """
+        updates = []
+        while True:
+            try:
+                updates.append(self._output.get_nowait())
+            except queue.Empty:
+                return updates
+
+    def wait_until_idle(self) -> None:
+        """This method blocks until all queued measurements have been stitched and published."""
+        self._input.join()
+
+    def stop(self) -> None:
+        """This method stops the thread after the queued measurements have been stitched."""
+        if self.isRunning():
+            self._input.put(None)
+            self.wait()
+
+    def run(self) -> None:
+        """Stitches queued measurements until the thread is stopped."""
+        while True:
+            items = [self._input.get()]
+            while True:
+                try:
+                    items.append(self._input.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                batch = [item for item in items if item is not None]
+                if batch:
+                    self._output.put(self._stitch(batch))
+                    self.updated.emit()
+            except Exception:
+                logger.exception("Stitching failed.")
+            finally:
+                for _ in items:
+                    self._input.task_done()
+
+            if None in items:
+                return
+
+    def _stitch(self, batch: list) -> SpectrumUpdate:
+        spectrum = self._spectrum
+        start = None
+        new_slices = []
+
+        for measurement, position in batch:
+            frequency = measurement.target_frequency
+            spectrum_slice = stitching.compute_slice(
+                measurement,
+                self._plan.slice_step(frequency)
+                if self._plan is not None
+                else self.frequency_step,
+            )
+            replaced = frequency in self._slices
+            self._slices[frequency] = spectrum_slice
+            self._positions[frequency] = position
+            new_slices.append(spectrum_slice)
+
+            # With adaptive stepping a new measurement changes the slices of its neighbours, they are stitched again
+            if self._stitcher is not None:
+                changed = self._stitcher.add_slice(position, spectrum_slice)
+                self._last_stitched_position = max(
+                    self._last_stitched_position, position
+                )
+            # Only a measurement that continues the spectrum can be stitched incrementally
+            elif (
+                not replaced
+                and self._plan is None
+                and position > self._last_stitched_position
+            ):
+                if len(spectrum) == 0:
+                    spectrum.reserve((len(spectrum_slice) + 1) * self._size + 1)
+                changed = max(len(spectrum) - 1, 0)
+                spectrum.append_slice(spectrum_slice)
+                self._last_stitched_position = position
+            else:
+                logger.debug("Measurement arrived out of order, reassembling spectrum.")
+                frequencies = sorted(self._slices, key=self._positions.get)
+                slices = [self._slices[frequency] for frequency in frequencies]
+                if self._plan is not None:
+                    self._stitcher = AdaptiveStitcher(self._plan, spectrum)
+                    self._stitcher.set_slices(
+                        [self._positions[frequency] for frequency in frequencies],
+                        slices,
+                    )
+                else:
+                    spectrum.set_data(*stitching.assemble_slices(slices))
+                changed = 0
+                self._last_stitched_position = self._positions[frequencies[-1]]
+
+            start = changed if start is None else min(start, changed)
+
+        return SpectrumUpdate(
+            start,
+            spectrum.fdx[start:].copy(),
+            spectrum.fdy[start:].copy(),
+            new_slices,
+            self._last_stitched_position,
+        )
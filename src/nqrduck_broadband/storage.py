@@ -0,0 +1,902 @@
+"""This module contains the on-disk storage of broadband measurements.
+
+Broadband measurements are stored in a chunked binary container that is written while the measurement is running.
+The file starts with a magic string followed by a sequence of records. Every record consists of
+
+- the length of the record header (uint32, little endian)
+- the length of the record payload (uint64, little endian)
+- the record header, a small utf-8 encoded JSON object
+- the record payload, the raw bytes of the arrays described in the header
+
+The first record describes the broadband measurement (frequencies and frequency step), every single frequency measurement,
+reflection value, minimum matching decision and stitched spectrum is appended as its own record.
+A finished measurement also stores the timestamps of its steps together with their summary, the last timings record of a file is the current one. A record is only complete when its payload has been written,
+so a file of a measurement that crashed can still be read up to the last complete record.
+
+While a measurement is running, checkpoint records are written periodically. They list the frequencies completed so far and
+are synced to disk, so an interrupted measurement can be resumed by appending to the same file.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import numpy as np
+from quackseq.measurement import Fit, Measurement
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"NQRDUCK-BROAD\x00\x01\x00"
+RECORD_PREFIX = struct.Struct("<IQ")
+
+
+def is_broadband_file(file_name: str) -> bool:
+    """Checks if a file is a binary broadband file.
+
+    Args:
+        file_name (str): The name of the file.
+
+    Returns:
+        bool: True if the file starts with the magic string of the binary format.
+    """
+    with open(file_name, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _write_record(f, header: dict, arrays: dict = None) -> int:
+    """Writes a single record to the end of a file.
+
+    Args:
+        f (file): The file opened for binary writing.
+        header (dict): The json-compatible header of the record.
+        arrays (dict, optional): The arrays stored in the payload of the record.
+
+    Returns:
+        int: The offset of the record in the file.
+    """
+    arrays = arrays or {}
+    header = dict(header)
+    header["arrays"] = []
+    payload_length = 0
+    contiguous = []
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        header["arrays"].append(
+            {
+                "name": name,
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "offset": payload_length,
+            }
+        )
+        payload_length += array.nbytes
+        contiguous.append(array)
+
+    encoded_header = json.dumps(header).encode("utf-8")
+    offset = f.tell()
+    f.write(RECORD_PREFIX.pack(len(encoded_header), payload_length))
+    f.write(encoded_header)
+    for array in contiguous:
+        f.write(array.tobytes())
+    f.flush()
+    return offset
+
+
+def _read_record_header(f) -> tuple:
+    """Reads the header of the record at the current position of a file.
+
+    Args:
+        f (file): The file opened for binary reading.
+
+    Returns:
+        tuple: The header, the offset of the payload and the length of the payload, or None if there is no complete record.
+    """
+    prefix = f.read(RECORD_PREFIX.size)
+    if len(prefix) < RECORD_PREFIX.size:
+        return None
+    header_length, payload_length = RECORD_PREFIX.unpack(prefix)
+    encoded_header = f.read(header_length)
+    if len(encoded_header) < header_length:
+        return None
+    try:
+        header = json.loads(encoded_header.decode("utf-8"))
+    except ValueError:
+        logger.warning("Found a corrupted record header, ignoring the rest of the file.")
+        return None
+    return header, f.tell(), payload_length
+
+
+def _read_arrays(buffer, header: dict, payload_offset: int) -> dict:
+    """Reads the arrays of a record from a buffer.
+
+    Args:
+        buffer (bytes | mmap): The buffer containing the file.
+        header (dict): The header of the record.
+        payload_offset (int): The offset of the payload in the buffer.
+
+    Returns:
+        dict: The arrays of the record.
+    """
+    arrays = {}
+    for description in header["arrays"]:
+        dtype = np.dtype(description["dtype"])
+        shape = tuple(description["shape"])
+        count = int(np.prod(shape, dtype=int))
+        arrays[description["name"]] = np.frombuffer(
+            buffer,
+            dtype=dtype,
+            count=count,
+            offset=payload_offset + description["offset"],
+        ).reshape(shape)
+    return arrays
+
+
+def _payload_length(header: dict) -> int:
+    """Calculates the length of the payload of a record from its header.
+
+    Args:
+        header (dict): The header of the record.
+
+    Returns:
+        int: The length of the payload in bytes.
+    """
+    return sum(
+        int(np.prod(description["shape"], dtype=int)) * np.dtype(description["dtype"]).itemsize
+        for description in header["arrays"]
+    )
+
+
+def _measurement_from_record(header: dict, arrays: dict) -> Measurement:
+    """Creates a single frequency measurement from a measurement record.
+
+    Args:
+        header (dict): The header of the record.
+        arrays (dict): The arrays of the record.
+
+    Returns:
+        Measurement: The single frequency measurement.
+    """
+    measurement = Measurement(
+        header["name"],
+        arrays["tdx"],
+        arrays["tdy"],
+        target_frequency=header["target_frequency"],
+        frequency_shift=header.get("frequency_shift", 0),
+        IF_frequency=header["IF_frequency"],
+    )
+    # Fits store only their class and name, they are calculated again like in Measurement.from_json
+    for fit_json in header.get("fits", []):
+        try:
+            measurement.add_fit(Fit.from_json(fit_json, measurement))
+        except Exception:
+            logger.warning(
+                f"Could not restore fit {fit_json.get('name')} of the measurement at {header['target_frequency']} Hz.",
+                exc_info=True,
+            )
+    return measurement
+
+
+def _scan_buffer(buffer) -> list:
+    """Reads the headers of all complete records in a buffer containing a binary broadband file.
+
+    Args:
+        buffer (bytes | mmap): The buffer containing the file.
+
+    Returns:
+        list: Tuples of the header, the payload offset and the record offset of every record.
+    """
+    if buffer[: len(MAGIC)] != MAGIC:
+        raise ValueError("Not a binary broadband file.")
+
+    records = []
+    file_size = len(buffer)
+    record_offset = len(MAGIC)
+    while record_offset + RECORD_PREFIX.size <= file_size:
+        header_length, payload_length = RECORD_PREFIX.unpack_from(buffer, record_offset)
+        header_offset = record_offset + RECORD_PREFIX.size
+        payload_offset = header_offset + header_length
+        if payload_offset + payload_length > file_size:
+            logger.warning(
+                f"Found an incomplete record at offset {record_offset}, ignoring the rest of the file."
+            )
+            break
+        try:
+            header = json.loads(bytes(buffer[header_offset:payload_offset]).decode("utf-8"))
+        except ValueError:
+            logger.warning("Found a corrupted record header, ignoring the rest of the file.")
+            break
+        records.append((header, payload_offset, record_offset))
+        record_offset = payload_offset + payload_length
+    return records
+
+
+def scan_records(file_name: str) -> list:
+    """Reads the headers of all complete records of a binary broadband file.
+
+    Only the small record headers are read, the payloads are skipped.
+
+    Args:
+        file_name (str): The name of the file.
+
+    Returns:
+        list: Tuples of the header, the payload offset and the record offset of every record.
+    """
+    with open(file_name, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{file_name} is not a binary broadband file.")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return _scan_buffer(buffer)
+
+
+def truncate_incomplete(file_name: str) -> int:
+    """Removes an incomplete record from the end of a binary broadband file.
+
+    The file of a measurement that has been interrupted while a record was written ends with a partial record.
+    It has to be removed before new records can be appended to the file.
+
+    Args:
+        file_name (str): The name of the file.
+
+    Returns:
+        int: The length of the file after truncation.
+    """
+    records = scan_records(file_name)
+    if records:
+        header, payload_offset, record_offset = records[-1]
+        length = payload_offset + _payload_length(header)
+    else:
+        length = len(MAGIC)
+
+    with open(file_name, "r+b") as f:
+        if f.seek(0, 2) > length:
+            logger.warning(
+                "Removing incomplete record at the end of file: " + str(file_name)
+            )
+            f.truncate(length)
+    return length
+
+
+def read_record_header(file_name: str, offset: int) -> dict:
+    """Reads the header of a single record from a binary broadband file without reading its payload.
+
+    Args:
+        file_name (str): The name of the file.
+        offset (int): The offset of the record in the file.
+
+    Returns:
+        dict: The header of the record.
+    """
+    with open(file_name, "rb") as f:
+        f.seek(offset)
+        header, payload_offset, payload_length = _read_record_header(f)
+    return header
+
+
+def record_shape(header: dict, name: str) -> tuple:
+    """Returns the shape of an array of a record from its header.
+
+    Args:
+        header (dict): The header of the record.
+        name (str): The name of the array.
+
+    Returns:
+        tuple: The shape of the array.
+    """
+    for description in header["arrays"]:
+        if description["name"] == name:
+            return tuple(description["shape"])
+    raise KeyError(name)
+
+
+def read_record(file_name: str, offset: int) -> tuple:
+    """Reads a single record from a binary broadband file.
+
+    Args:
+        file_name (str): The name of the file.
+        offset (int): The offset of the record in the file.
+
+    Returns:
+        tuple: The header and the arrays of the record.
+    """
+    with open(file_name, "rb") as f:
+        f.seek(offset)
+        header, payload_offset, payload_length = _read_record_header(f)
+        payload = bytearray(payload_length)
+        f.readinto(payload)
+    return header, _read_arrays(payload, header, 0)
+
+
+def read_measurement(file_name: str, offset: int) -> Measurement:
+    """Reads a single measurement record from a binary broadband file.
+
+    Args:
+        file_name (str): The name of the file.
+        offset (int): The offset of the record in the file.
+
+    Returns:
+        Measurement: The single frequency measurement.
+    """
+    return _measurement_from_record(*read_record(file_name, offset))
+
+
+def read_broadband_file(file_name: str) -> dict:
+    """Reads a binary broadband file.
+
+    Args:
+        file_name (str): The name of the file.
+
+    Returns:
+        dict: The frequencies, frequency step, single frequency measurements, reflection values, minimum matching decisions, stitched spectrum, complex spectrum and step timings of the file.
+    """
+    content = {
+        "frequencies": [],
+        "frequency_step": None,
+        "measurements": [],
+        "reflection": {},
+        "matching_decisions": [],
+        "spectrum": None,
+        "complex_spectrum": None,
+        "timings": None,
+    }
+    records = scan_records(file_name)
+    with open(file_name, "rb") as f:
+        # A writable buffer, so the arrays of the measurements are writable as well
+        data = bytearray(f.seek(0, 2))
+        f.seek(0)
+        f.readinto(data)
+
+    for header, payload_offset, record_offset in records:
+        record_type = header["type"]
+        if record_type == "broadband":
+            content["frequencies"] = header["frequencies"]
+            content["frequency_step"] = header["frequency_step"]
+        elif record_type == "measurement":
+            content["measurements"].append(
+                _measurement_from_record(
+                    header, _read_arrays(data, header, payload_offset)
+                )
+            )
+        elif record_type == "reflection":
+            content["reflection"][header["frequency"]] = header["value"]
+        elif record_type == "matching":
+            content["matching_decisions"].append(header["decision"])
+        elif record_type == "spectrum":
+            arrays = _read_arrays(data, header, payload_offset)
+            content["spectrum"] = (arrays["fdx"], arrays["fdy"])
+        elif record_type == "complex_spectrum":
+            arrays = _read_arrays(data, header, payload_offset)
+            content["complex_spectrum"] = _complex_spectrum_from_arrays(arrays)
+        elif record_type == "timings":
+            content["timings"] = _timings_from_record(
+                header, _read_arrays(data, header, payload_offset)
+            )
+        elif record_type == "checkpoint":
+            continue
+        else:
+            logger.debug("Skipping unknown record type: " + str(record_type))
+
+    return content
+
+
+def _spectrum_header(strategy: str) -> dict:
+    """Creates the header of a spectrum record."""
+    header = {"type": "spectrum"}
+    if strategy is not None:
+        header["strategy"] = strategy
+    return header
+
+
+def append_spectrum(
+    file_name: str, fdx: np.array, fdy: np.array, strategy: str = None
+) -> None:
+    """Appends a stitched broadband spectrum to an existing binary broadband file.
+
+    Args:
+        file_name (str): The name of the file.
+        fdx (np.array): The frequency values of the spectrum.
+        fdy (np.array): The magnitude values of the spectrum.
+        strategy (str, optional): The name of the stitching strategy the spectrum was stitched with.
+    """
+    with open(file_name, "ab") as f:
+        _write_record(
+            f,
+            _spectrum_header(strategy),
+            {"fdx": np.asarray(fdx), "fdy": np.asarray(fdy)},
+        )
+
+
+def _complex_spectrum_arrays(
+    fdx: np.array, fdy: np.array, phase_corrections: dict
+) -> dict:
+    """Creates the arrays of a complex spectrum record."""
+    return {
+        "fdx": np.asarray(fdx),
+        "fdy": np.asarray(fdy, dtype=complex),
+        "frequencies": np.fromiter(phase_corrections.keys(), dtype=float),
+        "phases": np.fromiter(phase_corrections.values(), dtype=float),
+    }
+
+
+def _complex_spectrum_from_arrays(arrays: dict) -> tuple:
+    """Reads the complex spectrum and the phase corrections from the arrays of a complex spectrum record."""
+    return (
+        arrays["fdx"],
+        arrays["fdy"],
+        dict(zip(arrays["frequencies"].tolist(), arrays["phases"].tolist())),
+    )
+
+
+def append_complex_spectrum(
+    file_name: str, fdx: np.array, fdy: np.array, phase_corrections: dict
+) -> None:
+    """Appends a phase-corrected complex broadband spectrum to an existing binary broadband file.
+
+    Args:
+        file_name (str): The name of the file.
+        fdx (np.array): The frequency values of the spectrum.
+        fdy (np.array): The complex values of the spectrum.
+        phase_corrections (dict): The phase correction of every single frequency measurement in radians by target frequency.
+    """
+    with open(file_name, "ab") as f:
+        _write_record(
+            f,
+            {"type": "complex_spectrum"},
+            _complex_spectrum_arrays(fdx, fdy, phase_corrections),
+        )
+
+
+def _timings_record(frequencies, sessions, times, summary: dict) -> tuple:
+    """Creates the header and the arrays of a timings record."""
+    return (
+        {"type": "timings", "summary": summary},
+        {
+            "frequencies": np.asarray(frequencies, dtype=float),
+            "sessions": np.asarray(sessions, dtype=np.int32),
+            "times": np.asarray(times, dtype=float),
+        },
+    )
+
+
+def _timings_from_record(header: dict, arrays: dict) -> dict:
+    """Reads the step timings and their summary from a timings record."""
+    return {
+        "frequencies": arrays["frequencies"],
+        "sessions": arrays["sessions"],
+        "times": arrays["times"],
+        "summary": header.get("summary"),
+    }
+
+
+def append_timings(file_name: str, frequencies, sessions, times, summary: dict) -> None:
+    """Appends the timestamps of the steps of a broadband measurement to an existing binary broadband file.
+
+    Args:
+        file_name (str): The name of the file.
+        frequencies (np.array): The frequencies of the steps in Hz.
+        sessions (np.array): The session of every step.
+        times (np.array): The timestamps of the steps, one row per step and one column per event.
+        summary (dict): The json-compatible summary of the timestamps.
+    """
+    with open(file_name, "ab") as f:
+        _write_record(f, *_timings_record(frequencies, sessions, times, summary))
+
+
+class BroadbandFileWriter:
+    """Writes a broadband measurement to a binary broadband file while it is running.
+
+    Every record is flushed as soon as it has been written, so the file always contains all measurements received so far.
+
+    Args:
+        file_name (str): The name of the file.
+        frequencies (list): The frequencies of the broadband measurement in Hz.
+        frequency_step (float): The frequency step of the broadband measurement in Hz.
+    """
+
+    def __init__(self, file_name: str, frequencies, frequency_step: float) -> None:
+        """Initializes the BroadbandFileWriter and writes the header of the file."""
+        self.file_name = str(file_name)
+        logger.debug("Opening broadband file for writing: " + self.file_name)
+        self._file = open(self.file_name, "wb")
+        self._file.write(MAGIC)
+        _write_record(
+            self._file,
+            {
+                "type": "broadband",
+                "frequencies": [float(frequency) for frequency in frequencies],
+                "frequency_step": float(frequency_step),
+            },
+        )
+
+    @classmethod
+    def resume(cls, file_name: str) -> "BroadbandFileWriter":
+        """Opens an existing binary broadband file to append more records to it.
+
+        An incomplete record at the end of the file is removed first.
+
+        Args:
+            file_name (str): The name of the file.
+
+        Returns:
+            BroadbandFileWriter: The writer appending to the file.
+        """
+        truncate_incomplete(file_name)
+        writer = cls.__new__(cls)
+        writer.file_name = str(file_name)
+        logger.debug("Opening broadband file for appending: " + writer.file_name)
+        writer._file = open(writer.file_name, "ab")
+        return writer
+
+    def append_measurement(self, measurement: Measurement) -> int:
+        """Appends a single frequency measurement to the file.
+
+        Only the time domain data is written, the frequency domain data is recalculated when the measurement is read.
+        The frequency shift and the fits of the measurement are kept in the record header.
+
+        Args:
+            measurement (Measurement): The single frequency measurement.
+
+        Returns:
+            int: The offset of the record in the file.
+        """
+        return _write_record(
+            self._file,
+            {
+                "type": "measurement",
+                "name": measurement.name,
+                "target_frequency": float(measurement.target_frequency),
+                "IF_frequency": float(measurement.IF_frequency),
+                "frequency_shift": float(getattr(measurement, "frequency_shift", 0)),
+                "fits": [fit.to_json() for fit in getattr(measurement, "fits", [])],
+            },
+            {"tdx": np.asarray(measurement.tdx), "tdy": np.asarray(measurement.tdy)},
+        )
+
+    def append_reflection(self, frequency: float, value: float) -> None:
+        """Appends the reflection value of a frequency to the file.
+
+        Args:
+            frequency (float): The frequency in Hz.
+            value (float): The reflection in dB.
+        """
+        _write_record(
+            self._file,
+            {"type": "reflection", "frequency": float(frequency), "value": float(value)},
+        )
+
+    def append_matching_decision(self, decision: dict) -> None:
+        """Appends a decision of the minimum matching policy to the file.
+
+        Args:
+            decision (dict): The json format of the MatchingDecision.
+        """
+        _write_record(self._file, {"type": "matching", "decision": decision})
+
+    def append_spectrum(
+        self, fdx: np.array, fdy: np.array, strategy: str = None
+    ) -> None:
+        """Appends the stitched broadband spectrum to the file.
+
+        Args:
+            fdx (np.array): The frequency values of the spectrum.
+            fdy (np.array): The magnitude values of the spectrum.
+            strategy (str, optional): The name of the stitching strategy the spectrum was stitched with.
+        """
+        _write_record(
+            self._file,
+            _spectrum_header(strategy),
+            {"fdx": np.asarray(fdx), "fdy": np.asarray(fdy)},
+        )
+
+    def append_complex_spectrum(
+        self, fdx: np.array, fdy: np.array, phase_corrections: dict
+    ) -> None:
+        """Appends the phase-corrected complex broadband spectrum to the file.
+
+        Args:
+            fdx (np.array): The frequency values of the spectrum.
+            fdy (np.array): The complex values of the spectrum.
+            phase_corrections (dict): The phase correction of every single frequency measurement in radians by target frequency.
+        """
+        _write_record(
+            self._file,
+            {"type": "complex_spectrum"},
+            _complex_spectrum_arrays(fdx, fdy, phase_corrections),
+        )
+
+    def append_timings(self, frequencies, sessions, times, summary: dict) -> None:
+        """Appends the timestamps of the steps of the broadband measurement to the file.
+
+        Args:
+            frequencies (np.array): The frequencies of the steps in Hz.
+            sessions (np.array): The session of every step.
+            times (np.array): The timestamps of the steps, one row per step and one column per event.
+            summary (dict): The json-compatible summary of the timestamps.
+        """
+        _write_record(
+            self._file, *_timings_record(frequencies, sessions, times, summary)
+        )
+
+    def append_checkpoint(self, frequencies, reflection: dict) -> None:
+        """Appends a checkpoint to the file and syncs the file to disk.
+
+        Records are only flushed when they are written, the checkpoint makes sure everything written so far survives a crash of the system.
+
+        Args:
+            frequencies (list): The frequencies that have been measured so far in Hz.
+            reflection (dict): The reflection values measured so far.
+        """
+        _write_record(
+            self._file,
+            {
+                "type": "checkpoint",
+                "frequencies": [float(frequency) for frequency in frequencies],
+                "reflection": [
+                    [float(frequency), float(value)]
+                    for frequency, value in reflection.items()
+                ],
+            },
+        )
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        """Closes the file."""
+        if not self._file.closed:
+            logger.debug("Closing broadband file: " + self.file_name)
+            self._file.close()
+
+
+class SpilledMeasurement:
+    """Handle to a single frequency measurement whose raw data has been spilled to a binary broadband file.
+
+    Only the summary of the measurement is kept in memory, the full measurement is read back from disk on demand.
+
+    Args:
+        file_name (str): The file the raw data has been written to.
+        offset (int): The offset of the measurement record in the file.
+        target_frequency (float): The target frequency of the measurement in Hz.
+        max_magnitude (float): The maximum magnitude of the stitched window.
+        mean_magnitude (float): The mean magnitude of the stitched window.
+        source (BroadbandFile, optional): The memory-mapped file the measurement is read from.
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        offset: int,
+        target_frequency: float,
+        max_magnitude: float = float("nan"),
+        mean_magnitude: float = float("nan"),
+        source: "BroadbandFile" = None,
+    ) -> None:
+        """Initializes the SpilledMeasurement."""
+        self.file_name = file_name
+        self.offset = offset
+        self.target_frequency = target_frequency
+        self.max_magnitude = max_magnitude
+        self.mean_magnitude = mean_magnitude
+        self.source = source
+
+    def load(self) -> Measurement:
+        """Reads the full measurement back from disk.
+
+        Returns:
+            Measurement: The single frequency measurement.
+        """
+        logger.debug(
+            "Loading spilled measurement at frequency: " + str(self.target_frequency)
+        )
+        if self.source is not None:
+            return self.source.read_measurement(self.offset)
+        return read_measurement(self.file_name, self.offset)
+
+    def load_header(self) -> dict:
+        """Reads the header of the measurement record back from disk without reading the raw data.
+
+        Returns:
+            dict: The header of the record, with the frequencies of the measurement and the shapes of its arrays.
+        """
+        if self.source is not None:
+            return self.source.read_record_header(self.offset)
+        return read_record_header(self.file_name, self.offset)
+
+    def load_record(self) -> tuple:
+        """Reads the measurement record back from disk without calculating the frequency domain data.
+
+        Returns:
+            tuple: The header and the arrays of the record, the arrays contain the time domain data tdx and tdy.
+        """
+        if self.source is not None:
+            return self.source.read_record(self.offset)
+        return read_record(self.file_name, self.offset)
+
+    def set_summary(self, spectrum_slice) -> None:
+        """Sets the summary of the measurement from its stitched slice.
+
+        Args:
+            spectrum_slice (SpectrumSlice): The stitched slice of the measurement.
+        """
+        if len(spectrum_slice):
+            self.max_magnitude = float(np.max(spectrum_slice.fdy))
+            self.mean_magnitude = float(np.mean(spectrum_slice.fdy))
+        else:
+            self.max_magnitude = self.mean_magnitude = float("nan")
+
+    @classmethod
+    def from_slice(
+        cls, file_name: str, offset: int, spectrum_slice
+    ) -> "SpilledMeasurement":
+        """Creates the handle with the summary of the stitched slice of the measurement.
+
+        Args:
+            file_name (str): The file the raw data has been written to.
+            offset (int): The offset of the measurement record in the file.
+            spectrum_slice (SpectrumSlice): The stitched slice of the measurement.
+
+        Returns:
+            SpilledMeasurement: The handle to the spilled measurement.
+        """
+        spilled_measurement = cls(file_name, offset, spectrum_slice.target_frequency)
+        spilled_measurement.set_summary(spectrum_slice)
+        return spilled_measurement
+
+
+class BroadbandFile:
+    """Memory-mapped, lazily read binary broadband file.
+
+    Opening the file only reads the small record headers and the stitched spectrum, the single frequency measurements
+    are exposed as SpilledMeasurement handles that read their data from the memory map when they are needed.
+    The arrays returned by this class are read-only views into the memory map.
+
+    Args:
+        file_name (str): The name of the file.
+    """
+
+    def __init__(self, file_name: str) -> None:
+        """Initializes the BroadbandFile and reads the index of the file."""
+        self.file_name = str(file_name)
+        logger.debug("Memory-mapping broadband file: " + self.file_name)
+        with open(self.file_name, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.frequencies = []
+        self.frequency_step = None
+        self.reflection = {}
+        self.matching_decisions = []
+        self.measurements = {}
+        self.checkpoint = None
+        self._spectrum = None
+        self._complex_spectrum = None
+        self._timings = None
+
+        spectrum_is_current = False
+        complex_spectrum_is_current = False
+        for header, payload_offset, record_offset in _scan_buffer(self._buffer):
+            record_type = header["type"]
+            if record_type == "broadband":
+                self.frequencies = header["frequencies"]
+                self.frequency_step = header["frequency_step"]
+            elif record_type == "measurement":
+                self.measurements[header["target_frequency"]] = SpilledMeasurement(
+                    self.file_name,
+                    record_offset,
+                    header["target_frequency"],
+                    source=self,
+                )
+                spectrum_is_current = False
+                complex_spectrum_is_current = False
+            elif record_type == "reflection":
+                self.reflection[header["frequency"]] = header["value"]
+            elif record_type == "matching":
+                self.matching_decisions.append(header["decision"])
+            elif record_type == "spectrum":
+                self._spectrum = (header, payload_offset)
+                spectrum_is_current = True
+            elif record_type == "complex_spectrum":
+                self._complex_spectrum = (header, payload_offset)
+                complex_spectrum_is_current = True
+            elif record_type == "timings":
+                self._timings = (header, payload_offset)
+            elif record_type == "checkpoint":
+                self.checkpoint = header
+            else:
+                logger.debug("Skipping unknown record type: " + str(record_type))
+
+        # A spectrum that has been written before the last measurement is outdated
+        if not spectrum_is_current:
+            self._spectrum = None
+        if not complex_spectrum_is_current:
+            self._complex_spectrum = None
+
+    @property
+    def spectrum(self) -> tuple:
+        """The stitched spectrum stored in the file or None if the file has no current spectrum."""
+        if self._spectrum is None:
+            return None
+        header, payload_offset = self._spectrum
+        arrays = _read_arrays(self._buffer, header, payload_offset)
+        return arrays["fdx"], arrays["fdy"]
+
+    @property
+    def spectrum_strategy(self) -> str:
+        """The name of the stitching strategy of the stored spectrum, None if the file has no current spectrum.
+
+        Files written before the strategy was recorded always contain a spectrum of the cut strategy.
+        """
+        if self._spectrum is None:
+            return None
+        header, _ = self._spectrum
+        return header.get("strategy", "cut")
+
+    @property
+    def complex_spectrum(self) -> tuple:
+        """The complex spectrum and the phase corrections stored in the file or None if the file has no current complex spectrum."""
+        if self._complex_spectrum is None:
+            return None
+        header, payload_offset = self._complex_spectrum
+        return _complex_spectrum_from_arrays(
+            _read_arrays(self._buffer, header, payload_offset)
+        )
+
+    @property
+    def timings(self) -> dict:
+        """The timestamps of the steps and their summary stored in the file or None if the file has no timings."""
+        if self._timings is None:
+            return None
+        header, payload_offset = self._timings
+        return _timings_from_record(
+            header, _read_arrays(self._buffer, header, payload_offset)
+        )
+
+    def _read_header(self, offset: int) -> tuple:
+        header_length, payload_length = RECORD_PREFIX.unpack_from(self._buffer, offset)
+        header_offset = offset + RECORD_PREFIX.size
+        payload_offset = header_offset + header_length
+        header = json.loads(
+            bytes(self._buffer[header_offset:payload_offset]).decode("utf-8")
+        )
+        return header, payload_offset
+
+    def read_record_header(self, offset: int) -> dict:
+        """Reads the header of a single record from the memory map without touching its payload.
+
+        Args:
+            offset (int): The offset of the record in the file.
+
+        Returns:
+            dict: The header of the record.
+        """
+        return self._read_header(offset)[0]
+
+    def read_record(self, offset: int) -> tuple:
+        """Reads a single record from the memory map.
+
+        Args:
+            offset (int): The offset of the record in the file.
+
+        Returns:
+            tuple: The header and the arrays of the record, the arrays are read-only views into the memory map.
+        """
+        header, payload_offset = self._read_header(offset)
+        return header, _read_arrays(self._buffer, header, payload_offset)
+
+    def read_measurement(self, offset: int) -> Measurement:
+        """Reads a single measurement record from the memory map.
+
+        Args:
+            offset (int): The offset of the record in the file.
+
+        Returns:
+            Measurement: The single frequency measurement.
+        """
+        return _measurement_from_record(*self.read_record(offset))
+
+    def close(self) -> None:
+        """Closes the memory map.
+
+        If arrays read from the file are still in use the memory map is released once they are garbage collected.
+        """
+        try:
+            self._buffer.close()
+        except BufferError:
+            logger.debug("Broadband file still in use, leaving it to the garbage collector.")
@@ -0,0 +1,316 @@
+"""This module contains the strategies that can be used to stitch single frequency measurements into a broadband spectrum.
+
+The cut strategy is the one used while a measurement is running: every measurement contributes frequency_step / 2 around its IF
+and neighbouring edge points are averaged. The other strategies use the measured bandwidth beyond the cut window.
+They interpolate every measurement onto a common frequency grid and combine overlapping measurements with weights,
+all measurements are processed at once with flat index arrays and np.bincount.
+"""
+
+import logging
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+from . import stitching
+
+logger = logging.getLogger(__name__)
+
+
+def overlap_add(
+    measurements: list,
+    frequency_step: float,
+    half_width: float,
+    weight,
+    complex_data: bool = False,
+    phase_correction: bool = False,
+) -> tuple:
+    """Combines single frequency measurements on a common frequency grid with a weighted overlap-add.
+
+    Every measurement contributes the points within half_width of its target frequency, weighted by the weight function of their distance to the target frequency.
+    The weighted contributions of all measurements are summed and divided by the sum of the weights.
+    The frequency axes of the measurements have to be uniformly spaced, like the axes of an FFT.
+
+    Args:
+        measurements (list): The single frequency measurements.
+        frequency_step (float): The frequency step of the broadband measurement in Hz.
+        half_width (float): The distance to the target frequency up to which a measurement contributes in Hz.
+        weight (callable): Returns the weights for an array of distances to the target frequency in MHz.
+        complex_data (bool, optional): If True the complex values are combined instead of the magnitudes.
+        phase_correction (bool, optional): If True the phase of every measurement is rotated so it matches the previous measurement in their overlap.
+
+    Returns:
+        tuple: The frequency values in MHz, the combined values and the phase correction of every measurement in radians, in the order of their target frequencies.
+    """
+    if not measurements:
+        return np.array([]), np.array([]), np.array([])
+
+    measurements = sorted(measurements, key=lambda measurement: measurement.target_frequency)
+    n_measurements = len(measurements)
+    targets = np.array([measurement.target_frequency for measurement in measurements]) * 1e-6
+    offsets = np.array([measurement.IF_frequency for measurement in measurements]) * 1e-6
+    axes = [np.asarray(measurement.fdx) for measurement in measurements]
+    axis_starts = np.array([axis[0] for axis in axes])
+    spacings = np.array([axis[1] - axis[0] for axis in axes])
+    axis_lengths = np.array([len(axis) for axis in axes])
+    half_step = frequency_step / 2 * 1e-6
+    half_width = half_width * 1e-6
+
+    # The grid covers the same range as the cut strategy with the finest resolution of the measurements
+    resolution = spacings.min()
+    grid_start = targets[0] - half_step
+    n_grid = int(np.floor((targets[-1] + half_step - grid_start) / resolution + 1e-9)) + 1
+    grid = grid_start + np.arange(n_grid) * resolution
+
+    # The grid points every measurement contributes to
+    lower = np.clip(np.ceil((targets - half_width - grid_start) / resolution - 1e-9), 0, n_grid)
+    upper = np.clip(np.floor((targets + half_width - grid_start) / resolution + 1e-9), -1, n_grid - 1)
+    counts = np.maximum(upper - lower + 1, 0).astype(int)
+    lower = lower.astype(int)
+    entry_starts = np.cumsum(counts) - counts
+    measurement_index = np.repeat(np.arange(n_measurements), counts)
+    within = np.arange(int(counts.sum())) - np.repeat(entry_starts, counts)
+    grid_index = np.repeat(lower, counts) + within
+    distance = grid[grid_index] - targets[measurement_index]
+
+    # Gather the part of every spectrum that is needed into one flat array
+    window_lower = np.clip(
+        np.floor((offsets - half_width - axis_starts) / spacings).astype(int), 0, axis_lengths - 1
+    )
+    window_upper = np.clip(
+        np.ceil((offsets + half_width - axis_starts) / spacings).astype(int) + 1, 0, axis_lengths - 1
+    )
+    window_lengths = window_upper - window_lower + 1
+    window_starts = np.cumsum(window_lengths) - window_lengths
+    data = [
+        stitching.first_dataset(measurement.fdy)[lo : up + 1]
+        for measurement, lo, up in zip(measurements, window_lower, window_upper)
+    ]
+    values = np.concatenate(data) if complex_data else np.abs(np.concatenate(data))
+
+    # Linear interpolation of the spectra at the grid points
+    position = (
+        distance
+        + offsets[measurement_index]
+        - axis_starts[measurement_index]
+    ) / spacings[measurement_index] - window_lower[measurement_index]
+    index = np.floor(position).astype(int)
+    valid = (index >= 0) & (index + 1 < window_lengths[measurement_index])
+    index = np.where(valid, index, 0)
+    fraction = position - index
+    flat_index = window_starts[measurement_index] + index
+    interpolated = (
+        values[flat_index] * (1 - fraction)
+        + values[np.minimum(flat_index + 1, len(values) - 1)] * fraction
+    )
+    weights = np.where(valid, weight(np.abs(distance)), 0.0)
+
+    phases = np.zeros(n_measurements)
+    if phase_correction and n_measurements > 1:
+        # Pair every point with the point of the next measurement at the same grid point
+        has_next = measurement_index < n_measurements - 1
+        next_index = np.minimum(measurement_index + 1, n_measurements - 1)
+        partner = entry_starts[next_index] + grid_index - lower[next_index]
+        paired = (
+            has_next
+            & (grid_index >= lower[next_index])
+            & (grid_index - lower[next_index] < counts[next_index])
+        )
+        partner = np.where(paired, partner, 0)
+        product = (
+            np.conj(interpolated)
+            * interpolated[partner]
+            * weights
+            * weights[partner]
+            * paired
+        )
+        correlation = np.bincount(
+            measurement_index, product.real, minlength=n_measurements
+        ) + 1j * np.bincount(measurement_index, product.imag, minlength=n_measurements)
+        phases[1:] = np.cumsum(np.angle(correlation[:-1]))
+        interpolated = interpolated * np.exp(-1j * phases[measurement_index])
+
+    total_weight = np.bincount(grid_index, weights, minlength=n_grid)
+    if np.iscomplexobj(interpolated):
+        combined = np.bincount(
+            grid_index, (weights * interpolated).real, minlength=n_grid
+        ) + 1j * np.bincount(grid_index, (weights * interpolated).imag, minlength=n_grid)
+    else:
+        combined = np.bincount(grid_index, weights * interpolated, minlength=n_grid)
+
+    covered = total_weight > 0
+    return grid[covered], combined[covered] / total_weight[covered], phases
+
+
+class StitchingStrategy(ABC):
+    """Base class of the stitching strategies, every strategy implements stitch.
+
+    Attributes:
+        name (str): The name the strategy is selected with.
+        label (str): The name of the strategy shown in the user interface.
+    """
+
+    name = None
+    label = None
+
+    @abstractmethod
+    def stitch(self, measurements: list, frequency_step: float) -> tuple:
+        """Stitches single frequency measurements into a broadband spectrum.
+
+        Args:
+            measurements (list): The single frequency measurements ordered by frequency.
+            frequency_step (float): The frequency step of the broadband measurement in Hz.
+
+        Returns:
+            tuple: The frequency values in MHz and the magnitude values of the broadband spectrum.
+        """
+
+
+class CutStrategy(StitchingStrategy):
+    """Cuts out frequency_step / 2 around the IF of every measurement and averages the neighbouring edge points."""
+
+    name = "cut"
+    label = "Cut"
+
+    def stitch(self, measurements: list, frequency_step: float) -> tuple:
+        """Stitches single frequency measurements into a broadband spectrum."""
+        return stitching.stitch_batch(measurements, frequency_step)
+
+
+class CrossfadeStrategy(StitchingStrategy):
+    """Overlap-add of neighbouring measurements with raised cosine crossfades.
+
+    Every measurement contributes frequency_step * (1 + overlap) around its target frequency.
+    In the overlap the weights of two neighbouring measurements fade into each other and always sum up to one.
+
+    Args:
+        overlap (float): The width of the crossfade as a fraction of the frequency step.
+    """
+
+    name = "crossfade"
+    label = "Crossfade"
+    complex_data = False
+
+    def __init__(self, overlap: float = 0.5) -> None:
+        """Initializes the CrossfadeStrategy."""
+        if not 0 < overlap <= 1:
+            raise ValueError("The overlap has to be larger than 0 and at most 1.")
+        self.overlap = overlap
+
+    def weight(self, distance: np.array, frequency_step: float) -> np.array:
+        """Returns the crossfade weights for distances to the target frequency in MHz."""
+        width = self.overlap * frequency_step * 1e-6
+        inner = frequency_step / 2 * 1e-6 - width / 2
+        fade = np.clip((distance - inner) / width, 0, 1)
+        return np.cos(np.pi / 2 * fade) ** 2
+
+    def combine(self, measurements: list, frequency_step: float) -> tuple:
+        """Combines the measurements, see overlap_add."""
+        return overlap_add(
+            measurements,
+            frequency_step,
+            frequency_step / 2 * (1 + self.overlap),
+            lambda distance: self.weight(distance, frequency_step),
+            complex_data=self.complex_data,
+            phase_correction=self.complex_data,
+        )
+
+    def stitch(self, measurements: list, frequency_step: float) -> tuple:
+        """Stitches single frequency measurements into a broadband spectrum."""
+        fdx, fdy, _ = self.combine(measurements, frequency_step)
+        return fdx, np.abs(fdy)
+
+
+class WeightedStrategy(StitchingStrategy):
+    """Weighted average of all measurements that cover a frequency.
+
+    Useful when the frequency step is smaller than the bandwidth of the measurements, every frequency is then covered by several measurements.
+    The measurements are weighted with a Hann window, so points far away from the target frequency, where the sensitivity drops, contribute less.
+
+    Args:
+        bandwidth (float, optional): The bandwidth used of every measurement in Hz, twice the frequency step if None.
+    """
+
+    name = "weighted"
+    label = "Weighted average"
+
+    def __init__(self, bandwidth: float = None) -> None:
+        """Initializes the WeightedStrategy."""
+        self.bandwidth = bandwidth
+
+    def stitch(self, measurements: list, frequency_step: float) -> tuple:
+        """Stitches single frequency measurements into a broadband spectrum."""
+        bandwidth = self.bandwidth if self.bandwidth is not None else 2 * frequency_step
+        half_width = max(bandwidth, frequency_step) / 2
+        fdx, fdy, _ = overlap_add(
+            measurements,
+            frequency_step,
+            half_width,
+            lambda distance: np.cos(np.pi / 2 * distance / (half_width * 1e-6)) ** 2,
+        )
+        return fdx, fdy
+
+
+class ComplexStrategy(CrossfadeStrategy):
+    """Crossfade of the complex spectra after correcting the phase of every measurement.
+
+    The phase of every measurement is rotated so it matches the previous measurement in their overlap,
+    so the complex values add up coherently instead of cancelling each other out.
+
+    Args:
+        overlap (float): The width of the crossfade as a fraction of the frequency step.
+    """
+
+    name = "complex"
+    label = "Phase-corrected complex"
+    complex_data = True
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (CutStrategy, CrossfadeStrategy, WeightedStrategy, ComplexStrategy)
+}
+"""The available stitching strategies by name."""
+
+DEFAULT_STRATEGY = CutStrategy.name
+
+
+def get_strategy(name: str, **kwargs) -> StitchingStrategy:
+    """Creates a stitching strategy by its name.
+
+    Args:
+        name (str): The name of the strategy.
+        **kwargs: The parameters of the strategy.
+
+    Returns:
+        StitchingStrategy: The strategy.
+    """
+    try:
+        return STRATEGIES[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown stitching strategy: {name}") from None
+
+
+def benchmark(
+    measurements: list, frequency_step: float, names: list = None, repeat: int = 3
+) -> dict:
+    """Measures how long every stitching strategy takes for the given measurements.
+
+    Args:
+        measurements (list): The single frequency measurements ordered by frequency.
+        frequency_step (float): The frequency step of the broadband measurement in Hz.
+        names (list, optional): The names of the strategies, all strategies if None.
+        repeat (int, optional): The number of runs, the fastest one is reported.
+
+    Returns:
+        dict: The time of the fastest run in seconds by strategy name.
+    """
+    timings = {}
+    for name in names or STRATEGIES:
+        strategy = get_strategy(name)
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            strategy.stitch(measurements, frequency_step)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+        logger.debug(f"Stitching strategy {name}: {best:.3f} s")
+    return timings
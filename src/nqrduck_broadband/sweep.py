@@ -0,0 +1,439 @@
+r"""This module contains the BroadbandSweep class which runs broadband measurements without the NQRduck user interface.
+
+The sweep drives a quackseq spectrometer directly and streams every single frequency measurement to a binary broadband file.
+No Qt widgets are created, so it can be used in scripts and for automated measurements:
+
+    nqrduck-broadband-sweep --spectrometer quackseq_simulator.simulator:Simulator \
+        --sequence quackseq.sequences.FID:create_FID --start 80 --stop 90 --step 0.1 --output sweep.broad
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+from .averaging import AdaptiveAveraging
+from .matching import MatchingPolicy
+from .model import BroadbandModel
+from .timing import StepTimings
+
+logger = logging.getLogger(__name__)
+
+
+class BroadbandSweep:
+    """Runs a broadband measurement on a quackseq spectrometer.
+
+    Use from_range to start a new measurement or resume to continue an interrupted one.
+
+    Args:
+        spectrometer (Spectrometer): The quackseq spectrometer.
+        sequence (QuackSequence): The pulse sequence that is run at every frequency.
+        broadband_measurement (BroadbandMeasurement): The broadband measurement the single frequency measurements are added to.
+        averages (int, optional): The number of averages, the setting of the spectrometer is kept if None.
+        tune_and_match (callable, optional): Called with the frequency in Hz before every measurement, returns the reflection in dB or None.
+        settle_time (float, optional): The time in seconds that is waited before every frequency step.
+        checkpoint_interval (int, optional): The number of measurements between two checkpoints of the output file.
+        stream_raw_data (bool, optional): If True the raw data is only kept in the output file and not in memory.
+        complex_spectrum (bool, optional): If True the phase-corrected complex spectrum is calculated and stored when the sweep is finished.
+        adaptive (bool, optional): If True only the frequency ranges that show structure in a coarse pass are measured completely, see AdaptivePlan.
+        matching_policy (MatchingPolicy, optional): Decides what happens at frequencies where the reflection after tune and match is worse than its minimum matching.
+        averaging (AdaptiveAveraging, optional): Chooses the number of averages of every frequency step from the signal-to-noise ratio.
+    """
+
+    def __init__(
+        self,
+        spectrometer,
+        sequence,
+        broadband_measurement: "BroadbandModel.BroadbandMeasurement",
+        averages: int = None,
+        tune_and_match=None,
+        settle_time: float = BroadbandModel.DEFAULT_SETTLE_TIME,
+        checkpoint_interval: int = BroadbandModel.DEFAULT_CHECKPOINT_INTERVAL,
+        stream_raw_data: bool = False,
+        complex_spectrum: bool = False,
+        adaptive: bool = False,
+        matching_policy: MatchingPolicy = None,
+        averaging: AdaptiveAveraging = None,
+    ) -> None:
+        """Initializes the BroadbandSweep."""
+        self.spectrometer = spectrometer
+        self.sequence = sequence
+        self.averages = averages
+        self.tune_and_match = tune_and_match
+        self.settle_time = settle_time
+        self.complex_spectrum = complex_spectrum
+        self.matching_policy = matching_policy
+        if self.matching_policy is not None and self.matching_policy.averages is None:
+            self.matching_policy.averages = averages
+        self.averaging = averaging
+        # The averages the steps return to after they have been changed for single steps
+        if self.averages is None and self.averaging is not None:
+            self.averages = self.averaging.max_averages
+        if self.averages is None and self.matching_policy is not None:
+            self.averages = self.matching_policy.averages
+        self._averages = None
+
+        self.broadband_measurement = broadband_measurement
+        self.broadband_measurement.checkpoint_interval = checkpoint_interval
+        if stream_raw_data:
+            self.broadband_measurement.enable_streaming()
+        if adaptive:
+            self.broadband_measurement.enable_adaptive_stepping()
+
+    @classmethod
+    def from_range(
+        cls,
+        spectrometer,
+        sequence,
+        start_frequency: float,
+        stop_frequency: float,
+        frequency_step: float,
+        output: str = None,
+        **kwargs,
+    ) -> "BroadbandSweep":
+        """Creates a sweep over a frequency range, with the same frequencies as a sweep started in the user interface.
+
+        Args:
+            spectrometer (Spectrometer): The quackseq spectrometer.
+            sequence (QuackSequence): The pulse sequence that is run at every frequency.
+            start_frequency (float): The start frequency in Hz.
+            stop_frequency (float): The stop frequency in Hz.
+            frequency_step (float): The frequency step in Hz.
+            output (str, optional): The binary broadband file the measurement is streamed to.
+            **kwargs: The other arguments of BroadbandSweep.
+
+        Returns:
+            BroadbandSweep: The sweep.
+        """
+        frequencies = np.arange(
+            start_frequency, stop_frequency + frequency_step, frequency_step
+        )
+        broadband_measurement = BroadbandModel.BroadbandMeasurement(
+            frequencies, frequency_step
+        )
+        if output is not None:
+            broadband_measurement.open_stream(output)
+        return cls(spectrometer, sequence, broadband_measurement, **kwargs)
+
+    @classmethod
+    def resume(
+        cls, spectrometer, sequence, file_name: str, **kwargs
+    ) -> "BroadbandSweep":
+        """Creates a sweep that continues an interrupted broadband measurement from its stream file.
+
+        Args:
+            spectrometer (Spectrometer): The quackseq spectrometer.
+            sequence (QuackSequence): The pulse sequence that is run at every frequency.
+            file_name (str): The stream file of the interrupted measurement, new measurements are appended to it.
+            **kwargs: The other arguments of BroadbandSweep.
+
+        Returns:
+            BroadbandSweep: The sweep.
+        """
+        broadband_measurement = BroadbandModel.BroadbandMeasurement.resume(file_name)
+        return cls(spectrometer, sequence, broadband_measurement, **kwargs)
+
+    def run(self, progress=None) -> "BroadbandModel.BroadbandMeasurement":
+        """This method measures all frequencies of the broadband measurement that have not been measured yet.
+
+        If the sweep is interrupted, a checkpoint is written so the measurement can be resumed from the output file.
+
+        Args:
+            progress (callable, optional): Called with the frequency in Hz and the finished percentage after every measurement.
+
+        Returns:
+            BroadbandMeasurement: The broadband measurement.
+        """
+        broadband_measurement = self.broadband_measurement
+        timings = broadband_measurement.timings
+        timings.new_session()
+        self._set_averages(self.averages)
+
+        try:
+            while not broadband_measurement.is_complete():
+                frequency = broadband_measurement.get_next_measurement_frequency()
+                if self.settle_time:
+                    time.sleep(self.settle_time)
+
+                logger.debug("Measuring at frequency: " + str(frequency))
+                timings.start_step(frequency)
+                self.spectrometer.set_frequency(frequency)
+                timings.mark(StepTimings.FREQUENCY_SET)
+                decision = self._tune_and_match(frequency)
+                if decision is not None and decision.action == MatchingPolicy.SKIP:
+                    continue
+
+                reduced_averages = (
+                    decision is not None
+                    and decision.action == MatchingPolicy.REDUCE_AVERAGES
+                )
+                if reduced_averages:
+                    averages = decision.averages
+                elif self.averaging is not None:
+                    averages = self.averaging.averages
+                else:
+                    averages = self.averages
+
+                while True:
+                    self._set_averages(averages)
+                    timings.mark(StepTimings.ACQUISITION_STARTED)
+                    measurement = self.spectrometer.run_sequence(self.sequence)
+                    timings.mark(StepTimings.MEASUREMENT_RECEIVED)
+                    if measurement is None:
+                        raise RuntimeError(
+                            f"The spectrometer returned no data at frequency {frequency}."
+                        )
+                    # The broadband measurement is indexed by the planned frequencies
+                    measurement.target_frequency = frequency
+                    broadband_measurement.add_measurement(measurement)
+
+                    # Steps with a weak line are measured again with more averages
+                    if (
+                        self.averaging is None
+                        or reduced_averages
+                        or not self.averaging.add_measurement(
+                            measurement, broadband_measurement.frequency_step, averages
+                        )
+                    ):
+                        break
+                    averages = self.averaging.averages
+                    timings.start_step(frequency)
+
+                if progress is not None:
+                    progress(frequency, broadband_measurement.get_finished_percentage())
+        except BaseException:
+            broadband_measurement.checkpoint()
+            raise
+        finally:
+            self._set_averages(self.averages)
+
+        if self.complex_spectrum:
+            broadband_measurement.compute_complex_spectrum()
+        broadband_measurement.finish_stream()
+        return broadband_measurement
+
+    def _set_averages(self, averages: int) -> None:
+        if averages is not None and averages != self._averages:
+            self.spectrometer.set_averages(averages)
+            self._averages = averages
+
+    def _tune_and_match(self, frequency: float):
+        """Runs tune and match at a frequency and applies the matching policy.
+
+        Args:
+            frequency (float): The frequency in Hz.
+
+        Returns:
+            MatchingDecision: The final decision of the matching policy or None if the frequency is measured as usual.
+        """
+        if self.tune_and_match is None:
+            return None
+        while True:
+            self.broadband_measurement.timings.mark(
+                StepTimings.TUNE_AND_MATCH_REQUESTED
+            )
+            reflection = self.tune_and_match(frequency)
+            self.broadband_measurement.timings.mark(
+                StepTimings.TUNE_AND_MATCH_CONFIRMED
+            )
+            if reflection is None:
+                return None
+            self.broadband_measurement.add_tune_and_match(reflection, frequency)
+            if self.matching_policy is None:
+                return None
+            decision = self.matching_policy.decide(frequency, reflection)
+            if decision is None:
+                return None
+            self.broadband_measurement.add_matching_decision(decision)
+            if decision.action != MatchingPolicy.RETRY:
+                return decision
+
+    def close(self) -> None:
+        """This method closes the files of the broadband measurement."""
+        self.broadband_measurement.close()
+
+
+def _import_object(path: str):
+    """Imports an object from a path of the form module:name.
+
+    Args:
+        path (str): The path of the object.
+
+    Returns:
+        object: The imported object.
+    """
+    module_name, _, name = path.partition(":")
+    if not name:
+        raise ValueError(f"Expected module:name, got {path}")
+    return getattr(importlib.import_module(module_name), name)
+
+
+def _load_sequence(value: str):
+    """Loads a pulse sequence from a json file or a function of the form module:name that creates it.
+
+    Args:
+        value (str): The file name or the path of the function.
+
+    Returns:
+        QuackSequence: The pulse sequence.
+    """
+    if Path(value).is_file():
+        from quackseq.pulsesequence import QuackSequence
+
+        with open(value) as f:
+            return QuackSequence.load_sequence(json.load(f))
+    return _import_object(value)()
+
+
+def main(argv: list = None) -> int:
+    """Runs a broadband measurement from the command line.
+
+    Args:
+        argv (list, optional): The command line arguments, sys.argv is used if None.
+
+    Returns:
+        int: The exit code.
+    """
+    parser = argparse.ArgumentParser(
+        prog="nqrduck-broadband-sweep",
+        description="Runs a broadband measurement on a quackseq spectrometer without the NQRduck user interface.",
+    )
+    parser.add_argument(
+        "--spectrometer",
+        required=True,
+        help="The quackseq spectrometer class as module:name, it is created without arguments.",
+    )
+    parser.add_argument(
+        "--sequence",
+        required=True,
+        help="A pulse sequence json file or a function creating the sequence as module:name.",
+    )
+    parser.add_argument("--start", type=float, help="The start frequency in MHz.")
+    parser.add_argument("--stop", type=float, help="The stop frequency in MHz.")
+    parser.add_argument("--step", type=float, help="The frequency step in MHz.")
+    parser.add_argument("--averages", type=int, help="The number of averages.")
+    parser.add_argument(
+        "--target-snr",
+        type=float,
+        help="Choose the averages of every step so its slice reaches this signal-to-noise ratio, at most --averages.",
+    )
+    parser.add_argument(
+        "--output",
+        help="The binary broadband file the measurement is streamed to.",
+    )
+    parser.add_argument(
+        "--autosave",
+        action="store_true",
+        help="Stream the measurement to a new file in the autosave directory if no output file is given.",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="FILE",
+        help="Continue the interrupted measurement of this stream file instead of starting a new one.",
+    )
+    parser.add_argument(
+        "--settle-time",
+        type=float,
+        default=BroadbandModel.DEFAULT_SETTLE_TIME * 1e3,
+        help="The time in ms that is waited before every frequency step.",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=int,
+        default=BroadbandModel.DEFAULT_CHECKPOINT_INTERVAL,
+        help="The number of measurements between two checkpoints.",
+    )
+    parser.add_argument(
+        "--stream-raw-data",
+        action="store_true",
+        help="Only keep the raw data of the measurements in the output file.",
+    )
+    parser.add_argument(
+        "--complex-spectrum",
+        action="store_true",
+        help="Also store the phase-corrected complex spectrum.",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Measure a coarse pass first and only refine the frequency ranges that show structure.",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="Debug output.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+    spectrometer = _import_object(args.spectrometer)()
+    sequence = _load_sequence(args.sequence)
+    options = {
+        "averages": args.averages,
+        "settle_time": args.settle_time * 1e-3,
+        "checkpoint_interval": args.checkpoint_interval,
+        "stream_raw_data": args.stream_raw_data,
+        "complex_spectrum": args.complex_spectrum,
+        "adaptive": args.adaptive,
+    }
+    if args.target_snr is not None:
+        if args.averages is None:
+            parser.error("--target-snr needs --averages as the largest number of averages.")
+        options["averaging"] = AdaptiveAveraging(
+            args.target_snr, max_averages=args.averages
+        )
+
+    if args.resume:
+        sweep = BroadbandSweep.resume(spectrometer, sequence, args.resume, **options)
+        output = args.resume
+    else:
+        if args.start is None or args.stop is None or args.step is None:
+            parser.error("--start, --stop and --step are required for a new measurement.")
+        output = args.output
+        if output is None and args.autosave:
+            directory = BroadbandModel.DEFAULT_AUTOSAVE_DIRECTORY
+            directory.mkdir(parents=True, exist_ok=True)
+            output = (
+                directory
+                / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.{BroadbandModel.FILE_EXTENSION}"
+            )
+        sweep = BroadbandSweep.from_range(
+            spectrometer,
+            sequence,
+            args.start * 1e6,
+            args.stop * 1e6,
+            args.step * 1e6,
+            output=output,
+            **options,
+        )
+
+    if output is not None:
+        logger.info(f"Streaming measurement to file: {output}")
+    else:
+        logger.warning(
+            "The measurement is not saved, select a file with --output or --autosave."
+        )
+
+    def progress(frequency: float, percentage: float) -> None:
+        logger.info(f"Measured {frequency * 1e-6:.4f} MHz ({percentage:.1f} %)")
+
+    try:
+        sweep.run(progress)
+    except KeyboardInterrupt:
+        if output is not None:
+            logger.info(f"Measurement interrupted, resume it with --resume {output}")
+        else:
+            logger.info("Measurement interrupted.")
+        return 130
+    finally:
+        sweep.close()
+
+    logger.info("Broadband measurement finished.")
+    for line in sweep.broadband_measurement.timings.report():
+        logger.info(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
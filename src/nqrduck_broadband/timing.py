@@ -0,0 +1,264 @@
+"""This module contains the StepTimings class which records where the time of a broadband measurement goes."""
+
+import logging
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class StepTimings:
+    """Monotonic timestamps of the frequency steps of a broadband measurement.
+
+    Every step is a row of a float array with one column per event, events that did not happen in a step are nan.
+    A step that is measured again, e.g. by adaptive averaging, gets a new row with the same frequency.
+    The array grows by doubling, so recording an event never copies the timestamps of all steps.
+
+    Timestamps are only comparable within a session, every start or resume of the acquisition begins a new one.
+    The dead time of a step is the time between the end of the previous acquisition of its session and the start of its own acquisition,
+    i.e. the time the spectrometer is not measuring.
+
+    Args:
+        frequencies (np.array, optional): The frequencies of the recorded steps in Hz.
+        sessions (np.array, optional): The session of every recorded step.
+        times (np.array, optional): The timestamps of the recorded steps, one row per step and one column per event.
+
+    Attributes:
+        STARTED (int): The step has been started.
+        FREQUENCY_SET (int): The spectrometer has accepted the frequency.
+        TUNE_AND_MATCH_REQUESTED (int): Tune and match has been requested, before the step has started if it has been requested ahead.
+        TUNE_AND_MATCH_CONFIRMED (int): Tune and match has been confirmed.
+        ACQUISITION_STARTED (int): The measurement has been started.
+        MEASUREMENT_RECEIVED (int): The measurement data has arrived.
+        ASSEMBLED (int): The measurement has been stitched into the broadband spectrum.
+        REDRAWN (int): The plots show the stitched measurement.
+        EVENTS (tuple): The names of the events by column.
+        STAGES (tuple): The name, start event and end event of every stage of a step.
+        DEAD_TIME (str): The name of the dead time in the summary.
+    """
+
+    STARTED = 0
+    FREQUENCY_SET = 1
+    TUNE_AND_MATCH_REQUESTED = 2
+    TUNE_AND_MATCH_CONFIRMED = 3
+    ACQUISITION_STARTED = 4
+    MEASUREMENT_RECEIVED = 5
+    ASSEMBLED = 6
+    REDRAWN = 7
+
+    EVENTS = (
+        "started",
+        "frequency set",
+        "tune and match requested",
+        "tune and match confirmed",
+        "acquisition started",
+        "measurement received",
+        "assembled",
+        "redrawn",
+    )
+
+    STAGES = (
+        ("set frequency", STARTED, FREQUENCY_SET),
+        ("tune and match", TUNE_AND_MATCH_REQUESTED, TUNE_AND_MATCH_CONFIRMED),
+        ("acquisition", ACQUISITION_STARTED, MEASUREMENT_RECEIVED),
+        ("stitching", MEASUREMENT_RECEIVED, ASSEMBLED),
+        ("redraw", ASSEMBLED, REDRAWN),
+    )
+
+    DEAD_TIME = "dead time"
+
+    _INITIAL_CAPACITY = 64
+
+    def __init__(self, frequencies=None, sessions=None, times=None) -> None:
+        """Initializes the StepTimings."""
+        frequencies = np.asarray(
+            frequencies if frequencies is not None else [], dtype=float
+        )
+        count = len(frequencies)
+        capacity = max(count, self._INITIAL_CAPACITY)
+        self._frequencies = np.full(capacity, np.nan)
+        self._sessions = np.zeros(capacity, dtype=np.int32)
+        self._times = np.full((capacity, len(self.EVENTS)), np.nan)
+        self._frequencies[:count] = frequencies
+        if sessions is not None:
+            self._sessions[:count] = sessions
+        if times is not None:
+            self._times[:count] = np.asarray(times, dtype=float).reshape(
+                count, len(self.EVENTS)
+            )
+        self._count = count
+        self._session = int(self._sessions[:count].max()) if count else 0
+        self._new_session = count > 0
+
+    def __len__(self) -> int:
+        """Returns the number of recorded steps."""
+        return self._count
+
+    @property
+    def frequencies(self) -> np.array:
+        """The frequencies of the recorded steps in Hz."""
+        return self._frequencies[: self._count]
+
+    @property
+    def sessions(self) -> np.array:
+        """The session of every recorded step."""
+        return self._sessions[: self._count]
+
+    @property
+    def times(self) -> np.array:
+        """The timestamps of the recorded steps in seconds, one row per step and one column per event."""
+        return self._times[: self._count]
+
+    def new_session(self) -> None:
+        """This method starts a new session, the following steps are not compared with the ones recorded before."""
+        if self._count:
+            self._new_session = True
+
+    def start_step(self, frequency: float) -> None:
+        """This method adds a new step and records its STARTED event.
+
+        Args:
+            frequency (float): The frequency of the step in Hz.
+        """
+        if self._count == len(self._frequencies):
+            self._grow()
+        if self._new_session:
+            self._session += 1
+            self._new_session = False
+        self._frequencies[self._count] = frequency
+        self._sessions[self._count] = self._session
+        self._times[self._count] = np.nan
+        self._times[self._count, self.STARTED] = time.monotonic()
+        self._count += 1
+
+    def _grow(self) -> None:
+        capacity = 2 * len(self._frequencies)
+        frequencies = np.full(capacity, np.nan)
+        sessions = np.zeros(capacity, dtype=np.int32)
+        times = np.full((capacity, len(self.EVENTS)), np.nan)
+        frequencies[: self._count] = self.frequencies
+        sessions[: self._count] = self.sessions
+        times[: self._count] = self.times
+        self._frequencies, self._sessions, self._times = frequencies, sessions, times
+
+    def mark(self, event: int, frequency: float = None, timestamp: float = None) -> None:
+        """This method records an event of the last step.
+
+        Args:
+            event (int): The event, one of the event columns.
+            frequency (float, optional): Records the event of the last step at this frequency instead.
+            timestamp (float, optional): The monotonic time of the event if it happened before, now by default.
+        """
+        row = self._count - 1
+        if frequency is not None:
+            while row >= 0 and self._frequencies[row] != frequency:
+                row -= 1
+        if row >= 0:
+            self._times[row, event] = time.monotonic() if timestamp is None else timestamp
+
+    def mark_pending(self, event: int, after: int) -> None:
+        """This method records an event for all steps of the current session that have recorded the after event but not the event itself.
+
+        Used for events that complete several steps at once, e.g. a redraw of the plots shows all steps stitched so far.
+
+        Args:
+            event (int): The event to record.
+            after (int): The event that has to be recorded before.
+        """
+        times = self.times
+        pending = (
+            (self.sessions == self._session)
+            & np.isfinite(times[:, after])
+            & np.isnan(times[:, event])
+        )
+        if pending.any():
+            times[pending, event] = time.monotonic()
+
+    def durations(self, start: int, end: int) -> np.array:
+        """Returns the durations from the start to the end event of all steps that recorded both in seconds."""
+        durations = self.times[:, end] - self.times[:, start]
+        return durations[np.isfinite(durations)]
+
+    def dead_times(self) -> np.array:
+        """Returns the dead time of every step that has been acquired in seconds."""
+        dead_times = []
+        previous_end = None
+        previous_session = None
+        for session, row in zip(self.sessions, self.times):
+            if session != previous_session:
+                # The first step of a session starts counting when it is started
+                previous_end = row[self.STARTED]
+                previous_session = session
+            acquisition_started = row[self.ACQUISITION_STARTED]
+            if np.isfinite(acquisition_started):
+                dead_times.append(acquisition_started - previous_end)
+            if np.isfinite(row[self.MEASUREMENT_RECEIVED]):
+                previous_end = row[self.MEASUREMENT_RECEIVED]
+        return np.asarray(dead_times, dtype=float)
+
+    def summary(self) -> dict:
+        """Summarizes the stages of all steps.
+
+        Returns:
+            dict: The number of steps, the total time and the total dead time in seconds
+                and the number, mean and 95th percentile in seconds of every stage by name.
+        """
+        times = self.times
+        total_time = 0.0
+        for session in np.unique(self.sessions):
+            session_times = times[self.sessions == session]
+            if np.isfinite(session_times).any():
+                total_time += float(
+                    np.nanmax(session_times) - np.nanmin(session_times)
+                )
+
+        stages = {}
+        for name, start, end in self.STAGES:
+            stages[name] = self._statistics(self.durations(start, end))
+        dead_times = self.dead_times()
+        stages[self.DEAD_TIME] = self._statistics(dead_times)
+        return {
+            "steps": len(self),
+            "total_time": total_time,
+            "dead_time": float(dead_times.sum()),
+            "stages": stages,
+        }
+
+    @staticmethod
+    def _statistics(durations: np.array) -> dict:
+        if len(durations) == 0:
+            return {"count": 0, "mean": None, "p95": None}
+        return {
+            "count": int(len(durations)),
+            "mean": float(np.mean(durations)),
+            "p95": float(np.percentile(durations, 95)),
+        }
+
+    @classmethod
+    def format_report(cls, summary: dict) -> list:
+        """Formats a summary as lines of text.
+
+        Args:
+            summary (dict): The summary, see summary.
+
+        Returns:
+            list: The lines of the report.
+        """
+        total_time = summary["total_time"]
+        dead_time = summary["dead_time"]
+        dead_percentage = dead_time / total_time * 100 if total_time > 0 else 0.0
+        lines = [
+            f"Performance of {summary['steps']} steps in {total_time:.3f} s, "
+            f"dead time {dead_time:.3f} s ({dead_percentage:.1f} %)."
+        ]
+        for name, statistics in summary["stages"].items():
+            if statistics["count"]:
+                lines.append(
+                    f"  {name}: mean {statistics['mean'] * 1e3:.1f} ms, "
+                    f"p95 {statistics['p95'] * 1e3:.1f} ms ({statistics['count']} steps)"
+                )
+        return lines
+
+    def report(self) -> list:
+        """Returns the summary of all steps as lines of text, see format_report."""
+        return self.format_report(self.summary())
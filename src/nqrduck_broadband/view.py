@@ -1,11 +1,18 @@
 """This module contains the view of the broadband module."""
 import logging
+import numpy as np
 from datetime import datetime
-from PyQt6.QtCore import pyqtSlot, pyqtSignal, Qt
-from PyQt6.QtWidgets import QWidget, QMessageBox, QApplication, QLabel, QVBoxLayout
+from PyQt6.QtCore import pyqtSlot, pyqtSignal
+from PyQt6.QtWidgets import QWidget, QMessageBox, QFileDialog
 from nqrduck.assets.icons import Logos
 from nqrduck.module.module_view import ModuleView
 from .widget import Ui_Form
+from .rendering import BlitManager, RenderScheduler
+from . import stitching
+from . import strategies
+from .info_log import InfoLogModel
+from .matching import MatchingPolicy
+from .timing import StepTimings
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +34,23 @@ class BroadbandView(ModuleView):
         self._ui_form.setupUi(self)
         self.widget = widget
 
+        # The stitching strategies are listed with their name as item data
+        for strategy in strategies.STRATEGIES.values():
+            self._ui_form.stitchingStrategyBox.addItem(strategy.label, strategy.name)
+        self.on_stitching_strategy_change(self.module.model.stitching_strategy)
+
+        for action, label in MatchingPolicy.ACTIONS.items():
+            self._ui_form.minMatchActionBox.addItem(label, action)
+        self._ui_form.minMatchActionBox.setCurrentIndex(
+            self._ui_form.minMatchActionBox.findData(
+                self.module.model.min_matching_action
+            )
+        )
+
+        self._ui_form.autosaveBox.setChecked(self.module.model.autosave)
+        self.on_autosave_change(self.module.model.autosave)
+        self.on_autosave_directory_change(str(self.module.model.autosave_directory))
+
         logger.debug(
             f"Facecolor {str(self._ui_form.broadbandPlot.canvas.ax.get_facecolor())}"
         )
@@ -45,12 +69,34 @@ class BroadbandView(ModuleView):
         self._ui_form.importButton.setIcon(Logos.Load16x16())
         self._ui_form.importButton.setIconSize(self._ui_form.importButton.size())
 
+        self.render_scheduler = RenderScheduler(self.module.model.max_frame_rate)
+        self.render_scheduler.render.connect(self.render_broadband_measurement)
+        self._broadband_blit = BlitManager(self._ui_form.broadbandPlot.canvas)
+        self._time_domain_blit = BlitManager(self._ui_form.time_domainPlot.canvas)
+        self._frequency_domain_blit = BlitManager(
+            self._ui_form.frequency_domainPlot.canvas
+        )
+        self._rendered_measurement = None
+        # The vertical extent of the data of every axes when it has been rescaled last
+        self._fitted_spans = {}
+
+        # A single twin axis shows the S11 values, it is only visible while there are reflection values
+        self._ui_form.broadbandPlot.canvas.S11ax = (
+            self._ui_form.broadbandPlot.canvas.ax.twinx()
+        )
+        # The number of points of the broadband spectrum depends on the width of the plot
+        self._ui_form.broadbandPlot.canvas.mpl_connect(
+            "resize_event", lambda event: self.render_scheduler.request()
+        )
+
         self.init_plots()
 
-        self._ui_form.scrollAreaWidgetContents.setLayout(QVBoxLayout())
-        self._ui_form.scrollAreaWidgetContents.layout().setAlignment(
-            Qt.AlignmentFlag.AlignTop
+        # The info box only keeps the last messages and only creates the visible rows
+        self.info_log = InfoLogModel(
+            self.module.model.info_log_max_lines, self.module.model.info_log_file
         )
+        self._ui_form.infoBox.setModel(self.info_log)
+        self._ui_form.infoBox.setStyleSheet("font-size: 25px;")
 
     def connect_signals(self) -> None:
         """Connect the signals of the view to the slots of the controller."""
@@ -76,6 +122,21 @@ class BroadbandView(ModuleView):
         )
         self.module.model.stop_frequency_changed.connect(self.on_stop_frequency_change)
         self.module.model.frequency_step_changed.connect(self.on_frequency_step_change)
+        self.module.model.max_frame_rate_changed.connect(
+            self.on_max_frame_rate_change
+        )
+        self.module.model.info_log_max_lines_changed.connect(
+            self.on_info_log_max_lines_change
+        )
+        self.module.model.info_log_file_changed.connect(self.on_info_log_file_change)
+        self.module.model.stitching_strategy_changed.connect(
+            self.on_stitching_strategy_change
+        )
+        self._ui_form.stitchingStrategyBox.currentIndexChanged.connect(
+            lambda: self.module.controller.change_stitching_strategy(
+                self._ui_form.stitchingStrategyBox.currentData()
+            )
+        )
 
         self._ui_form.start_measurementButton.clicked.connect(
             self.start_measurement_clicked
@@ -101,9 +162,76 @@ class BroadbandView(ModuleView):
         # On deleteLUTButton clicked
         self._ui_form.deleteLUTButton.clicked.connect(self.module.controller.delete_LUT)
 
+        self._ui_form.settleTimeEdit.editingFinished.connect(
+            lambda: self.module.controller.change_settle_time(
+                self._ui_form.settleTimeEdit.text()
+            )
+        )
+
+        self._ui_form.streamRawDataBox.toggled.connect(
+            self.module.controller.change_stream_raw_data
+        )
+
+        self._ui_form.complexSpectrumBox.toggled.connect(
+            self.module.controller.change_store_complex_spectrum
+        )
+
+        # Autosave
+        self._ui_form.autosaveBox.toggled.connect(self.module.controller.change_autosave)
+        self._ui_form.autosaveBox.toggled.connect(self.on_autosave_change)
+        self._ui_form.autosaveDirectoryEdit.editingFinished.connect(
+            lambda: self.module.controller.change_autosave_directory(
+                self._ui_form.autosaveDirectoryEdit.text()
+            )
+        )
+        self._ui_form.autosaveDirectoryButton.clicked.connect(
+            self.on_autosave_directory_button_clicked
+        )
+        self.module.model.autosave_directory_changed.connect(
+            self.on_autosave_directory_change
+        )
+
+        self._ui_form.adaptiveSteppingBox.toggled.connect(
+            self.module.controller.change_adaptive_stepping
+        )
+
+        self._ui_form.adaptiveAveragingBox.toggled.connect(
+            self.module.controller.change_adaptive_averaging
+        )
+        self._ui_form.targetSnrEdit.editingFinished.connect(
+            lambda: self.module.controller.change_target_snr(
+                self._ui_form.targetSnrEdit.text()
+            )
+        )
+
+        # Minimum matching
+        self._ui_form.minMatchingActive.toggled.connect(
+            self.module.controller.change_min_matching_active
+        )
+        self._ui_form.minMatchBox.valueChanged.connect(
+            self.module.controller.change_min_matching
+        )
+        self._ui_form.minMatchActionBox.currentIndexChanged.connect(
+            lambda: self.module.controller.change_min_matching_action(
+                self._ui_form.minMatchActionBox.currentData()
+            )
+        )
+        self._ui_form.pipelinedTuneAndMatchBox.toggled.connect(
+            self.module.controller.change_pipelined_tune_and_match
+        )
+
+        # Double clicking the broadband plot shows the single measurement at that frequency
+        self._ui_form.broadbandPlot.canvas.mpl_connect(
+            "button_press_event", self.on_broadband_plot_clicked
+        )
+
         # Save and load buttons
         self._ui_form.exportButton.clicked.connect(self.on_save_button_clicked)
         self._ui_form.importButton.clicked.connect(self.on_load_button_clicked)
+        self._ui_form.resumeButton.clicked.connect(self.on_resume_button_clicked)
+        self._ui_form.performanceReportButton.clicked.connect(
+            self.module.controller.show_performance_report
+        )
 
     @pyqtSlot()
     def on_settings_changed(self) -> None:
@@ -163,6 +291,54 @@ class BroadbandView(ModuleView):
         if file_name:
             self.module.controller.load_measurement(file_name)
 
+    @pyqtSlot()
+    def on_resume_button_clicked(self) -> None:
+        """This method is called when the resume button is clicked.
+
+        It shows a file dialog to the user to select the stream file of an interrupted measurement that should be continued.
+        """
+        logger.debug("Resume button clicked.")
+        file_manager = self.FileManager(
+            self.module.model.FILE_EXTENSION, parent=self.widget
+        )
+        file_name = file_manager.loadFileDialog()
+        if file_name:
+            self.module.controller.resume_broadband_measurement(file_name)
+
+    @pyqtSlot()
+    def on_autosave_directory_button_clicked(self) -> None:
+        """This method is called when the autosave directory button is clicked.
+
+        It shows a dialog to the user to select the directory new measurements are streamed to.
+        """
+        logger.debug("Autosave directory button clicked.")
+        directory = QFileDialog.getExistingDirectory(
+            self.widget,
+            "Autosave Directory",
+            str(self.module.model.autosave_directory),
+        )
+        if directory:
+            self.module.controller.change_autosave_directory(directory)
+
+    @pyqtSlot(bool)
+    def on_autosave_change(self, autosave: bool) -> None:
+        """This method is called when autosave is switched on or off, the directory can only be changed while it is on.
+
+        Args:
+            autosave (bool) : True if autosave is active.
+        """
+        self._ui_form.autosaveDirectoryEdit.setEnabled(autosave)
+        self._ui_form.autosaveDirectoryButton.setEnabled(autosave)
+
+    @pyqtSlot(str)
+    def on_autosave_directory_change(self, directory: str) -> None:
+        """This method is called when the autosave directory is changed.
+
+        Args:
+            directory (str) : The new autosave directory.
+        """
+        self._ui_form.autosaveDirectoryEdit.setText(directory)
+
     def init_plots(self) -> None:
         """Initialize the plots."""
         # Initialization of broadband spectrum
@@ -180,6 +356,39 @@ class BroadbandView(ModuleView):
         self._ui_form.frequency_domainPlot.canvas.ax.set_xlim([0, 250])
         self.set_frequencydomain_labels()
 
+        # The lines are created once, new data only replaces the data of the lines
+        (self._broadband_line,) = self._ui_form.broadbandPlot.canvas.ax.plot([], [])
+        self._ui_form.broadbandPlot.canvas.ax.callbacks.connect(
+            "xlim_changed", self.on_broadband_xlim_changed
+        )
+
+        S11plotter = self._ui_form.broadbandPlot.canvas.S11ax
+        S11plotter.clear()
+        S11plotter.set_ylabel("S11 in dB")
+        S11plotter.set_ylim([-40, 0])
+        S11plotter.set_visible(False)
+        (self._S11_line,) = S11plotter.plot(
+            [], [], color="red", marker="x", linestyle="None"
+        )
+        self._time_domain_lines = self.create_measurement_lines(
+            self._ui_form.time_domainPlot.canvas.ax
+        )
+        self._frequency_domain_lines = self.create_measurement_lines(
+            self._ui_form.frequency_domainPlot.canvas.ax
+        )
+
+        for blit_manager, lines in (
+            (self._broadband_blit, [self._broadband_line, self._S11_line]),
+            (self._time_domain_blit, self._time_domain_lines),
+            (self._frequency_domain_blit, self._frequency_domain_lines),
+        ):
+            blit_manager.clear()
+            for line in lines:
+                blit_manager.add_artist(line)
+        self._rendered_measurement = None
+        # The vertical extent of the data of every axes when it has been rescaled last
+        self._fitted_spans = {}
+
     def set_timedomain_labels(self) -> None:
         """Set the labels of the time domain plot."""
         self._ui_form.time_domainPlot.canvas.ax.set_title("Last Time Domain")
@@ -254,6 +463,47 @@ class BroadbandView(ModuleView):
         frequency_step = str(f"{frequency_step * 1e-6:.2f}")
         self._ui_form.frequencystepEdit.setText(frequency_step)
 
+    @pyqtSlot(float)
+    def on_max_frame_rate_change(self, max_frame_rate: float) -> None:
+        """This method is called when the maximum frame rate of the plots is changed.
+
+        Args:
+            max_frame_rate (float) : The new maximum frame rate.
+        """
+        logger.debug(f"Limiting plots to {max_frame_rate} frames per second.")
+        self.render_scheduler.max_frame_rate = max_frame_rate
+
+    @pyqtSlot(int)
+    def on_info_log_max_lines_change(self, max_lines: int) -> None:
+        """This method is called when the number of messages kept in the info box is changed.
+
+        Args:
+            max_lines (int) : The new maximum number of messages.
+        """
+        self.info_log.max_lines = max_lines
+
+    @pyqtSlot(object)
+    def on_info_log_file_change(self, file_name) -> None:
+        """This method is called when the file the info box messages are written to is changed.
+
+        Args:
+            file_name (str) : The new log file or None.
+        """
+        logger.debug("Writing info messages to file: " + str(file_name))
+        self.info_log.file_name = file_name
+
+    @pyqtSlot(str)
+    def on_stitching_strategy_change(self, strategy: str) -> None:
+        """This method is called when the stitching strategy is changed.
+
+        Args:
+            strategy (str) : The name of the new stitching strategy.
+        """
+        box = self._ui_form.stitchingStrategyBox
+        box.blockSignals(True)
+        box.setCurrentIndex(box.findData(strategy))
+        box.blockSignals(False)
+
     @pyqtSlot()
     def on_editing_finished(self, value: str) -> None:
         """This method is called when the user finished editing a field.
@@ -290,111 +540,237 @@ class BroadbandView(ModuleView):
     def on_broadband_measurement_added(self) -> None:
         """This method is called when a new broadband measurement is added to the model.
 
-        It updates the plots and the progress bar.
+        It only updates the progress bar and requests a new frame, the plots are redrawn by the render scheduler.
+        This way rendering never holds up the next step of the measurement.
         """
-        # Get last measurement from the broadband measurement object that is not None
+        value = int(
+            self.module.model.current_broadband_measurement.get_finished_percentage()
+        )
+        logger.debug("Updating progress bar to: " + str(value))
+        self._ui_form.measurementProgress.setValue(value)
+        self._ui_form.measurementProgress.update()
+
+        self.render_scheduler.request()
+
+    @pyqtSlot()
+    def render_broadband_measurement(self) -> None:
+        """This method redraws the plots with the current state of the broadband measurement.
+
+        It is called by the render scheduler at most max_frame_rate times per second.
+        The data of the existing lines is replaced, the figures are only redrawn completely if the data leaves the visible area.
+        """
+        broadband_measurement = self.module.model.current_broadband_measurement
+        if broadband_measurement is None:
+            return
+
         logger.debug("Updating broadband plot.")
-        measurement = self.module.model.current_broadband_measurement.get_last_completed_measurement()
+        # Get last measurement from the broadband measurement object that is not None
+        measurement = broadband_measurement.get_last_completed_measurement()
+        if measurement is not None:
+            self.plot_single_measurement(measurement)
+            self.update_plot(
+                self._ui_form.time_domainPlot, self._time_domain_blit, self._time_domain_lines
+            )
+            self.update_plot(
+                self._ui_form.frequency_domainPlot,
+                self._frequency_domain_blit,
+                self._frequency_domain_lines,
+            )
 
-        td_plotter = self._ui_form.time_domainPlot.canvas.ax
-        fd_plotter = self._ui_form.frequency_domainPlot.canvas.ax
         broadband_plotter = self._ui_form.broadbandPlot.canvas.ax
-
-        td_plotter.clear()
-        fd_plotter.clear()
-        broadband_plotter.clear()
-
-        td_plotter.plot(
-            measurement.tdx,
-            measurement.tdy.real,
-            label="Real",
-            linestyle="-",
-            alpha=0.35,
-            color="red",
-        )
-        td_plotter.plot(
-            measurement.tdx,
-            measurement.tdy.imag,
-            label="Imaginary",
-            linestyle="-",
-            alpha=0.35,
-            color="green",
-        )
-        td_plotter.plot(
-            measurement.tdx, abs(measurement.tdy), label="Magnitude", color="blue"
-        )
-        td_plotter.legend()
-
-        fd_plotter.plot(
-            measurement.fdx * 1e-6,
-            measurement.fdy.real,
-            label="Real",
-            linestyle="-",
-            alpha=0.35,
-            color="red",
-        )
-        fd_plotter.plot(
-            measurement.fdx * 1e-6,
-            measurement.fdy.imag,
-            label="Imaginary",
-            linestyle="-",
-            alpha=0.35,
-            color="green",
-        )
-        fd_plotter.plot(
-            measurement.fdx * 1e-6,
-            abs(measurement.fdy),
-            label="Magnitude",
-            color="blue",
-        )
-        fd_plotter.legend()
-
-        # Plot real and imag part again here in time and frequency domain
-        broadband_plotter.plot(
-            self.module.model.current_broadband_measurement.broadband_data_fdx,
-            self.module.model.current_broadband_measurement.broadband_data_fdy,
+        if self._rendered_measurement is not broadband_measurement:
+            # Show the whole frequency range of a new broadband measurement, so the spectrum grows inside the visible area
+            self._rendered_measurement = broadband_measurement
+            frequencies = list(broadband_measurement.single_frequency_measurements)
+            if frequencies:
+                margin = broadband_measurement.frequency_step / 2
+                broadband_plotter.set_xlim(
+                    (min(frequencies) - margin) * 1e-6,
+                    (max(frequencies) + margin) * 1e-6,
+                )
+                broadband_plotter.set_autoscalex_on(False)
+
+        # Only about two points per pixel of the visible frequency range are drawn
+        x_lower, x_upper = sorted(broadband_plotter.get_xlim())
+        max_points = max(2 * int(broadband_plotter.bbox.width), 2)
+        self._broadband_line.set_data(
+            *broadband_measurement.get_decimated_spectrum(x_lower, x_upper, max_points)
         )
 
         # Plot S11 values on the twin axis of the broadband plot
-        frequencies = self.module.model.current_broadband_measurement.reflection.keys()
-        frequencies = [frequency * 1e-6 for frequency in frequencies]
-
-        reflection_values = (
-            self.module.model.current_broadband_measurement.reflection.values()
+        reflection = broadband_measurement.reflection
+        self._S11_line.set_data(
+            np.fromiter(reflection.keys(), dtype=float, count=len(reflection)) * 1e-6,
+            np.fromiter(reflection.values(), dtype=float, count=len(reflection)),
+        )
+        S11plotter = self._ui_form.broadbandPlot.canvas.S11ax
+        if S11plotter.get_visible() != bool(reflection):
+            # Showing or hiding the S11 axis changes the background of the plot
+            S11plotter.set_visible(bool(reflection))
+            self._ui_form.broadbandPlot.canvas.draw()
+
+        self.update_plot(
+            self._ui_form.broadbandPlot, self._broadband_blit, [self._broadband_line]
+        )
+        broadband_measurement.timings.mark_pending(
+            StepTimings.REDRAWN, StepTimings.ASSEMBLED
         )
-        if reflection_values:
-            self._ui_form.broadbandPlot.canvas.S11ax = (
-                self._ui_form.broadbandPlot.canvas.ax.twinx()
-            )
-            S11plotter = self._ui_form.broadbandPlot.canvas.S11ax
-            S11plotter.clear()
-            # Make second axis for S11 value
-            self._ui_form.broadbandPlot.canvas.S11ax.set_ylabel("S11 in dB")
-            self._ui_form.broadbandPlot.canvas.S11ax.set_ylim([-40, 0])
-            S11plotter.plot(
-                frequencies,
-                reflection_values,
-                color="red",
-                marker="x",
-                linestyle="None",
-            )
 
-        self.set_timedomain_labels()
-        self.set_frequencydomain_labels()
-        self.set_broadband_labels()
+    def on_broadband_xlim_changed(self, ax) -> None:
+        """This method is called when the visible frequency range of the broadband plot changes, e.g. when the user zooms.
 
-        self._ui_form.time_domainPlot.canvas.draw()
-        self._ui_form.frequency_domainPlot.canvas.draw()
-        self._ui_form.broadbandPlot.canvas.draw()
+        The decimated spectrum is queried again for the new frequency range.
 
-        value = int(
-            self.module.model.current_broadband_measurement.get_finished_percentage()
+        Args:
+            ax (Axes): The axes of the broadband plot.
+        """
+        if self.module.model.current_broadband_measurement is not None:
+            self.render_scheduler.request()
+
+    def update_plot(self, plot, blit_manager, lines: list) -> None:
+        """Redraws a plot after the data of its lines has been replaced.
+
+        If the data still fits the visible area only the lines are redrawn with blitting,
+        otherwise the axes are rescaled and the whole figure is redrawn, see needs_rescale.
+
+        Args:
+            plot (MplWidget): The plot widget.
+            blit_manager (BlitManager): The blit manager of the plot.
+            lines (list): The lines whose data has been replaced.
+        """
+        ax = plot.canvas.ax
+        if self.needs_rescale(ax, lines):
+            ax.relim()
+            ax.autoscale_view()
+            plot.canvas.draw()
+            limits = self.data_limits(lines)
+            if limits is not None:
+                self._fitted_spans[ax] = limits[3] - limits[2]
+        else:
+            blit_manager.update()
+
+    def data_limits(self, lines: list) -> tuple:
+        """Returns the range of the finite data of some lines.
+
+        Args:
+            lines (list): The lines.
+
+        Returns:
+            tuple: The lower and upper x and the lower and upper y value, None if the lines have no finite data.
+        """
+        x_lower, x_upper = np.inf, -np.inf
+        y_lower, y_upper = np.inf, -np.inf
+        for line in lines:
+            x, y = (np.asarray(data, dtype=float) for data in line.get_data())
+            valid = np.isfinite(x) & np.isfinite(y)
+            if not valid.any():
+                continue
+            x_lower = min(x_lower, x[valid].min())
+            x_upper = max(x_upper, x[valid].max())
+            y_lower = min(y_lower, y[valid].min())
+            y_upper = max(y_upper, y[valid].max())
+
+        if x_lower > x_upper:
+            return None
+        return x_lower, x_upper, y_lower, y_upper
+
+    def needs_rescale(self, ax, lines: list) -> bool:
+        """Checks if the data of some lines leaves the visible area of an axes or has shrunk a lot since the axes have been rescaled.
+
+        The axes are only shrunk once the vertical extent of the data has dropped below a quarter of its extent at the last rescale,
+        so data that stays flat or changes a little is redrawn with blitting.
+
+        Args:
+            ax (Axes): The axes.
+            lines (list): The lines of the axes.
+
+        Returns:
+            bool: True if the axes have to be rescaled.
+        """
+        limits = self.data_limits(lines)
+        if limits is None:
+            return False
+        x_lower, x_upper, y_lower, y_upper = limits
+
+        view_x_lower, view_x_upper = sorted(ax.get_xlim())
+        view_y_lower, view_y_upper = sorted(ax.get_ylim())
+        if ax.get_autoscalex_on() and (x_lower < view_x_lower or x_upper > view_x_upper):
+            return True
+        if y_lower < view_y_lower or y_upper > view_y_upper:
+            return True
+        return (y_upper - y_lower) < 0.25 * self._fitted_spans.get(ax, 0.0)
+
+    def plot_single_measurement(self, measurement) -> None:
+        """Replaces the data of the time and frequency domain plots with a single frequency measurement.
+
+        Args:
+            measurement (Measurement): The single frequency measurement.
+        """
+        # The lines show the first data set of the measurement
+        tdy = stitching.first_dataset(measurement.tdy)
+        td_real, td_imag, td_magnitude = self._time_domain_lines
+        td_real.set_data(measurement.tdx, tdy.real)
+        td_imag.set_data(measurement.tdx, tdy.imag)
+        td_magnitude.set_data(measurement.tdx, abs(tdy))
+
+        fdx = measurement.fdx * 1e-6
+        fdy = stitching.first_dataset(measurement.fdy)
+        fd_real, fd_imag, fd_magnitude = self._frequency_domain_lines
+        fd_real.set_data(fdx, fdy.real)
+        fd_imag.set_data(fdx, fdy.imag)
+        fd_magnitude.set_data(fdx, abs(fdy))
+
+    def show_single_measurement(self, measurement) -> None:
+        """Plots a single frequency measurement and redraws the time and frequency domain plots.
+
+        Args:
+            measurement (Measurement): The single frequency measurement.
+        """
+        self.plot_single_measurement(measurement)
+        for plot in (self._ui_form.time_domainPlot, self._ui_form.frequency_domainPlot):
+            plot.canvas.ax.relim()
+            plot.canvas.ax.autoscale_view()
+            plot.canvas.draw()
+
+    def create_measurement_lines(self, ax) -> list:
+        """Creates the real, imaginary and magnitude lines of a single measurement plot.
+
+        Args:
+            ax (Axes): The axes of the plot.
+
+        Returns:
+            list: The real, imaginary and magnitude lines.
+        """
+        (real,) = ax.plot([], [], label="Real", linestyle="-", alpha=0.35, color="red")
+        (imag,) = ax.plot(
+            [], [], label="Imaginary", linestyle="-", alpha=0.35, color="green"
         )
-        logger.debug("Updating progress bar to: " + str(value))
-        self._ui_form.measurementProgress.setValue(value)
-        self._ui_form.measurementProgress.update()
+        (magnitude,) = ax.plot([], [], label="Magnitude", color="blue")
+        ax.legend()
+        return [real, imag, magnitude]
+
+    def on_broadband_plot_clicked(self, event) -> None:
+        """This method is called when the broadband plot is clicked.
+
+        On a double click the single frequency measurement closest to the clicked frequency is shown.
+
+        Args:
+            event (MouseEvent): The matplotlib mouse event.
+        """
+        broadband_measurement = self.module.model.current_broadband_measurement
+        if not event.dblclick or event.xdata is None or broadband_measurement is None:
+            return
+
+        frequencies = [
+            frequency
+            for frequency, measurement in broadband_measurement.single_frequency_measurements.items()
+            if measurement is not None
+        ]
+        if not frequencies:
+            return
 
-        QApplication.processEvents()
+        frequency = min(frequencies, key=lambda f: abs(f * 1e-6 - event.xdata))
+        self.module.controller.show_single_measurement(frequency)
 
     @pyqtSlot()
     def on_LUT_changed(self) -> None:
@@ -420,6 +796,10 @@ class BroadbandView(ModuleView):
         """
         timestamp = datetime.now().strftime("%H:%M:%S")
         text = f"[{timestamp}] {text}"
-        text_label = QLabel(text)
-        text_label.setStyleSheet("font-size: 25px;")
-        self._ui_form.scrollAreaWidgetContents.layout().addWidget(text_label)
+        info_box = self._ui_form.infoBox
+        # Only follow the new messages if the user has not scrolled up
+        scroll_bar = info_box.verticalScrollBar()
+        at_bottom = scroll_bar.value() == scroll_bar.maximum()
+        self.info_log.append(text)
+        if at_bottom:
+            info_box.scrollToBottom()
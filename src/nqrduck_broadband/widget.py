@@ -79,6 +79,47 @@ class Ui_Form(object):
         self.averagesEdit.setAlignment(QtCore.Qt.AlignmentFlag.AlignRight|QtCore.Qt.AlignmentFlag.AlignTrailing|QtCore.Qt.AlignmentFlag.AlignVCenter)
         self.averagesEdit.setObjectName("averagesEdit")
         self.gridLayout_3.addWidget(self.averagesEdit, 3, 2, 1, 1)
+        self.label_12 = QtWidgets.QLabel(parent=Form)
+        self.label_12.setObjectName("label_12")
+        self.gridLayout_3.addWidget(self.label_12, 5, 0, 1, 1)
+        self.settleTimeEdit = QtWidgets.QLineEdit(parent=Form)
+        self.settleTimeEdit.setAlignment(QtCore.Qt.AlignmentFlag.AlignRight|QtCore.Qt.AlignmentFlag.AlignTrailing|QtCore.Qt.AlignmentFlag.AlignVCenter)
+        self.settleTimeEdit.setObjectName("settleTimeEdit")
+        self.gridLayout_3.addWidget(self.settleTimeEdit, 5, 2, 1, 1)
+        self.label_13 = QtWidgets.QLabel(parent=Form)
+        self.label_13.setObjectName("label_13")
+        self.gridLayout_3.addWidget(self.label_13, 5, 3, 1, 1)
+        self.label_14 = QtWidgets.QLabel(parent=Form)
+        self.label_14.setObjectName("label_14")
+        self.gridLayout_3.addWidget(self.label_14, 6, 0, 1, 1)
+        self.stitchingStrategyBox = QtWidgets.QComboBox(parent=Form)
+        self.stitchingStrategyBox.setObjectName("stitchingStrategyBox")
+        self.gridLayout_3.addWidget(self.stitchingStrategyBox, 6, 2, 1, 2)
+        self.complexSpectrumBox = QtWidgets.QCheckBox(parent=Form)
+        self.complexSpectrumBox.setObjectName("complexSpectrumBox")
+        self.gridLayout_3.addWidget(self.complexSpectrumBox, 7, 0, 1, 4)
+        self.adaptiveSteppingBox = QtWidgets.QCheckBox(parent=Form)
+        self.adaptiveSteppingBox.setObjectName("adaptiveSteppingBox")
+        self.gridLayout_3.addWidget(self.adaptiveSteppingBox, 8, 0, 1, 4)
+        self.adaptiveAveragingBox = QtWidgets.QCheckBox(parent=Form)
+        self.adaptiveAveragingBox.setObjectName("adaptiveAveragingBox")
+        self.gridLayout_3.addWidget(self.adaptiveAveragingBox, 9, 0, 1, 2)
+        self.targetSnrEdit = QtWidgets.QLineEdit(parent=Form)
+        self.targetSnrEdit.setAlignment(QtCore.Qt.AlignmentFlag.AlignRight|QtCore.Qt.AlignmentFlag.AlignTrailing|QtCore.Qt.AlignmentFlag.AlignVCenter)
+        self.targetSnrEdit.setObjectName("targetSnrEdit")
+        self.gridLayout_3.addWidget(self.targetSnrEdit, 9, 2, 1, 1)
+        self.streamRawDataBox = QtWidgets.QCheckBox(parent=Form)
+        self.streamRawDataBox.setObjectName("streamRawDataBox")
+        self.gridLayout_3.addWidget(self.streamRawDataBox, 4, 0, 1, 4)
+        self.autosaveBox = QtWidgets.QCheckBox(parent=Form)
+        self.autosaveBox.setObjectName("autosaveBox")
+        self.gridLayout_3.addWidget(self.autosaveBox, 10, 0, 1, 1)
+        self.autosaveDirectoryEdit = QtWidgets.QLineEdit(parent=Form)
+        self.autosaveDirectoryEdit.setObjectName("autosaveDirectoryEdit")
+        self.gridLayout_3.addWidget(self.autosaveDirectoryEdit, 10, 1, 1, 2)
+        self.autosaveDirectoryButton = QtWidgets.QPushButton(parent=Form)
+        self.autosaveDirectoryButton.setObjectName("autosaveDirectoryButton")
+        self.gridLayout_3.addWidget(self.autosaveDirectoryButton, 10, 3, 1, 1)
         self.verticalLayout.addLayout(self.gridLayout_3)
         self.start_measurementButton = QtWidgets.QPushButton(parent=Form)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Expanding)
@@ -88,6 +129,12 @@ class Ui_Form(object):
         self.start_measurementButton.setSizePolicy(sizePolicy)
         self.start_measurementButton.setObjectName("start_measurementButton")
         self.verticalLayout.addWidget(self.start_measurementButton)
+        self.resumeButton = QtWidgets.QPushButton(parent=Form)
+        self.resumeButton.setObjectName("resumeButton")
+        self.verticalLayout.addWidget(self.resumeButton)
+        self.performanceReportButton = QtWidgets.QPushButton(parent=Form)
+        self.performanceReportButton.setObjectName("performanceReportButton")
+        self.verticalLayout.addWidget(self.performanceReportButton)
         self.verticalLayout_4.addLayout(self.verticalLayout)
         self.verticalLayout_3 = QtWidgets.QVBoxLayout()
         self.verticalLayout_3.setObjectName("verticalLayout_3")
@@ -118,6 +165,15 @@ class Ui_Form(object):
         self.minMatchingActive = QtWidgets.QCheckBox(parent=Form)
         self.minMatchingActive.setObjectName("minMatchingActive")
         self.gridLayout.addWidget(self.minMatchingActive, 1, 0, 1, 1)
+        self.label_15 = QtWidgets.QLabel(parent=Form)
+        self.label_15.setObjectName("label_15")
+        self.gridLayout.addWidget(self.label_15, 2, 0, 1, 1)
+        self.minMatchActionBox = QtWidgets.QComboBox(parent=Form)
+        self.minMatchActionBox.setObjectName("minMatchActionBox")
+        self.gridLayout.addWidget(self.minMatchActionBox, 2, 1, 1, 1)
+        self.pipelinedTuneAndMatchBox = QtWidgets.QCheckBox(parent=Form)
+        self.pipelinedTuneAndMatchBox.setObjectName("pipelinedTuneAndMatchBox")
+        self.gridLayout.addWidget(self.pipelinedTuneAndMatchBox, 3, 0, 1, 2)
         self.verticalLayout_3.addLayout(self.gridLayout)
         self.deleteLUTButton = QtWidgets.QPushButton(parent=Form)
         self.deleteLUTButton.setObjectName("deleteLUTButton")
@@ -135,18 +191,10 @@ class Ui_Form(object):
         self.measurementProgress.setProperty("value", 0)
         self.measurementProgress.setObjectName("measurementProgress")
         self.verticalLayout_2.addWidget(self.measurementProgress)
-        self.infoBox = QtWidgets.QScrollArea(parent=Form)
-        self.infoBox.setWidgetResizable(True)
+        self.infoBox = QtWidgets.QListView(parent=Form)
+        self.infoBox.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.infoBox.setUniformItemSizes(True)
         self.infoBox.setObjectName("infoBox")
-        self.scrollAreaWidgetContents = QtWidgets.QWidget()
-        self.scrollAreaWidgetContents.setGeometry(QtCore.QRect(0, 0, 271, 559))
-        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Expanding)
-        sizePolicy.setHorizontalStretch(0)
-        sizePolicy.setVerticalStretch(0)
-        sizePolicy.setHeightForWidth(self.scrollAreaWidgetContents.sizePolicy().hasHeightForWidth())
-        self.scrollAreaWidgetContents.setSizePolicy(sizePolicy)
-        self.scrollAreaWidgetContents.setObjectName("scrollAreaWidgetContents")
-        self.infoBox.setWidget(self.scrollAreaWidgetContents)
         self.verticalLayout_2.addWidget(self.infoBox)
         self.exportButton = QtWidgets.QPushButton(parent=Form)
         self.exportButton.setObjectName("exportButton")
@@ -207,11 +255,28 @@ class Ui_Form(object):
         self.label.setText(_translate("Form", "Start Frequency:"))
         self.label_4.setText(_translate("Form", "MHz"))
         self.label_7.setText(_translate("Form", "Averages:"))
+        self.label_12.setText(_translate("Form", "Settle Time:"))
+        self.settleTimeEdit.setText(_translate("Form", "0"))
+        self.label_13.setText(_translate("Form", "ms"))
+        self.label_14.setText(_translate("Form", "Stitching:"))
+        self.complexSpectrumBox.setText(_translate("Form", "Store complex spectrum"))
+        self.adaptiveSteppingBox.setText(_translate("Form", "Adaptive frequency stepping"))
+        self.adaptiveAveragingBox.setText(_translate("Form", "Adaptive averaging, target SNR:"))
+        self.targetSnrEdit.setText(_translate("Form", "20"))
+        self.streamRawDataBox.setText(_translate("Form", "Stream raw data to disk"))
+        self.autosaveBox.setToolTip(_translate("Form", "Stream every new measurement to a file in this directory while it is running."))
+        self.autosaveBox.setText(_translate("Form", "Autosave:"))
+        self.autosaveDirectoryButton.setText(_translate("Form", "..."))
         self.start_measurementButton.setText(_translate("Form", "Start Measurement"))
+        self.resumeButton.setText(_translate("Form", "Resume Measurement"))
+        self.performanceReportButton.setText(_translate("Form", "Performance Report"))
         self.label_10.setText(_translate("Form", "Sequence Settings:"))
         self.label_11.setText(_translate("Form", "Active LUT:"))
         self.activeLUTLabel.setText(_translate("Form", "None"))
         self.minMatchingActive.setText(_translate("Form", "Minimum Matching (dB)"))
+        self.label_15.setText(_translate("Form", "If not matched:"))
+        self.pipelinedTuneAndMatchBox.setToolTip(_translate("Form", "Request tune and match of the next frequency while the spectrometer acquires the current one. Only for tune and match hardware that is independent of the spectrometer."))
+        self.pipelinedTuneAndMatchBox.setText(_translate("Form", "Tune and match during acquisition"))
         self.deleteLUTButton.setText(_translate("Form", "Delete LUT"))
         self.label_9.setText(_translate("Form", "Info Box:"))
         self.exportButton.setText(_translate("Form", "Export Measurement"))
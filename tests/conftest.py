@@ -0,0 +1,135 @@
+"""Fixtures shared by the tests of the broadband module."""
+
+import os
+import time
+import numpy as np
+import pytest
+from PyQt6.QtWidgets import QApplication
+from quackseq.measurement import Measurement
+
+# The module creates its widgets when the package is imported, so the application has to exist first
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+_app = QApplication.instance() or QApplication([])
+
+from nqrduck_broadband.model import BroadbandModel  # noqa: E402
+
+FREQUENCY_STEP = 0.1e6
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """The Qt application the signals of the tests are delivered by, it runs without a display."""
+    return _app
+
+
+@pytest.fixture
+def process_events(qapp):
+    """Returns a function that runs the Qt event loop until a condition is met or the timeout in seconds has passed."""
+
+    def process_events(condition=lambda: False, timeout: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            qapp.processEvents()
+            if condition():
+                return True
+        return condition()
+
+    return process_events
+
+
+def make_measurement(
+    frequency: float, seed: int = 0, n_samples: int = 512, **kwargs
+) -> Measurement:
+    """Creates a single frequency measurement with a decaying line close to the target frequency and some noise.
+
+    Args:
+        frequency (float): The target frequency in Hz.
+        seed (int): The seed of the line offset and the noise.
+        n_samples (int): The number of time domain samples.
+        **kwargs: Further arguments of the Measurement.
+
+    Returns:
+        Measurement: The single frequency measurement.
+    """
+    rng = np.random.default_rng(seed)
+    tdx = np.arange(n_samples) * 0.1
+    tdy = np.exp(2j * np.pi * rng.uniform(-0.05, 0.05) * tdx) * np.exp(-tdx / 10)
+    tdy = tdy + 0.05 * (rng.normal(size=n_samples) + 1j * rng.normal(size=n_samples))
+    return Measurement("FID", tdx, tdy, target_frequency=frequency, **kwargs)
+
+
+def legacy_assemble(measurements, frequency_step: float) -> tuple:
+    """Assembles a broadband spectrum the way it was done before the spectrum was stitched incrementally.
+
+    Every call rebuilt the whole spectrum with np.append, the result is the reference the stitching paths are compared with.
+
+    Args:
+        measurements (list): The single frequency measurements in the order of the sweep.
+        frequency_step (float): The frequency step of the sweep in Hz.
+
+    Returns:
+        tuple: The frequency axis in MHz and the magnitude of the broadband spectrum.
+    """
+    step = frequency_step * 1e-6
+    fdx_assembled = np.array([])
+    fdy_assembled = np.array([])
+    for measurement in measurements:
+        fdx = measurement.fdx
+        fdy = np.abs(measurement.fdy)
+        fdy = fdy[:, 0] if fdy.ndim > 1 else fdy
+        offset = measurement.IF_frequency * 1e-6
+        target = measurement.target_frequency * 1e-6
+        center = np.abs(fdx - offset).argmin()
+        lower = np.abs(fdx - (offset - step / 2)).argmin()
+        upper = np.abs(fdx - (offset + step / 2)).argmin()
+        y_lower = np.interp(
+            offset - step / 2, [fdx[lower], fdx[center]], [fdy[lower], fdy[center]]
+        )
+        # The upper edge used to be interpolated towards the lower index
+        y_upper = np.interp(
+            offset + step / 2, [fdx[center], fdx[upper]], [fdy[center], fdy[lower]]
+        )
+        if len(fdy_assembled):
+            fdy_assembled[-1] = (fdy_assembled[-1] + y_lower) / 2
+            fdx_assembled = np.concatenate(
+                [
+                    fdx_assembled,
+                    [target - step / 2],
+                    fdx[lower + 1 : upper - 1] + target - offset,
+                ]
+            )
+        else:
+            first = fdx[lower:upper] + target - offset
+            first[0] = target - step / 2
+            first[-1] = target + step / 2
+            fdx_assembled = first
+            fdy_assembled = np.array([y_lower])
+        fdy_assembled = np.concatenate(
+            [fdy_assembled, fdy[lower + 1 : upper - 1], [y_upper]]
+        )
+    return fdx_assembled, fdy_assembled
+
+
+@pytest.fixture
+def frequencies():
+    """The frequencies of a short sweep in Hz."""
+    return list(80e6 + np.arange(12) * FREQUENCY_STEP)
+
+
+@pytest.fixture
+def measurements(frequencies):
+    """A single frequency measurement at every frequency of the sweep."""
+    return [
+        make_measurement(frequency, seed)
+        for seed, frequency in enumerate(frequencies)
+    ]
+
+
+@pytest.fixture
+def broadband_measurement(qapp, frequencies):
+    """An empty broadband measurement of the sweep, its files are closed after the test."""
+    broadband_measurement = BroadbandModel.BroadbandMeasurement(
+        frequencies, FREQUENCY_STEP
+    )
+    yield broadband_measurement
+    broadband_measurement.close()
@@ -0,0 +1,227 @@
+"""Tests of the AcquisitionStateMachine with a fake spectrometer and fake tune and match hardware."""
+
+import pytest
+from conftest import make_measurement
+from nqrduck_broadband.acquisition import AcquisitionStateMachine
+from nqrduck_broadband.matching import MatchingPolicy
+
+
+class FakeSpectrometer:
+    """Answers the commands of the state machine like the spectrometer and the tune and match module would.
+
+    Every command is recorded. The answers are passed to the machine right away, the machine delivers them through queued signals.
+
+    Args:
+        machine (AcquisitionStateMachine): The machine the commands are received from.
+        reflections (dict, optional): Lists of the reflections tune and match reports at a frequency in MHz, one per request.
+    """
+
+    def __init__(self, machine: AcquisitionStateMachine, reflections: dict = None) -> None:
+        """Initializes the FakeSpectrometer."""
+        self.machine = machine
+        self.reflections = {
+            frequency: list(values) for frequency, values in (reflections or {}).items()
+        }
+        self.commands = []
+        self.frequency = None
+        self.answering = True
+        machine.command.connect(self.on_command)
+
+    def on_command(self, name: str, value) -> None:
+        """Records a command and answers it."""
+        self.commands.append((name, value))
+        if not self.answering:
+            return
+        if name == "set_frequency":
+            self.frequency = float(value)
+        elif name == "set_tune_and_match":
+            reflections = self.reflections.get(value)
+            reflection = reflections.pop(0) if reflections else -20.0
+            self.machine.receive_tune_and_match(reflection)
+        elif name == "start_measurement":
+            self.machine.receive_measurement(make_measurement(self.frequency))
+
+    def names(self) -> list:
+        """Returns the names of the recorded commands."""
+        return [name for name, _ in self.commands]
+
+
+@pytest.fixture
+def machine(qapp):
+    """A state machine that is stopped after the test."""
+    machine = AcquisitionStateMachine()
+    yield machine
+    machine.stop()
+
+
+def run_to_end(machine, process_events) -> None:
+    """Runs the event loop until the machine has measured all frequencies."""
+    assert process_events(lambda: machine.state == machine.FINISHED)
+
+
+def test_normal_steps(machine, broadband_measurement, frequencies, process_events):
+    """Every step sets the frequency, waits for tune and match and acquires a measurement."""
+    spectrometer = FakeSpectrometer(machine)
+    finished = []
+    machine.finished.connect(lambda: finished.append(True))
+    states = []
+    machine.state_changed.connect(states.append)
+
+    machine.start(broadband_measurement, tune_and_match=True)
+    run_to_end(machine, process_events)
+
+    assert finished == [True]
+    assert spectrometer.names() == [
+        "set_frequency",
+        "set_tune_and_match",
+        "start_measurement",
+    ] * len(frequencies)
+    assert [
+        float(value) for name, value in spectrometer.commands if name == "set_frequency"
+    ] == frequencies
+    assert all(
+        broadband_measurement.get_measurement(frequency) is not None
+        for frequency in frequencies
+    )
+    assert broadband_measurement.reflection == {
+        frequency: -20.0 for frequency in frequencies
+    }
+    assert len(broadband_measurement.broadband_data_fdx) > 0
+    assert states.count(machine.STITCHING) == len(frequencies)
+    for stage in (
+        machine.TUNE_AND_MATCH_STAGE,
+        machine.ACQUISITION_STAGE,
+        machine.STITCHING_STAGE,
+    ):
+        assert len(machine.latencies[stage]) == len(frequencies)
+
+
+def test_skip(machine, broadband_measurement, frequencies, process_events):
+    """A frequency that is not matched well enough is skipped and the sweep goes on."""
+    skipped = frequencies[3]
+    spectrometer = FakeSpectrometer(machine, {skipped * 1e-6: [-5.0]})
+    decisions = []
+    machine.matching_decided.connect(decisions.append)
+    machine.matching_policy = MatchingPolicy(action=MatchingPolicy.SKIP)
+
+    machine.start(broadband_measurement, tune_and_match=True)
+    run_to_end(machine, process_events)
+
+    assert [(decision.frequency, decision.action) for decision in decisions] == [
+        (skipped, MatchingPolicy.SKIP)
+    ]
+    assert spectrometer.names().count("start_measurement") == len(frequencies) - 1
+    assert broadband_measurement.get_measurement(skipped) is None
+    assert skipped in broadband_measurement.skipped_frequencies
+    assert broadband_measurement.is_complete()
+
+
+def test_retry(machine, broadband_measurement, frequencies, process_events):
+    """Tune and match is repeated until the frequency is matched, then it is measured."""
+    retried = frequencies[5]
+    spectrometer = FakeSpectrometer(machine, {retried * 1e-6: [-5.0, -8.0, -15.0]})
+    decisions = []
+    machine.matching_decided.connect(decisions.append)
+    machine.matching_policy = MatchingPolicy(action=MatchingPolicy.RETRY, max_retries=2)
+
+    machine.start(broadband_measurement, tune_and_match=True)
+    run_to_end(machine, process_events)
+
+    assert [(decision.action, decision.attempt) for decision in decisions] == [
+        (MatchingPolicy.RETRY, 0),
+        (MatchingPolicy.RETRY, 1),
+        (MatchingPolicy.MEASURE, 2),
+    ]
+    assert spectrometer.commands.count(("set_tune_and_match", retried * 1e-6)) == 3
+    assert spectrometer.names().count("start_measurement") == len(frequencies)
+    assert broadband_measurement.get_measurement(retried) is not None
+    assert broadband_measurement.reflection[retried] == -15.0
+
+
+def test_reduce_averages(machine, broadband_measurement, frequencies, process_events):
+    """A frequency that is not matched well enough is measured with fewer averages, the next one with all of them."""
+    reduced = frequencies[2]
+    spectrometer = FakeSpectrometer(machine, {reduced * 1e-6: [-5.0]})
+    machine.matching_policy = MatchingPolicy(
+        action=MatchingPolicy.REDUCE_AVERAGES, averages=16
+    )
+
+    machine.start(broadband_measurement, tune_and_match=True)
+    run_to_end(machine, process_events)
+
+    assert [command for command in spectrometer.commands if command[0] == "set_averages"] == [
+        ("set_averages", "4"),
+        ("set_averages", "16"),
+    ]
+    step = spectrometer.commands.index(("set_averages", "4"))
+    assert spectrometer.commands[step + 1] == ("start_measurement", None)
+    assert broadband_measurement.is_complete()
+
+
+def test_stop_mid_step(machine, broadband_measurement, frequencies, process_events):
+    """Answers that arrive after the machine has been stopped are ignored."""
+    spectrometer = FakeSpectrometer(machine)
+    spectrometer.answering = False
+
+    machine.start(broadband_measurement, tune_and_match=True)
+    assert process_events(lambda: machine.state == machine.AWAITING_TUNE_AND_MATCH)
+    machine.stop()
+    assert machine.state == machine.IDLE
+    assert not machine.waiting_for_tune_and_match
+
+    # Late answers of the spectrometer are ignored
+    machine.receive_tune_and_match(-20.0)
+    machine.receive_measurement(make_measurement(frequencies[0]))
+    process_events(timeout=0.2)
+
+    assert machine.state == machine.IDLE
+    assert spectrometer.names() == ["set_frequency", "set_tune_and_match"]
+    assert broadband_measurement.get_measurement(frequencies[0]) is None
+    assert broadband_measurement.reflection == {}
+
+
+def test_resume_after_stop(machine, broadband_measurement, frequencies, process_events):
+    """A stopped measurement continues at the first frequency that has not been measured."""
+    spectrometer = FakeSpectrometer(machine)
+    measured = []
+    broadband_measurement.received_measurement.connect(lambda: measured.append(True))
+
+    machine.start(broadband_measurement, tune_and_match=False)
+    assert process_events(lambda: len(measured) >= 3)
+    machine.stop()
+    stopped_at = len(measured)
+    process_events(timeout=0.2)
+    assert machine.state == machine.IDLE
+    assert len(measured) == stopped_at < len(frequencies)
+    assert broadband_measurement.get_next_measurement_frequency() == frequencies[stopped_at]
+
+    machine.start(broadband_measurement, tune_and_match=False)
+    run_to_end(machine, process_events)
+    assert len(measured) == len(frequencies)
+    assert spectrometer.names().count("start_measurement") >= len(frequencies)
+    assert broadband_measurement.is_complete()
+
+
+def test_pipelined_tune_and_match(machine, broadband_measurement, frequencies, process_events):
+    """Tune and match of the next frequency overlaps the acquisition of the current one."""
+    spectrometer = FakeSpectrometer(machine)
+    machine.pipelined = True
+
+    machine.start(broadband_measurement, tune_and_match=True)
+    run_to_end(machine, process_events)
+
+    # Tune and match of the next frequency is requested right after the acquisition has started,
+    # the frequency of the spectrometer is only changed once the data has arrived
+    assert spectrometer.commands[:6] == [
+        ("set_frequency", str(frequencies[0])),
+        ("set_tune_and_match", frequencies[0] * 1e-6),
+        ("start_measurement", None),
+        ("set_tune_and_match", frequencies[1] * 1e-6),
+        ("set_frequency", str(frequencies[1])),
+        ("start_measurement", None),
+    ]
+    assert spectrometer.names().count("set_tune_and_match") == len(frequencies)
+    assert broadband_measurement.reflection == {
+        frequency: -20.0 for frequency in frequencies
+    }
+    assert broadband_measurement.is_complete()
@@ -0,0 +1,254 @@
+"""Tests that the different ways of stitching a broadband spectrum give the same result."""
+
+import numpy as np
+import pytest
+from conftest import FREQUENCY_STEP, legacy_assemble, make_measurement
+from quackseq.measurement import Measurement
+from nqrduck_broadband import reprocessing, stitching, storage
+from nqrduck_broadband.adaptive import AdaptivePlan
+from nqrduck_broadband.model import BroadbandModel
+
+
+def assert_same_spectrum(broadband_measurement, expected) -> None:
+    """Compares the spectrum of a broadband measurement with the expected frequency axis and magnitude."""
+    fdx, fdy = expected
+    np.testing.assert_allclose(broadband_measurement.broadband_data_fdx, fdx)
+    np.testing.assert_allclose(broadband_measurement.broadband_data_fdy, fdy)
+
+
+def test_incremental_matches_legacy(broadband_measurement, measurements):
+    """Stitching every measurement as it arrives gives the spectrum of the full rebuild."""
+    for count, measurement in enumerate(measurements, 1):
+        broadband_measurement.add_measurement(measurement)
+        assert_same_spectrum(
+            broadband_measurement, legacy_assemble(measurements[:count], FREQUENCY_STEP)
+        )
+
+
+def test_out_of_order_matches_legacy(broadband_measurement, measurements):
+    """Measurements that arrive out of order or replace earlier ones are stitched in the order of the sweep."""
+    for measurement in measurements[::2] + measurements[1::2] + measurements[3:5]:
+        broadband_measurement.add_measurement(measurement)
+
+    assert_same_spectrum(
+        broadband_measurement, legacy_assemble(measurements, FREQUENCY_STEP)
+    )
+
+
+def test_batch_matches_legacy(measurements):
+    """Stitching all measurements in one go gives the spectrum of the full rebuild."""
+    np.testing.assert_allclose(
+        stitching.stitch_batch(measurements, FREQUENCY_STEP),
+        legacy_assemble(measurements, FREQUENCY_STEP),
+    )
+
+
+def test_batch_with_different_frequency_axes(frequencies):
+    """Measurements with a different number of samples are stitched like the full rebuild as well."""
+    measurements = [
+        make_measurement(frequency, seed, n_samples=(512, 1024, 300)[seed % 3])
+        for seed, frequency in enumerate(frequencies)
+    ]
+    fdx, fdy = stitching.stitch_batch(measurements, FREQUENCY_STEP)
+    expected_fdx, expected_fdy = legacy_assemble(measurements, FREQUENCY_STEP)
+    np.testing.assert_allclose(fdx, expected_fdx)
+    np.testing.assert_allclose(fdy, expected_fdy)
+
+
+def test_background_stitching_matches_legacy(broadband_measurement, measurements):
+    """The spectrum stitched by the worker thread equals the one stitched in the foreground."""
+    broadband_measurement.enable_background_stitching()
+    for measurement in measurements[:6] + measurements[8:] + measurements[6:8]:
+        broadband_measurement.add_measurement(measurement)
+    broadband_measurement.wait_for_stitching()
+
+    assert_same_spectrum(
+        broadband_measurement, legacy_assemble(measurements, FREQUENCY_STEP)
+    )
+
+
+def test_background_stitching_publishes_updates(
+    broadband_measurement, measurements, process_events
+):
+    """The stitched spectrum arrives through the event loop without waiting for the worker."""
+    changes = []
+    broadband_measurement.spectrum_changed.connect(lambda: changes.append(True))
+    broadband_measurement.enable_background_stitching()
+    for measurement in measurements:
+        broadband_measurement.add_measurement(measurement)
+    expected = legacy_assemble(measurements, FREQUENCY_STEP)
+
+    assert process_events(
+        lambda: len(broadband_measurement.broadband_data_fdx) == len(expected[0])
+    )
+    assert changes
+    assert_same_spectrum(broadband_measurement, expected)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_reprocessing_matches_legacy(broadband_measurement, measurements, max_workers):
+    """Recalculating the spectrum from the time domain data, in this process or in spawned workers, gives the spectrum of the full rebuild."""
+    for measurement in measurements:
+        broadband_measurement.add_measurement(measurement)
+    broadband_measurement.reprocess(max_workers=max_workers)
+
+    assert_same_spectrum(
+        broadband_measurement, legacy_assemble(measurements, FREQUENCY_STEP)
+    )
+
+
+def test_reprocessed_slices_match(measurements):
+    """The slices calculated by the reprocessing pipeline equal the slices of the measurements."""
+    slices = reprocessing.reprocess(
+        {measurement.target_frequency: measurement for measurement in measurements},
+        FREQUENCY_STEP,
+        max_workers=1,
+    )
+
+    for measurement in measurements:
+        expected = stitching.compute_slice(measurement, FREQUENCY_STEP)
+        spectrum_slice = slices[measurement.target_frequency]
+        np.testing.assert_allclose(spectrum_slice.fdx, expected.fdx)
+        np.testing.assert_allclose(spectrum_slice.fdy, expected.fdy)
+        assert spectrum_slice.y_lower == pytest.approx(expected.y_lower)
+        assert spectrum_slice.y_upper == pytest.approx(expected.y_upper)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_reprocessing_window(measurements, max_workers, monkeypatch):
+    """An apodization window is applied to the time domain data before the FFT, with the time values of every measurement."""
+    monkeypatch.setattr(reprocessing, "IN_PROCESS_CHUNK_SIZE", 5)
+
+    def window(tdx):
+        return np.exp(-tdx / 20)
+
+    # Every third measurement has the same number of samples but a longer dwell time
+    measurements = [
+        Measurement(
+            "FID",
+            measurement.tdx * (2 if index % 3 == 0 else 1),
+            stitching.first_dataset(measurement.tdy),
+            target_frequency=measurement.target_frequency,
+        )
+        for index, measurement in enumerate(measurements)
+    ]
+    slices = reprocessing.reprocess(
+        {measurement.target_frequency: measurement for measurement in measurements},
+        FREQUENCY_STEP,
+        window,
+        max_workers=max_workers,
+    )
+
+    for measurement in measurements:
+        windowed = Measurement(
+            "FID",
+            measurement.tdx,
+            stitching.first_dataset(measurement.tdy) * window(measurement.tdx),
+            target_frequency=measurement.target_frequency,
+        )
+        expected = stitching.compute_slice(windowed, FREQUENCY_STEP)
+        np.testing.assert_allclose(
+            slices[measurement.target_frequency].fdy, expected.fdy
+        )
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_reprocessing_streamed_sweep(
+    broadband_measurement, measurements, max_workers, monkeypatch
+):
+    """The raw data of a streamed sweep is read from the stream file record by record, the measurements are never loaded."""
+    broadband_measurement.enable_streaming()
+    for measurement in measurements:
+        broadband_measurement.add_measurement(measurement)
+
+    def load(self):
+        raise AssertionError("Spilled measurement loaded")
+
+    monkeypatch.setattr(storage.SpilledMeasurement, "load", load)
+    monkeypatch.setattr(reprocessing, "IN_PROCESS_CHUNK_SIZE", 5)
+    broadband_measurement.reprocess(max_workers=max_workers)
+
+    assert_same_spectrum(
+        broadband_measurement, legacy_assemble(measurements, FREQUENCY_STEP)
+    )
+
+
+def test_reprocessing_keeps_strategy(broadband_measurement, measurements):
+    """Reprocessing stitches the new slices with the strategy that has been selected before."""
+    for measurement in measurements:
+        broadband_measurement.add_measurement(measurement)
+    broadband_measurement.restitch("crossfade")
+    expected = (
+        broadband_measurement.broadband_data_fdx.copy(),
+        broadband_measurement.broadband_data_fdy.copy(),
+    )
+    broadband_measurement.reprocess(max_workers=1)
+
+    assert broadband_measurement.stitching_strategy == "crossfade"
+    assert_same_spectrum(broadband_measurement, expected)
+
+
+def test_adaptive_stepping_covers_whole_sweep(qapp):
+    """The coarse measurements cover the ranges that are not refined, so the spectrum spans the whole sweep."""
+    frequencies = list(80e6 + np.arange(17) * FREQUENCY_STEP)
+    broadband_measurement = BroadbandModel.BroadbandMeasurement(
+        frequencies, FREQUENCY_STEP
+    )
+    # No structure and no reflection, so no interval is refined
+    broadband_measurement.enable_adaptive_stepping(threshold=np.inf)
+    while not broadband_measurement.is_complete():
+        frequency = broadband_measurement.get_next_measurement_frequency()
+        broadband_measurement.add_measurement(make_measurement(frequency))
+
+    fdx = broadband_measurement.broadband_data_fdx
+    coarse_factor = AdaptivePlan.DEFAULT_COARSE_FACTOR
+    assert broadband_measurement.plan.measured_count == len(frequencies) // coarse_factor + 1
+    assert fdx[0] == pytest.approx((frequencies[0] - FREQUENCY_STEP / 2) * 1e-6)
+    assert fdx[-1] > (frequencies[-1] + FREQUENCY_STEP / 4) * 1e-6
+    assert np.max(np.diff(fdx)) < FREQUENCY_STEP * 1e-6 / 4
+    broadband_measurement.close()
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_adaptive_stitching_matches_rebuild(qapp, monkeypatch, background):
+    """Measurements of an adaptive sweep are spliced into the spectrum, which equals the spectrum of the full rebuild."""
+    frequencies = list(80e6 + np.arange(33) * FREQUENCY_STEP)
+    broadband_measurement = BroadbandModel.BroadbandMeasurement(
+        frequencies, FREQUENCY_STEP
+    )
+    # Every interval is refined, so every refinement changes the slices of coarse measurements
+    broadband_measurement.enable_adaptive_stepping(threshold=1e-3)
+    if background:
+        broadband_measurement.enable_background_stitching()
+    rebuilds = []
+    assemble = broadband_measurement.assemble_broadband_spectrum
+    monkeypatch.setattr(
+        broadband_measurement,
+        "assemble_broadband_spectrum",
+        lambda: rebuilds.append(True) or assemble(),
+    )
+
+    plan = broadband_measurement.plan
+    measured = {}
+    while not broadband_measurement.is_complete():
+        frequency = broadband_measurement.get_next_measurement_frequency()
+        measurement = make_measurement(frequency, seed=len(measured))
+        measured[frequency] = measurement
+        broadband_measurement.add_measurement(measurement)
+        broadband_measurement.wait_for_stitching()
+
+        expected = stitching.assemble_slices(
+            plan.trim_slices(
+                [
+                    stitching.compute_slice(
+                        measured[frequency], plan.slice_step(frequency)
+                    )
+                    for frequency in sorted(measured)
+                ]
+            )
+        )
+        assert_same_spectrum(broadband_measurement, expected)
+
+    assert len(measured) == len(frequencies)
+    assert len(rebuilds) <= 1
+    broadband_measurement.close()
@@ -0,0 +1,196 @@
+"""Tests of the binary broadband files the measurements are streamed to and saved in."""
+
+import os
+import numpy as np
+import pytest
+from conftest import FREQUENCY_STEP, legacy_assemble, make_measurement
+from quackseq.measurement import T2StarFit
+from nqrduck_broadband import storage
+from nqrduck_broadband.model import BroadbandModel
+
+
+def measure(broadband_measurement, measurements) -> None:
+    """Adds the measurements with a reflection value each, like a running measurement with tune and match."""
+    for index, measurement in enumerate(measurements):
+        broadband_measurement.add_tune_and_match(
+            -20.0 - index, measurement.target_frequency
+        )
+        broadband_measurement.add_measurement(measurement)
+
+
+def assert_same_measurements(broadband_measurement, measurements) -> None:
+    """Compares the raw data a broadband measurement returns with the measurements that have been added."""
+    for measurement in measurements:
+        loaded = broadband_measurement.get_measurement(measurement.target_frequency)
+        np.testing.assert_array_equal(loaded.tdx, measurement.tdx)
+        np.testing.assert_array_equal(loaded.tdy, measurement.tdy)
+
+
+def test_stream_round_trip(broadband_measurement, measurements, tmp_path):
+    """A streamed measurement is read back with its raw data, reflections and spectrum."""
+    file_name = str(tmp_path / "sweep.broad")
+    broadband_measurement.open_stream(file_name)
+    measure(broadband_measurement, measurements)
+    broadband_measurement.finish_stream()
+
+    loaded = BroadbandModel.BroadbandMeasurement.from_file(file_name)
+    try:
+        assert loaded.is_complete()
+        assert loaded.reflection == broadband_measurement.reflection
+        assert_same_measurements(loaded, measurements)
+        fdx, fdy = legacy_assemble(measurements, FREQUENCY_STEP)
+        np.testing.assert_allclose(loaded.broadband_data_fdx, fdx)
+        np.testing.assert_allclose(loaded.broadband_data_fdy, fdy)
+    finally:
+        loaded.close()
+
+
+def test_save_round_trip(broadband_measurement, measurements, tmp_path):
+    """A measurement that has been kept in memory is saved and read back."""
+    file_name = str(tmp_path / "sweep.broad")
+    measure(broadband_measurement, measurements[:7])
+    broadband_measurement.save(file_name)
+
+    loaded = BroadbandModel.BroadbandMeasurement.from_file(file_name)
+    try:
+        assert loaded.get_next_measurement_frequency() == measurements[7].target_frequency
+        assert loaded.reflection == broadband_measurement.reflection
+        assert_same_measurements(loaded, measurements[:7])
+        np.testing.assert_allclose(
+            loaded.broadband_data_fdy, broadband_measurement.broadband_data_fdy
+        )
+    finally:
+        loaded.close()
+
+
+def test_streaming_retention(broadband_measurement, measurements):
+    """The raw data spilled to the temporary stream file is loaded again and the file is removed on close."""
+    broadband_measurement.enable_streaming()
+    file_name = broadband_measurement._stream_file_name
+    measure(broadband_measurement, measurements)
+
+    assert_same_measurements(broadband_measurement, measurements)
+    fdx, fdy = legacy_assemble(measurements, FREQUENCY_STEP)
+    np.testing.assert_allclose(broadband_measurement.broadband_data_fdx, fdx)
+    np.testing.assert_allclose(broadband_measurement.broadband_data_fdy, fdy)
+    broadband_measurement.close()
+    assert not os.path.exists(file_name)
+
+
+def test_open_lazily(broadband_measurement, measurements, tmp_path):
+    """Opening a file reads the stored spectrum and leaves the raw data in the memory map until it is needed."""
+    file_name = str(tmp_path / "sweep.broad")
+    measure(broadband_measurement, measurements)
+    broadband_measurement.save(file_name)
+
+    loaded = BroadbandModel.BroadbandMeasurement.from_file(file_name)
+    try:
+        assert all(
+            isinstance(measurement, storage.SpilledMeasurement)
+            for measurement in loaded.single_frequency_measurements.values()
+        )
+        np.testing.assert_allclose(
+            loaded.broadband_data_fdy, broadband_measurement.broadband_data_fdy
+        )
+        assert_same_measurements(loaded, measurements)
+
+        # Replacing a measurement reassembles the spectrum from the data in the file
+        replaced = make_measurement(measurements[4].target_frequency, seed=100)
+        loaded.add_measurement(replaced)
+        fdx, fdy = legacy_assemble(
+            measurements[:4] + [replaced] + measurements[5:], FREQUENCY_STEP
+        )
+        np.testing.assert_allclose(loaded.broadband_data_fdx, fdx)
+        np.testing.assert_allclose(loaded.broadband_data_fdy, fdy)
+    finally:
+        loaded.close()
+
+
+def test_resume_interrupted_stream(
+    broadband_measurement, frequencies, measurements, tmp_path
+):
+    """An interrupted stream file is resumed from its last complete record and finished."""
+    file_name = str(tmp_path / "sweep.broad")
+    broadband_measurement.open_stream(file_name)
+    measure(broadband_measurement, measurements[:5])
+    reflection = dict(broadband_measurement.reflection)
+    broadband_measurement.checkpoint()
+    # The measurement is interrupted while a record is written, the file is never finished
+    broadband_measurement.close()
+    with open(file_name, "ab") as f:
+        f.write(b"\x10\x00\x00\x00 incomplete")
+
+    resumed = BroadbandModel.BroadbandMeasurement.resume(file_name)
+    try:
+        assert resumed.get_next_measurement_frequency() == frequencies[5]
+        assert resumed.reflection == reflection
+        assert_same_measurements(resumed, measurements[:5])
+
+        measure(resumed, measurements[5:])
+        assert resumed.is_complete()
+        resumed.finish_stream()
+    finally:
+        resumed.close()
+
+    finished = BroadbandModel.BroadbandMeasurement.from_file(file_name)
+    try:
+        assert finished.is_complete()
+        assert len(finished.reflection) == len(frequencies)
+        assert_same_measurements(finished, measurements)
+        fdx, fdy = legacy_assemble(measurements, FREQUENCY_STEP)
+        np.testing.assert_allclose(finished.broadband_data_fdx, fdx)
+        np.testing.assert_allclose(finished.broadband_data_fdy, fdy)
+    finally:
+        finished.close()
+
+
+def test_save_over_source(broadband_measurement, measurements, tmp_path):
+    """A file opened with from_file can be saved over itself, its measurements are read from the new file."""
+    file_name = str(tmp_path / "sweep.broad")
+    measure(broadband_measurement, measurements)
+    broadband_measurement.save(file_name)
+
+    loaded = BroadbandModel.BroadbandMeasurement.from_file(file_name)
+    try:
+        loaded.save(file_name)
+        assert_same_measurements(loaded, measurements)
+    finally:
+        loaded.close()
+
+    reloaded = BroadbandModel.BroadbandMeasurement.from_file(file_name)
+    try:
+        assert_same_measurements(reloaded, measurements)
+        np.testing.assert_allclose(
+            reloaded.broadband_data_fdy, broadband_measurement.broadband_data_fdy
+        )
+    finally:
+        reloaded.close()
+
+
+def test_save_over_running_stream(broadband_measurement, measurements, tmp_path):
+    """The stream file of a running measurement can not be saved over."""
+    file_name = str(tmp_path / "sweep.broad")
+    broadband_measurement.open_stream(file_name)
+    measure(broadband_measurement, measurements[:3])
+
+    with pytest.raises(ValueError):
+        broadband_measurement.save(file_name)
+    assert_same_measurements(broadband_measurement, measurements[:3])
+
+
+def test_measurement_record_keeps_frequency_shift_and_fits(qapp, tmp_path):
+    """The frequency shift and the fits of a measurement are stored in its record."""
+    measurement = make_measurement(80e6, frequency_shift=0.02)
+    measurement.add_fit(T2StarFit(measurement))
+    file_name = str(tmp_path / "sweep.broad")
+    writer = storage.BroadbandFileWriter(
+        file_name, [measurement.target_frequency], FREQUENCY_STEP
+    )
+    writer.append_measurement(measurement)
+    writer.close()
+
+    (loaded,) = storage.read_broadband_file(file_name)["measurements"]
+    assert loaded.frequency_shift == pytest.approx(0.02)
+    assert [fit.name for fit in loaded.fits] == ["T2*"]
+    np.testing.assert_allclose(loaded.fdx, measurement.fdx)
+    np.testing.assert_allclose(loaded.fdy, measurement.fdy)
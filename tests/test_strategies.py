@@ -0,0 +1,60 @@
+"""Tests of the stitching strategies."""
+
+import numpy as np
+import pytest
+from conftest import FREQUENCY_STEP, legacy_assemble
+from quackseq.measurement import Measurement
+from nqrduck_broadband import strategies
+
+
+def flat_measurements(frequencies, phases) -> list:
+    """Creates measurements of a spectrum with the same magnitude everywhere and a different phase in every measurement."""
+    tdx = np.arange(512) * 0.1
+    tdy = np.zeros(512, dtype=complex)
+    tdy[0] = 1
+    return [
+        Measurement("FID", tdx, tdy * np.exp(1j * phase), target_frequency=frequency)
+        for frequency, phase in zip(frequencies, phases)
+    ]
+
+
+def test_strategy_is_abstract():
+    """A strategy has to implement stitch."""
+    with pytest.raises(TypeError):
+        strategies.StitchingStrategy()
+
+
+def test_cut_matches_legacy(measurements):
+    """The cut strategy gives the spectrum the module assembled before the strategies existed."""
+    fdx, fdy = strategies.CutStrategy().stitch(measurements, FREQUENCY_STEP)
+    expected_fdx, expected_fdy = legacy_assemble(measurements, FREQUENCY_STEP)
+    np.testing.assert_allclose(fdx, expected_fdx)
+    np.testing.assert_allclose(fdy, expected_fdy)
+
+
+@pytest.mark.parametrize("name", ["crossfade", "weighted", "complex"])
+def test_strategies_are_continuous_at_boundaries(frequencies, name):
+    """The overlapping strategies keep a flat spectrum flat across the boundaries of the measurements and span the range of the sweep."""
+    phases = np.zeros(len(frequencies))
+    if name == "complex":
+        # The phase correction has to remove the phase differences, otherwise the measurements cancel each other out in the overlap
+        phases = np.random.default_rng(0).uniform(-np.pi, np.pi, len(frequencies))
+    fdx, fdy = strategies.get_strategy(name).stitch(
+        flat_measurements(frequencies, phases), FREQUENCY_STEP
+    )
+
+    assert np.all(np.diff(fdx) > 0)
+    np.testing.assert_allclose(fdy, fdy[0], rtol=1e-9)
+
+    lower = (frequencies[0] - FREQUENCY_STEP / 2) * 1e-6
+    upper = (frequencies[-1] + FREQUENCY_STEP / 2) * 1e-6
+    resolution = fdx[1] - fdx[0]
+    assert fdx[0] == pytest.approx(lower)
+    assert upper - resolution < fdx[-1] <= upper + 1e-9
+
+
+def test_benchmark(measurements):
+    """Every strategy is timed."""
+    timings = strategies.benchmark(measurements, FREQUENCY_STEP, repeat=1)
+    assert set(timings) == set(strategies.STRATEGIES)
+    assert all(timing > 0 for timing in timings.values())